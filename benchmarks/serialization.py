@@ -0,0 +1,97 @@
+"""
+Benchmark serializing a ListRecords page with indented and compact output.
+
+Reports the median time of `bytes(response)` and the size of the response, for a
+page of generated Dublin Core records.
+
+    python benchmarks/serialization.py [--records N] [--runs N]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import oai_repo     # pylint: disable=wrong-import-position
+
+DC_FIELDS = ("title", "creator", "subject", "description", "date", "identifier", "rights")
+
+class GeneratedData(oai_repo.DataInterface):
+    """A DataInterface serving a page of generated records"""
+    def __init__(self, count: int):
+        super().__init__()
+        self.limit = count
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.headers = {
+            f"oai:example.edu:{idx}": oai_repo.RecordHeader(
+                f"oai:example.edu:{idx}", start + timedelta(hours=idx), ["all"]
+            )
+            for idx in range(count)
+        }
+
+    def get_identify(self):
+        ident = oai_repo.Identify()
+        ident.repository_name = "Benchmark Repo"
+        ident.base_url = "https://example.edu/oai"
+        ident.admin_email.append("oai@example.edu")
+        ident.deleted_record = "no"
+        ident.granularity = "YYYY-MM-DDThh:mm:ssZ"
+        ident.earliest_datestamp = "2020-01-01T00:00:00Z"
+        return ident
+
+    def get_metadata_formats(self, identifier=None):
+        return [oai_repo.MetadataFormat(
+            "oai_dc",
+            "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+            "http://www.openarchives.org/OAI/2.0/oai_dc/"
+        )]
+
+    def get_record_header(self, identifier):
+        return self.headers[identifier]
+
+    def get_record_metadata(self, identifier, metadataprefix):
+        xdc = etree.Element(
+            b"{" + oai_repo.NSMAP_OAIDC["oai_dc"] + b"}dc", nsmap=oai_repo.NSMAP_OAIDC
+        )
+        xdc.set(*oai_repo.OAIDC_SCHEMA)
+        for name in DC_FIELDS:
+            elem = etree.SubElement(xdc, b"{" + oai_repo.NSMAP_OAIDC["dc"] + b"}" + name.encode())
+            elem.text = f"The {name} of record {identifier}"
+        return xdc
+
+    def get_record_abouts(self, identifier):
+        return []
+
+    def list_identifiers(self, metadataprefix, filter_from=None, filter_until=None,
+                         filter_set=None, cursor=0):
+        return list(self.headers), len(self.headers), None
+
+def measure(repo: oai_repo.OAIRepository, runs: int) -> tuple[float, int]:
+    """Return the median seconds to serialize a ListRecords response, and its size"""
+    response = repo.process({ "verb": "ListRecords", "metadataPrefix": "oai_dc" })
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        xml = bytes(response)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(xml)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000, help="Records in the page")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per mode")
+    args = parser.parse_args()
+    data = GeneratedData(args.records)
+    print(f"{'mode':<10} {'median ms':>10} {'bytes':>10}")
+    for name, pretty_print in (("indented", True), ("compact", False)):
+        repo = oai_repo.OAIRepository(
+            data, serialization=oai_repo.SerializationOptions(pretty_print=pretty_print)
+        )
+        seconds, size = measure(repo, args.runs)
+        print(f"{name:<10} {seconds * 1000:>10.2f} {size:>10}")
+
+if __name__ == "__main__":
+    main()
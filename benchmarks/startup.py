@@ -0,0 +1,55 @@
+"""
+Benchmark the cold-start cost of importing oai_repo, measured in fresh interpreters.
+
+Reports the median import time and the number of modules imported, for importing
+the package alone and for typical first uses of it.
+
+    python benchmarks/startup.py [--runs N]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+SCENARIOS = {
+    "import oai_repo": "import oai_repo",
+    "data classes": "import oai_repo; oai_repo.Identify; oai_repo.RecordHeader",
+    "transform": "import oai_repo; oai_repo.Transform",
+    "repository": "import oai_repo; oai_repo.OAIRepository",
+    "helpers": "import oai_repo; oai_repo.helpers.requests",
+}
+
+MEASURE = """
+import sys, time, json
+before = set(sys.modules)
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": len(set(sys.modules) - before)}}))
+"""
+
+def measure(code: str) -> dict:
+    """Run the code in a fresh interpreter, returning its import time and module count"""
+    env = dict(os.environ, PYTHONPATH=SRC, PYTHONDONTWRITEBYTECODE="")
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(code=code)],
+        env=env, capture_output=True, check=True, text=True
+    )
+    return json.loads(result.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Runs per scenario")
+    args = parser.parse_args()
+    print(f"{'scenario':<18} {'median ms':>10} {'modules':>8}")
+    for name, code in SCENARIOS.items():
+        runs = [measure(code) for _ in range(args.runs)]
+        median = statistics.median(run["seconds"] for run in runs) * 1000
+        print(f"{name:<18} {median:>10.1f} {runs[0]['modules']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,96 @@
 """
 OAI-PMH Repository
 """
+# Public names are imported from their modules on first access, so importing the
+# package stays fast for uses which only need part of it.
+import importlib
+from typing import TYPE_CHECKING
 
-from .exceptions import OAIRepoException, OAIRepoInternalException, OAIRepoExternalException
-from .repository import OAIRepository
-from .transform import Transform
-from .interfacedata import Identify, MetadataFormat, RecordHeader, Set
-from .interface import DataInterface
-from .response import OAIIDENTIFIER_SCHEMA, NSMAP_OAIDC, OAIDC_SCHEMA
-from . import helpers
+from .exceptions import (
+    OAIRepoException, OAIRepoInternalException, OAIRepoExternalException,
+    OAIRepoUnavailableException, OAIRepoDeadlineException, OAIRepoOverloadedException
+)
+
+# Public name => module it is defined in
+_LAZY_ATTRS = {
+    "OAIRepository": ".repository",
+    "Transform": ".transform",
+    "Identify": ".interfacedata",
+    "MetadataFormat": ".interfacedata",
+    "FrozenIdentify": ".interfacedata",
+    "FrozenMetadataFormat": ".interfacedata",
+    "RecordHeader": ".interfacedata",
+    "RecordHeaderBatch": ".interfacedata",
+    "Set": ".interfacedata",
+    "ApproximateSize": ".interfacedata",
+    "RecordBundle": ".interfacedata",
+    "DataInterface": ".interface",
+    "Prefetcher": ".prefetch",
+    "Crosswalk": ".crosswalk",
+    "DerivedMetadataFormat": ".crosswalk",
+    "AdmissionController": ".admission",
+    "SingleFlight": ".singleflight",
+    "ChangeLog": ".changelog",
+    "SolrDataInterface": ".solr",
+    "SQLDataInterface": ".sql",
+    "ConnectionPool": ".sql",
+    "MmapRecordStore": ".recordstore",
+    "DirectoryDataInterface": ".directory",
+    "RequestContext": ".context",
+    "current_context": ".context",
+    "check_deadline": ".context",
+    "LRUCache": ".cache",
+    "CircuitBreaker": ".circuit",
+    "LatencyTracker": ".hedge",
+    "HedgeBudget": ".hedge",
+    "SerializationOptions": ".response",
+    "OAIIDENTIFIER_SCHEMA": ".response",
+    "NSMAP_OAIDC": ".response",
+    "OAIDC_SCHEMA": ".response",
+}
+_LAZY_MODULES = ("helpers",)
+
+__all__ = [
+    "OAIRepoException", "OAIRepoInternalException", "OAIRepoExternalException",
+    "OAIRepoUnavailableException", "OAIRepoDeadlineException", "OAIRepoOverloadedException",
+    *_LAZY_ATTRS, *_LAZY_MODULES
+]
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    elif name in _LAZY_MODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+if TYPE_CHECKING:
+    from .repository import OAIRepository
+    from .transform import Transform
+    from .interfacedata import (
+        Identify, MetadataFormat, FrozenIdentify, FrozenMetadataFormat,
+        RecordHeader, RecordHeaderBatch, Set, ApproximateSize, RecordBundle
+    )
+    from .interface import DataInterface
+    from .prefetch import Prefetcher
+    from .crosswalk import Crosswalk, DerivedMetadataFormat
+    from .admission import AdmissionController
+    from .singleflight import SingleFlight
+    from .changelog import ChangeLog
+    from .solr import SolrDataInterface
+    from .sql import SQLDataInterface, ConnectionPool
+    from .recordstore import MmapRecordStore
+    from .directory import DirectoryDataInterface
+    from .context import RequestContext, current_context, check_deadline
+    from .cache import LRUCache
+    from .circuit import CircuitBreaker
+    from .hedge import LatencyTracker, HedgeBudget
+    from .response import (
+        SerializationOptions, OAIIDENTIFIER_SCHEMA, NSMAP_OAIDC, OAIDC_SCHEMA
+    )
+    from . import helpers
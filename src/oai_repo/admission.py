@@ -0,0 +1,261 @@
+"""
+Admission control for limiting the requests processed at once
+"""
+import math
+import time
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from .context import current_context
+from .exceptions import OAIError, OAIRepoOverloadedException
+from .resumption import ResumptionToken
+
+
+class TokenBucket:
+    """
+    A token bucket rate limit, refilled at `rate` tokens per second up to `burst` tokens.
+    Not thread-safe; callers must hold a lock.
+
+    Args:
+        rate (float): Tokens added per second
+        burst (float): Max tokens held, which starts full
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token if available.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Limits the requests processed at once, in total and for each client, and the rate
+    of requests, so that a few aggressive harvesters can't starve everyone else.
+
+    Requests over a concurrency limit wait in a short queue for a slot. Requests which
+    can't get a slot within `wait_timeout`, or find the queue full, or are over a rate
+    limit, are refused with an `OAIRepoOverloadedException`. Respond to that with
+    HTTP 503 and a `Retry-After` header from its `retry_after`, as OAI-PMH allows for
+    flow control.
+
+    Clients are identified by the `client` passed to `OAIRepository.process()`, such as
+    the IP address of the harvester. Without one, a request with a resumptionToken is
+    limited along with the other requests of its token chain, and other requests are
+    only subject to the global limits.
+
+    Args:
+        max_active (int): Max requests processed at once
+        max_active_per_client (int|None): Max requests processed at once for each client,
+                                          or None for no limit
+        rate (float|None): Max requests per second overall, or None for no limit
+        client_rate (float|None): Max requests per second for each client, or None
+                                  for no limit
+        burst (int): Requests allowed at once above the rates, after being idle
+        max_waiting (int): Max requests waiting for a slot
+        wait_timeout (float): Max seconds a request waits for a slot
+        retry_after (int): Seconds harvesters should wait before retrying a refused request
+        max_clients (int): Max number of clients to keep rate limits for
+
+    Attributes:
+        stats (dict): Counts of `admitted` requests, `queued` requests which waited for a
+                      slot, requests `shed` for lack of a slot, and `rate_limited` requests
+
+    **Examples:**
+    ```python
+    admission = oai_repo.AdmissionController(max_active=16, max_active_per_client=2,
+                                             client_rate=5)
+    repo = oai_repo.OAIRepository(MyOAIData(), admission=admission)
+    try:
+        response = repo.process(args, client=request.remote_addr)
+    except oai_repo.OAIRepoUnavailableException as exc:
+        abort(503, headers={"Retry-After": str(exc.retry_after)})
+    ```
+    """
+    def __init__(
+        self,
+        max_active: int = 16,
+        max_active_per_client: int|None = 2,
+        rate: float|None = None,
+        client_rate: float|None = None,
+        burst: int = 10,
+        max_waiting: int = 64,
+        wait_timeout: float = 1.0,
+        retry_after: int = 10,
+        max_clients: int = 10000
+    ):
+        self.max_active = max_active
+        self.max_active_per_client = max_active_per_client
+        self.client_rate = client_rate
+        self.burst = burst
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "rate_limited": 0}
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._client_active = Counter()
+        self._bucket = TokenBucket(rate, burst) if rate is not None else None
+        # Client => TokenBucket, least recently used first
+        self._client_buckets: OrderedDict = OrderedDict()
+
+    def __repr__(self):
+        return (
+            f"AdmissionController(active={self.active}, waiting={self.waiting}, "
+            f"stats={self.stats})"
+        )
+
+    @property
+    def active(self) -> int:
+        """Number of requests being processed"""
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting for a slot"""
+        return self._waiting
+
+    @staticmethod
+    def client_key(args: dict, client: str|None = None) -> str|None:
+        """
+        Return the key by which a request is limited as part of a client.
+
+        Args:
+            args (dict): The request arguments
+            client (str|None): The client making the request
+
+        Returns:
+            The client, the token chain if the request has a resumptionToken,
+            or None if neither.
+        """
+        if client is not None:
+            return client
+        if "resumptionToken" in args:
+            token = ResumptionToken()
+            try:
+                token.parse(args["resumptionToken"])
+            except OAIError:
+                return None
+            if token.args:
+                return f"chain:{token.chain()}"
+        return None
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        """Return the rate limit for a client; must be called with the lock held."""
+        bucket = self._client_buckets.get(client)
+        if bucket is None:
+            bucket = self._client_buckets[client] = TokenBucket(self.client_rate, self.burst)
+            while len(self._client_buckets) > self.max_clients:
+                self._client_buckets.popitem(last=False)
+        self._client_buckets.move_to_end(client)
+        return bucket
+
+    def _refuse(self, stat: str, message: str, retry_after: int):
+        """Count and raise a refused request; must be called with the lock held."""
+        self.stats[stat] += 1
+        ctx = current_context()
+        if ctx is not None:
+            ctx.metrics["admission"] = stat
+        raise OAIRepoOverloadedException(message, retry_after=retry_after)
+
+    def _has_slot(self, client: str|None) -> bool:
+        """Return if a request for the client may start; must be called with the lock held."""
+        if self._active >= self.max_active:
+            return False
+        return client is None or self.max_active_per_client is None or \
+            self._client_active[client] < self.max_active_per_client
+
+    def acquire(self, client: str|None = None):
+        """
+        Admit a request, waiting for a slot if needed. Each acquire must be followed
+        by a `release()` with the same client once the request is complete.
+
+        Args:
+            client (str|None): The client key of the request
+
+        Raises:
+            OAIRepoOverloadedException: If the request is refused
+        """
+        started = time.monotonic()
+        with self._cond:
+            wait = 0
+            if client is not None and self.client_rate is not None:
+                wait = self._client_bucket(client).take()
+            if not wait and self._bucket is not None:
+                wait = self._bucket.take()
+            if wait:
+                self._refuse("rate_limited", "Request rate limit exceeded", math.ceil(wait))
+            if not self._has_slot(client):
+                if self._waiting >= self.max_waiting:
+                    self._refuse("shed", "Too many requests waiting", self.retry_after)
+                # Wait no longer than the deadline of the request
+                ctx = current_context()
+                remaining = ctx.remaining() if ctx is not None else None
+                timeout = self.wait_timeout if remaining is None \
+                    else min(self.wait_timeout, remaining)
+                self.stats["queued"] += 1
+                self._waiting += 1
+                try:
+                    admitted = self._cond.wait_for(lambda: self._has_slot(client), timeout)
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    self._refuse("shed", "Too many concurrent requests", self.retry_after)
+            self._active += 1
+            if client is not None:
+                self._client_active[client] += 1
+            self.stats["admitted"] += 1
+        ctx = current_context()
+        if ctx is not None:
+            ctx.metrics["admission"] = "admitted"
+            ctx.metrics["admission_wait"] = time.monotonic() - started
+
+    def release(self, client: str|None = None):
+        """
+        Release the slot of a completed request.
+
+        Args:
+            client (str|None): The client key of the request
+        """
+        with self._cond:
+            self._active -= 1
+            if client is not None:
+                self._client_active[client] -= 1
+                if not self._client_active[client]:
+                    del self._client_active[client]
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, args: dict, client: str|None = None):
+        """
+        Context manager admitting a request for its duration.
+
+        Args:
+            args (dict): The request arguments
+            client (str|None): The client making the request
+
+        Raises:
+            OAIRepoOverloadedException: If the request is refused
+        """
+        key = self.client_key(args, client)
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
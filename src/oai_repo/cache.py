@@ -0,0 +1,88 @@
+"""
+Thread-safe caches shared between requests
+"""
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe, size bounded cache which evicts the least recently used entries,
+    with an optional time to live for entries.
+
+    Args:
+        maxsize (int): Max number of entries to keep
+        ttl (float|None): Seconds an entry remains valid, or None for no expiration
+
+    Attributes:
+        stats (dict): Counts of cache `hits`, `misses` and `evicted` entries
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float|None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        # key => (expires, value)
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count: bool = True):
+        """
+        Return the cached value for the key.
+
+        Args:
+            key (Hashable): The cache key
+            default (Any): Value to return if the key is not cached
+            count (bool): Whether to include this lookup in the hit/miss stats
+
+        Returns:
+            The cached value, or the default if not cached or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                if count:
+                    self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            if count:
+                self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """
+        Add or replace the cached value for the key.
+
+        Args:
+            key (Hashable): The cache key
+            value (Any): The value to cache
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def pop(self, key, default=None):
+        """Remove the key from the cache, returning its value or the default."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,419 @@
+"""
+Append-only change log for answering incremental harvests
+"""
+import json
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import NamedTuple
+from .interfacedata import RecordHeader
+from .cache import LRUCache
+
+
+class Change(NamedTuple):
+    """A single entry in the ChangeLog"""
+    seq: int
+    epoch: int
+    identifier: str
+    prefixes: tuple|None
+    status: str|None
+    setspecs: tuple
+
+
+def to_epoch(timestamp: datetime|int|float) -> int:
+    """
+    Convert a datetime to integer seconds since the epoch. Naive datetimes are taken to be UTC.
+
+    Args:
+        timestamp (datetime|int|float): A Python datetime or a number of seconds since epoch
+
+    Returns:
+        The timestamp as whole seconds since the epoch
+    """
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return int(timestamp.timestamp())
+    return int(timestamp)
+
+
+class ChangeLog:
+    """
+    An append-only local log of record changes, indexed by time bucket, so that
+    selective harvests using `from`/`until` cost time proportional to the number
+    of changes within the window, not the size of the repository.
+
+    Each change records a datestamp, the identifier, the metadata prefixes it can be
+    disseminated in (None for all), its status and its setSpecs. Only the latest change
+    for an identifier is considered when answering queries.
+
+    Args:
+        path (str): Path to the log file; created if it does not exist
+        bucket (int): Number of seconds covered by each index bucket
+        since (datetime|int): When creating a new log, the point in time from which the
+                              log holds every change. Defaults to now; pass the epoch (0)
+                              if you seed the log with your entire repository.
+
+    **Examples:**
+    ```python
+    class MyOAIData(oai_repo.DataInterface):
+        changelog = oai_repo.ChangeLog("/var/lib/oai/changes.log")
+
+        def save_record(self, record):
+            ... # store the record, then log the change
+            self.changelog.append(record.identifier, record.modified, setspecs=record.sets)
+
+        def list_identifiers(self, metadataprefix, filter_from=None, filter_until=None,
+                             filter_set=None, cursor=0):
+            if self.changelog.covers(filter_from):
+                return self.changelog.list_identifiers(
+                    metadataprefix, filter_from, filter_until, filter_set, cursor, self.limit
+                )
+            ... # fall back to querying the full repository
+    ```
+
+    The log can also pin harvests to a snapshot, by returning its `generation` from
+    `DataInterface.get_snapshot()` and passing the `snapshot` on to `list_identifiers()`.
+    """
+    def __init__(self, path: str, bucket: int = 3600, since: datetime|int = None):
+        self.path = path
+        self.bucket = bucket
+        self.since: int = None
+        self._lock = threading.Lock()
+        self._file = None
+        # All changes, where the index is the change seq
+        self._changes: list[Change] = []
+        # identifier => seqs of changes to that identifier, in order
+        self._history: dict[str, list[int]] = {}
+        # bucket => seqs of changes with datestamps in that bucket
+        self._buckets: dict[int, list[int]] = {}
+        self._bucket_ids: list[int] = []
+        self._unsorted: set = set()
+        # bucket => counter incremented whenever results in the bucket may change
+        self._versions: dict[int, int] = {}
+        # (bucket, version, filters) => number of results in the bucket, for seeking
+        self._counts = LRUCache(maxsize=65536)
+        # Length of the log file up to the last complete change
+        self._offset = 0
+        self._load(to_epoch(since) if since is not None else int(time.time()))
+
+    def __len__(self):
+        return len(self._changes)
+
+    @property
+    def generation(self) -> int:
+        """The number of changes recorded so far; increases with every append."""
+        return len(self._changes)
+
+    def _load(self, since: int):
+        """
+        Replay the log file to build the index, creating the file if needed. Replay
+        stops at an incomplete last line, as left by an interrupted write; it is
+        overwritten by the next append. A log with an empty or incomplete header line,
+        as left by an interrupted creation, is started afresh.
+        """
+        try:
+            with open(self.path, "rb") as logf:
+                line = logf.readline()
+                try:
+                    self.since = json.loads(line)["since"] if line.endswith(b"\n") else None
+                except (ValueError, KeyError, TypeError):
+                    self.since = None
+                self._offset = len(line)
+                for line in (logf if self.since is not None else ()):
+                    if not line.endswith(b"\n"):
+                        break
+                    if line.strip():
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break
+                        self._index(*entry)
+                    self._offset += len(line)
+        except FileNotFoundError:
+            self._create(since, "xb")
+        if self.since is None:
+            self._create(since, "wb")
+
+    def _create(self, since: int, mode: str):
+        """Write the header line of a new log file, opened with the given mode."""
+        self.since = since
+        with open(self.path, mode) as logf:
+            line = json.dumps({"oai_repo_changelog": 1, "since": since}) + "\n"
+            self._offset = logf.write(line.encode("utf8"))
+
+    def _index(self, epoch: int, identifier: str, prefixes, status, setspecs):
+        """Add a change to the in-memory index; must be called with the lock held or on load."""
+        change = Change(
+            len(self._changes), epoch, identifier,
+            tuple(prefixes) if prefixes is not None else None, status, tuple(setspecs)
+        )
+        self._changes.append(change)
+        history = self._history.setdefault(identifier, [])
+        if history:
+            # The previous change no longer applies; results within its bucket change
+            superseded = self._bucket_of(self._changes[history[-1]].epoch)
+            self._versions[superseded] += 1
+        history.append(change.seq)
+        bucket = self._bucket_of(epoch)
+        if bucket not in self._buckets:
+            self._buckets[bucket] = []
+            self._versions[bucket] = 0
+            insort(self._bucket_ids, bucket)
+        seqs = self._buckets[bucket]
+        if seqs and self._sort_key(seqs[-1]) > self._sort_key(change.seq):
+            self._unsorted.add(bucket)
+        seqs.append(change.seq)
+        self._versions[bucket] += 1
+        return change
+
+    def _bucket_of(self, epoch: int) -> int:
+        """Return the bucket for the epoch"""
+        return epoch // self.bucket
+
+    def _sort_key(self, seq: int) -> tuple:
+        """Order of changes within results"""
+        change = self._changes[seq]
+        return (change.epoch, change.identifier, change.seq)
+
+    def append(
+        self,
+        identifier: str,
+        datestamp: datetime|int,
+        prefixes: list[str] = None,
+        setspecs: list[str] = None,
+        status: str = None
+    ) -> Change:
+        """
+        Record a change to a record.
+
+        Args:
+            identifier (str): The OAI identifier of the changed record
+            datestamp (datetime|int): The new datestamp of the record
+            prefixes (list): The metadata prefixes the record is available in, or None for all
+            setspecs (list): The setSpec strings the record belongs to
+            status (str): The record status; either None or `deleted`
+
+        Returns:
+            The recorded Change
+        """
+        return self.extend([(identifier, datestamp, prefixes, setspecs, status)])[0]
+
+    def extend(self, changes: list[tuple]) -> list[Change]:
+        """
+        Record multiple changes at once, with a single write to the log file.
+
+        Args:
+            changes (list): Tuples of the arguments accepted by `append()`
+
+        Returns:
+            A list of the recorded Changes
+        """
+        entries = [self._entry(*change) for change in changes]
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf8")
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "r+b") # pylint: disable=consider-using-with
+                # Drop any incomplete change left after the last complete one
+                self._file.seek(self._offset)
+                self._file.truncate()
+            self._file.write(lines)
+            self._file.flush()
+            self._offset += len(lines)
+            return [self._index(*entry) for entry in entries]
+
+    @staticmethod
+    def _entry(identifier, datestamp, prefixes=None, setspecs=None, status=None) -> tuple:
+        """Return the change as stored in the log file"""
+        return (
+            to_epoch(datestamp), identifier,
+            list(prefixes) if prefixes is not None else None,
+            status, list(setspecs or [])
+        )
+
+    def close(self):
+        """Close the log file; it will be re-opened as needed by further appends."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def covers(self, filter_from: datetime|None) -> bool:
+        """
+        Whether the log holds every change on or after the given datetime.
+
+        Args:
+            filter_from (datetime|None): The start of a harvest window; None for no start
+
+        Returns:
+            True if queries for the window can be answered from this log
+        """
+        return (self.since == 0) if filter_from is None else to_epoch(filter_from) >= self.since
+
+    def _bucket_matches(
+        self,
+        bucket: int,
+        metadataprefix: str,
+        lower: int|None,
+        upper: int|None,
+        filter_set: str,
+        generation: int|None
+    ) -> list[Change]:
+        """
+        Return latest changes in the bucket matching the filters as of the generation,
+        in datestamp order. Must be called with the lock held.
+        """
+        seqs = self._buckets[bucket]
+        if bucket in self._unsorted:
+            seqs.sort(key=self._sort_key)
+            self._unsorted.discard(bucket)
+        matches = []
+        for seq in seqs:
+            change = self._changes[seq]
+            if generation is not None and seq >= generation:
+                continue
+            history = self._history[change.identifier]
+            latest = history[-1] if generation is None else \
+                history[bisect_left(history, generation) - 1]
+            if (
+                (lower is not None and change.epoch < lower) or
+                (upper is not None and change.epoch > upper) or
+                latest != seq or
+                (change.prefixes is not None and metadataprefix not in change.prefixes)
+            ):
+                continue
+            if filter_set is not None and not any(
+                spec == filter_set or spec.startswith(filter_set + ":")
+                for spec in change.setspecs
+            ):
+                continue
+            matches.append(change)
+        return matches
+
+    def _page(
+        self,
+        metadataprefix: str,
+        filter_from: datetime,
+        filter_until: datetime,
+        filter_set: str,
+        generation: int|None,
+        cursor: int,
+        limit: int
+    ) -> tuple[list[Change], int, int]:
+        """
+        Return a page of the latest changes matching the filters as of the generation, in
+        datestamp order, the total number of matches, and the sum of versions of the
+        buckets searched. The number of matches in each bucket is cached, so buckets
+        before the cursor or after the page are skipped over without being searched.
+        Must be called with the lock held.
+        """
+        lower = to_epoch(filter_from) if filter_from is not None else None
+        upper = to_epoch(filter_until) if filter_until is not None else None
+        start = bisect_left(self._bucket_ids, self._bucket_of(lower)) if lower is not None else 0
+        end = bisect_right(self._bucket_ids, self._bucket_of(upper)) \
+            if upper is not None else len(self._bucket_ids)
+
+        page, total, version = [], 0, 0
+        skip = cursor
+        for bucket in self._bucket_ids[start:end]:
+            version += self._versions[bucket]
+            key = (bucket, self._versions[bucket], metadataprefix, lower, upper, filter_set,
+                   generation)
+            count = self._counts.get(key, count=False)
+            if count is None or (skip < count and len(page) < limit):
+                matches = self._bucket_matches(
+                    bucket, metadataprefix, lower, upper, filter_set, generation
+                )
+                count = len(matches)
+                self._counts.set(key, count)
+                if skip < count and len(page) < limit:
+                    page.extend(matches[skip:skip + limit - len(page)])
+            skip -= min(skip, count)
+            total += count
+        return page, total, version
+
+    def list_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        limit: int = 100,
+        snapshot: str|int = None
+    ) -> tuple:
+        """
+        Return identifiers of records changed within the window, in the form expected
+        from `DataInterface.list_identifiers()`.
+
+        Args:
+            metadataprefix (str): The metadata prefix to match.
+            filter_from (datetime.datetime): Include only identifiers on or after given datetime.
+            filter_until (datetime.datetime): Include only identifiers on or before given datetime.
+            filter_set (str): Include only identifers within the matching setSpec string.
+            cursor (int): position in results to start retrieving from
+            limit (int): max number of identifiers to return
+            snapshot (str|int): a `generation` of the log to return results as of;
+                                changes recorded since are ignored
+
+        Returns:
+            A tuple of length 3 with the identifiers, the `completeListSize`, and a state
+                value that changes when any change within the window is recorded.
+        """
+        with self._lock:
+            page, size, version = self._page(
+                metadataprefix, filter_from, filter_until, filter_set,
+                int(snapshot) if snapshot is not None else None, cursor, limit
+            )
+        return [change.identifier for change in page], size, version
+
+    def list_headers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        limit: int = 100,
+        snapshot: str|int = None
+    ) -> tuple:
+        """
+        Return headers of records changed within the window, in the form expected
+        from `DataInterface.list_headers()`. Arguments are as for `list_identifiers()`.
+
+        Returns:
+            A tuple of length 3 with the RecordHeaders, the `completeListSize`, and a state
+                value that changes when any change within the window is recorded.
+        """
+        with self._lock:
+            page, size, version = self._page(
+                metadataprefix, filter_from, filter_until, filter_set,
+                int(snapshot) if snapshot is not None else None, cursor, limit
+            )
+        return [self._header(change) for change in page], size, version
+
+    def get_record_header(self, identifier: str) -> RecordHeader|None:
+        """
+        Return a RecordHeader built from the latest change for the identifier.
+
+        Args:
+            identifier (str): An identifier string
+
+        Returns:
+            The RecordHeader, or None if the identifier has no changes in the log.
+        """
+        with self._lock:
+            history = self._history.get(identifier)
+            if not history:
+                return None
+            change = self._changes[history[-1]]
+        return self._header(change)
+
+    @staticmethod
+    def _header(change: Change) -> RecordHeader:
+        """Return a RecordHeader for the change"""
+        return RecordHeader(
+            change.identifier,
+            datetime.fromtimestamp(change.epoch, timezone.utc),
+            list(change.setspecs),
+            change.status
+        )
@@ -0,0 +1,130 @@
+"""
+Circuit breakers for failing fast when a backend is unavailable
+"""
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker for calls to a backend. While `closed`, calls are
+    allowed. After `failure_threshold` consecutive failed calls, or calls slower than
+    `latency_threshold`, the circuit `open`s and calls are refused so they fail fast
+    instead of waiting on the backend. Once `reset_timeout` seconds have passed, a
+    single trial call is allowed (`half_open`); if it succeeds the circuit closes,
+    otherwise it opens again.
+
+    Args:
+        failure_threshold (int): Consecutive failures which open the circuit
+        latency_threshold (float|None): Seconds after which a successful call is
+                                        counted as a failure, or None to ignore latency
+        reset_timeout (float): Seconds the circuit stays open before a trial call
+
+    Attributes:
+        stats (dict): Counts of times the circuit was `opened` and of `rejected` calls
+
+    **Examples:**
+    ```python
+    breaker = oai_repo.CircuitBreaker(failure_threshold=3, latency_threshold=2.0)
+    if not breaker.allow():
+        raise oai_repo.OAIRepoExternalException("Backend unavailable")
+    started = time.monotonic()
+    try:
+        result = call_backend()
+    except BackendError:
+        breaker.record_failure()
+        raise
+    breaker.record_success(time.monotonic() - started)
+    ```
+    """
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        latency_threshold: float|None = None,
+        reset_timeout: float = 30
+    ):
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.stats = {"opened": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def __repr__(self):
+        return f"CircuitBreaker(state={self.state!r}, stats={self.stats})"
+
+    @property
+    def state(self) -> str:
+        """The state of the circuit: `closed`, `open`, or `half_open`"""
+        with self._lock:
+            if self._state == OPEN and self._reset_due():
+                return HALF_OPEN
+            return self._state
+
+    def _reset_due(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.stats["opened"] += 1
+
+    def allow(self) -> bool:
+        """
+        Return whether a call may be made now. When the circuit is due to be reset,
+        only the first caller is allowed, to make the trial call.
+
+        Returns:
+            True if the call may proceed, otherwise the call should fail fast.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._reset_due():
+                self._state = HALF_OPEN
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self, elapsed: float = 0.0):
+        """
+        Record a completed call; calls slower than `latency_threshold` count as failures.
+
+        Args:
+            elapsed (float): Seconds the call took
+        """
+        if self.latency_threshold is not None and elapsed > self.latency_threshold:
+            self.record_failure()
+            return
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit if the threshold is reached."""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or \
+                    (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._open()
+
+    def release(self):
+        """
+        Record a call abandoned without an outcome, such as when the caller ran out
+        of time. If it was the trial call, another trial call is allowed.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = OPEN
+
+    def reset(self):
+        """Close the circuit, clearing any failures."""
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
@@ -0,0 +1,123 @@
+"""
+Request-scoped context for state kept while processing a single OAI request
+"""
+import time
+import contextvars
+from .exceptions import OAIRepoDeadlineException
+
+_CURRENT = contextvars.ContextVar("oai_repo_request_context", default=None)
+
+
+class RequestContext:
+    """
+    State scoped to the processing of a single request. A context is created by
+    `OAIRepository.process()` and is active for the duration of that call, in the
+    thread (or asyncio task) processing the request.
+
+    Attributes:
+        args (dict): A copy of the request arguments
+        started (float): The `time.monotonic()` value when the request started
+        deadline (float|None): The `time.monotonic()` value by which the request must
+                               complete, or None if it has no deadline
+        cache (dict): Per-request caches, keyed by a name for each cache
+        metrics (dict): Per-request measurements and counters
+
+    **Examples:**
+    ```python
+    # From within your DataInterface
+    ctx = oai_repo.current_context()
+    if ctx is not None:
+        ctx.metrics["my_backend_calls"] = ctx.metrics.get("my_backend_calls", 0) + 1
+    ```
+    """
+    def __init__(self, args: dict = None, timeout: float|None = None):
+        self.args: dict = dict(args) if args else {}
+        self.started: float = time.monotonic()
+        self.deadline: float|None = self.started + timeout if timeout is not None else None
+        self.cache: dict = {}
+        self.metrics: dict = {}
+        self._token = None
+
+    def __repr__(self):
+        return f"RequestContext(args={self.args}, metrics={self.metrics})"
+
+    def __enter__(self):
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _CURRENT.reset(self._token)
+        self._token = None
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the request started"""
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float|None:
+        """
+        Return the seconds left until the deadline of the request.
+
+        Returns:
+            The seconds remaining, which are negative once the deadline has passed,
+            or None if the request has no deadline.
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def check_deadline(self):
+        """
+        Check the deadline of the request has not passed.
+
+        Raises:
+            OAIRepoDeadlineException: If the deadline has passed
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise OAIRepoDeadlineException(
+                f"Request deadline passed after {self.elapsed:.3f} seconds"
+            )
+
+
+def current_context() -> RequestContext|None:
+    """
+    Return the context of the request currently being processed.
+
+    Returns:
+        The active RequestContext, or None if not called while processing a request.
+    """
+    return _CURRENT.get()
+
+
+def set_metric(name: str, value):
+    """
+    Set a metric on the context of the request currently being processed, if any.
+
+    Args:
+        name (str): The metric name
+        value (Any): The metric value
+    """
+    ctx = _CURRENT.get()
+    if ctx is not None:
+        ctx.metrics[name] = value
+
+
+def check_deadline():
+    """
+    Check the deadline of the request currently being processed, if any, has not passed.
+    Long running `DataInterface` methods can call this to stop work which would be
+    discarded anyway.
+
+    Raises:
+        OAIRepoDeadlineException: If the deadline has passed
+
+    **Examples:**
+    ```python
+    for identifier in identifiers:
+        oai_repo.check_deadline()
+        records.append(load_record(identifier))
+    ```
+    """
+    ctx = _CURRENT.get()
+    if ctx is not None:
+        ctx.check_deadline()
@@ -0,0 +1,258 @@
+"""
+Crosswalks serving metadata formats derived from another format by XSLT
+"""
+import threading
+from dataclasses import dataclass, field
+from lxml import etree
+from .interfacedata import MetadataFormat, RecordHeader, RecordHeaderBatch
+from .exceptions import OAIRepoInternalException
+from .cache import LRUCache
+
+
+@dataclass
+class DerivedMetadataFormat(MetadataFormat):
+    """
+    A metadata format derived from another format of the repository by an XSLT
+    stylesheet. Pass these to a `Crosswalk` rather than implementing the format
+    in your DataInterface.
+
+    Attributes:
+        metadata_prefix (str): A metadataPrefix string
+        schema (str): The schema for the metadata
+        metadata_namespace (str): The namespace for the metadata
+        source_prefix (str): The metadataPrefix of the format it is derived from
+        stylesheet (str|bytes): The path to the XSLT stylesheet, or the stylesheet as bytes
+        params (dict): String parameters to pass to the stylesheet
+
+    **Examples:**
+    ```python
+    oai_dc = oai_repo.DerivedMetadataFormat(
+        "oai_dc",
+        "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+        "http://www.openarchives.org/OAI/2.0/oai_dc/",
+        source_prefix="mods",
+        stylesheet="xslt/MODS3-7_DC_XSLT1-0.xsl"
+    )
+    ```
+    """
+    source_prefix: str = None
+    stylesheet: str|bytes = None
+    params: dict = field(default_factory=dict)
+
+
+class Crosswalk:
+    """
+    Serves derived metadata formats, by transforming the metadata of their source
+    format from the DataInterface with XSLT.
+
+    Each stylesheet is parsed once, and compiled once in each thread which uses it,
+    as compiled stylesheets may not be shared between threads. The metadata for a
+    page of records is retrieved with a single `DataInterface.get_records_metadata()`
+    call for the source format, and transformed together.
+
+    Derived formats are listed by the repository for records which have their source
+    format. A stylesheet producing an empty result means the record is not available
+    in the derived format.
+
+    Args:
+        formats (list[DerivedMetadataFormat]): The derived formats
+        cache (LRUCache|None): Optional cache of transformed metadata, by identifier,
+                               datestamp, and metadataPrefix, so records are only
+                               transformed again once changed
+
+    Attributes:
+        stats (dict): Counts of records `transformed`, and records `cached` which
+                      were served from the cache
+
+    **Examples:**
+    ```python
+    crosswalk = oai_repo.Crosswalk(
+        [oai_dc, marc21],
+        cache=oai_repo.LRUCache(maxsize=100000, ttl=86400)
+    )
+    repo = oai_repo.OAIRepository(MyOAIData(), crosswalk=crosswalk)
+    ```
+    """
+    def __init__(self, formats: list[DerivedMetadataFormat], cache: LRUCache|None = None):
+        self.formats = {mdformat.metadata_prefix: mdformat for mdformat in formats}
+        self.cache = cache
+        self.stats = {"transformed": 0, "cached": 0}
+        self._lock = threading.Lock()
+        # metadataPrefix => parsed stylesheet document
+        self._documents: dict[str, etree._ElementTree] = {}
+        # Per thread: metadataPrefix => compiled stylesheet
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"Crosswalk(formats={list(self.formats)}, stats={self.stats})"
+
+    def derives(self, metadataprefix: str) -> bool:
+        """Return if the metadataPrefix is a derived format"""
+        return metadataprefix in self.formats
+
+    def source_prefix(self, metadataprefix: str) -> str:
+        """
+        Return the metadataPrefix to retrieve from the DataInterface for a format.
+
+        Args:
+            metadataprefix (str): The metadataPrefix
+
+        Returns:
+            The source prefix of a derived format, otherwise the given prefix.
+        """
+        mdformat = self.formats.get(metadataprefix)
+        return mdformat.source_prefix if mdformat is not None else metadataprefix
+
+    def extend(self, formats: list[MetadataFormat]|None) -> list[MetadataFormat]|None:
+        """
+        Add the derived formats available from the given formats.
+
+        Args:
+            formats (list[MetadataFormat]|None): Formats from the DataInterface
+
+        Returns:
+            The formats followed by the derived formats whose source format is among them.
+        """
+        if not formats:
+            return formats
+        prefixes = {mdformat.metadata_prefix for mdformat in formats}
+        return list(formats) + [
+            mdformat for prefix, mdformat in self.formats.items()
+            if prefix not in prefixes and mdformat.source_prefix in prefixes
+        ]
+
+    def _document(self, metadataprefix: str) -> etree._ElementTree:
+        """Return the parsed stylesheet of a derived format, parsing it on first use"""
+        with self._lock:
+            document = self._documents.get(metadataprefix)
+            if document is None:
+                stylesheet = self.formats[metadataprefix].stylesheet
+                try:
+                    document = etree.parse(stylesheet) if isinstance(stylesheet, str) \
+                        else etree.ElementTree(etree.fromstring(stylesheet))
+                except (OSError, etree.XMLSyntaxError) as exc:
+                    raise OAIRepoInternalException(
+                        f"Unable to load stylesheet for {metadataprefix}: {exc}"
+                    ) from exc
+                self._documents[metadataprefix] = document
+            return document
+
+    def stylesheet(self, metadataprefix: str) -> etree.XSLT:
+        """
+        Return the compiled stylesheet of a derived format for the current thread.
+
+        Args:
+            metadataprefix (str): The metadataPrefix of the derived format
+
+        Returns:
+            The compiled XSLT
+
+        Raises:
+            OAIRepoInternalException: If the stylesheet could not be loaded or compiled
+        """
+        compiled = getattr(self._local, "compiled", None)
+        if compiled is None:
+            compiled = self._local.compiled = {}
+        xslt = compiled.get(metadataprefix)
+        if xslt is None:
+            try:
+                xslt = etree.XSLT(self._document(metadataprefix))
+            except etree.XSLTParseError as exc:
+                raise OAIRepoInternalException(
+                    f"Invalid stylesheet for {metadataprefix}: {exc}"
+                ) from exc
+            compiled[metadataprefix] = xslt
+        return xslt
+
+    def transform(
+        self,
+        metadataprefix: str,
+        metadata: list[etree._Element|bytes|None]
+    ) -> list[etree._Element|None]:
+        """
+        Transform a batch of metadata in the source format to the derived format.
+
+        Args:
+            metadataprefix (str): The metadataPrefix of the derived format
+            metadata (list): The source metadata of each record, as elements or
+                             serialized XML, or None for records without it
+
+        Returns:
+            The derived metadata of each record, or None where not available.
+
+        Raises:
+            OAIRepoInternalException: If the stylesheet is invalid or fails
+        """
+        xslt = self.stylesheet(metadataprefix)
+        params = {
+            key: etree.XSLT.strparam(value)
+            for key, value in self.formats[metadataprefix].params.items()
+        }
+        results = []
+        for source in metadata:
+            if source is None:
+                results.append(None)
+                continue
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                source = etree.fromstring(bytes(source))
+            try:
+                results.append(xslt(source, **params).getroot())
+            except etree.XSLTApplyError as exc:
+                raise OAIRepoInternalException(
+                    f"Stylesheet for {metadataprefix} failed: {exc}"
+                ) from exc
+        with self._lock:
+            self.stats["transformed"] += len(results)
+        return results
+
+    def get_records_metadata(
+        self,
+        data: "DataInterface",
+        identifiers: list[str],
+        metadataprefix: str,
+        headers: list[RecordHeader]|RecordHeaderBatch|None = None
+    ) -> list[etree._Element|bytes|None]:
+        """
+        Return the metadata of records in a derived format, as for
+        `DataInterface.get_records_metadata()`. The source metadata of records not
+        in the cache is retrieved with a single call, and transformed together.
+
+        Args:
+            data (DataInterface): The DataInterface to retrieve the source metadata from
+            identifiers (list[str]): The identifiers of the records
+            metadataprefix (str): The metadataPrefix of the derived format
+            headers (list[RecordHeader]|RecordHeaderBatch|None): The headers of the
+                records, whose datestamps are part of the cache key; the cache is only
+                used if given, and not for records whose header is None
+
+        Returns:
+            The metadata of each record, or None where not available. Metadata is
+                returned serialized when it is cached.
+        """
+        keys = None
+        if self.cache is not None and headers is not None:
+            datestamps = headers.timestamps if isinstance(headers, RecordHeaderBatch) \
+                else [None if header is None else header.datestamp for header in headers]
+            # Records without a header are not cached, but still retrieved
+            keys = [
+                None if datestamp is None else (identifier, datestamp, metadataprefix)
+                for identifier, datestamp in zip(identifiers, datestamps)
+            ]
+        if keys is None:
+            sources = data.get_records_metadata(identifiers, self.source_prefix(metadataprefix))
+            return self.transform(metadataprefix, sources)
+
+        results = [None if key is None else self.cache.get(key) for key in keys]
+        missing = [idx for idx, result in enumerate(results) if result is None]
+        if missing:
+            sources = data.get_records_metadata(
+                [identifiers[idx] for idx in missing], self.source_prefix(metadataprefix)
+            )
+            for idx, derived in zip(missing, self.transform(metadataprefix, sources)):
+                if derived is not None:
+                    results[idx] = etree.tostring(derived)
+                    if keys[idx] is not None:
+                        self.cache.set(keys[idx], results[idx])
+        with self._lock:
+            self.stats["cached"] += len(results) - len(missing)
+        return results
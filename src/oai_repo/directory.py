@@ -0,0 +1,397 @@
+"""
+A ready to use DataInterface for repositories of XML files in a directory
+"""
+import os
+import time
+import hashlib
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import NamedTuple
+from lxml import etree
+from .changelog import to_epoch
+from .exceptions import OAIRepoInternalException
+from .helpers import bytes_to_xml
+from .interface import DataInterface
+from .interfacedata import Identify, MetadataFormat, RecordHeader, Set
+
+INDEX_VERSION = "oai_repo_dirindex\t1"
+
+
+class IndexEntry(NamedTuple):
+    """A record in the index of a DirectoryDataInterface"""
+    stem: str
+    mtime: int
+    prefixes: tuple
+    setspecs: tuple
+
+
+class DirectoryIndex(NamedTuple):
+    """A version of the index of a DirectoryDataInterface, replaced as a whole on refresh"""
+    # stem => entry
+    entries: dict
+    # Entries sorted by (mtime, stem), with their mtimes for bisecting
+    ordered: list
+    mtimes: list
+    # Digest of the index contents, which changes whenever any record changes
+    state: str|None
+
+
+# Sizes of lists are always known and metadata is read per record, so the optional
+# count_identifiers, get_record_bundle and list_records are deliberately left out
+class DirectoryDataInterface(DataInterface):  # pylint: disable=abstract-method
+    """
+    A DataInterface serving records stored as one XML file per record and format
+    under a directory, such as `maps/1901/sheet-4.xml`.
+
+    A header index of every record is kept in memory and persisted to an index file, so
+    listing records never walks the directory or parses files. The index is refreshed
+    incrementally, only re-reading sidecar files of records whose files have changed,
+    and metadata files are only read when the metadata is requested. Once
+    `refresh_interval` has passed, a request starts a refresh in a background thread,
+    and requests continue using the current index until the refreshed one is swapped in.
+
+    Each record's identifier is the `identifier_prefix` followed by its path within the
+    directory (without the file suffix), and its datestamp is the latest modification
+    time of its files. Record sets are either given by its directory path (`maps/1901`
+    is in the set `maps:1901`, and so within the `maps` set), or by a sidecar file
+    next to the record (`sheet-4.sets`) listing one setSpec per line.
+
+    Args:
+        root (str): The directory holding the records
+        identify (Identify): The Identify for the repository
+        formats (list): The MetadataFormats available in the repository
+        identifier_prefix (str): Prefix for identifiers, e.g. `oai:example.edu:`
+        suffixes (dict): Mapping of metadataPrefix to the suffix of files holding metadata
+                         in that format. Defaults to `.xml` for a single format, otherwise
+                         `.{metadataPrefix}.xml`.
+        sets (str|None): Where record sets come from; `path`, `sidecar`, or None for no sets
+        set_names (dict): Mapping of setSpec to setName; setSpecs not in the mapping
+                          use the setSpec as the name
+        index_path (str): Path of the persisted index; defaults to `.oai_repo_index` in the root
+        refresh_interval (float): Min seconds between refreshing the index in the background
+                                  while serving requests
+
+    **Examples:**
+    ```python
+    data = oai_repo.DirectoryDataInterface(
+        "/srv/oai/records",
+        identify,
+        [oai_dc_format],
+        identifier_prefix="oai:example.edu:",
+    )
+    repo = oai_repo.OAIRepository(data)
+    ```
+    """
+    def __init__(
+        self,
+        root: str,
+        identify: Identify,
+        formats: list[MetadataFormat],
+        identifier_prefix: str = "",
+        suffixes: dict[str, str] = None,
+        sets: str|None = "path",
+        set_names: dict = None,
+        index_path: str = None,
+        refresh_interval: float = 60
+    ):
+        if sets not in ("path", "sidecar", None):
+            raise OAIRepoInternalException(f"Unknown source for sets: {sets}")
+        self.root = root
+        self.identify = identify
+        self.formats = formats
+        self.identifier_prefix = identifier_prefix
+        if suffixes is None:
+            suffixes = {formats[0].metadata_prefix: ".xml"} if len(formats) == 1 else {
+                mdformat.metadata_prefix: f".{mdformat.metadata_prefix}.xml"
+                for mdformat in formats
+            }
+        # Longest suffixes first, so that `.mods.xml` is matched before `.xml`
+        self.suffixes = dict(sorted(suffixes.items(), key=lambda item: -len(item[1])))
+        self.sets = sets
+        self.set_names = set_names or {}
+        self.index_path = index_path or os.path.join(root, ".oai_repo_index")
+        self.refresh_interval = refresh_interval
+        # Held while refreshing; requests read the current index without it
+        self._lock = threading.Lock()
+        self._refreshed = None
+        self._refreshing = False
+        self._due_lock = threading.Lock()
+        self._index = DirectoryIndex({}, [], [], None)
+        self._load()
+        self.refresh()
+
+    @property
+    def state(self) -> str|None:
+        """Digest of the index contents, which changes whenever any record changes"""
+        return self._index.state
+
+    def _load(self):
+        """Load the persisted index, if any."""
+        try:
+            with open(self.index_path, "r", encoding="utf8") as indexf:
+                if indexf.readline().rstrip("\n") != INDEX_VERSION:
+                    return
+                entries = {}
+                for line in indexf:
+                    stem, mtime, prefixes, setspecs = line.rstrip("\n").split("\t")
+                    entries[stem] = IndexEntry(
+                        stem, int(mtime), tuple(prefixes.split(",")),
+                        tuple(setspecs.split(" ")) if setspecs else ()
+                    )
+                self._index = DirectoryIndex(entries, [], [], None)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _serialize(ordered: list[IndexEntry]) -> str:
+        """Return the index of the sorted entries in its persisted form"""
+        return INDEX_VERSION + "\n" + "".join(
+            "\t".join((
+                entry.stem, str(entry.mtime), ",".join(entry.prefixes), " ".join(entry.setspecs)
+            )) + "\n"
+            for entry in ordered
+        )
+
+    def _save(self, serialized: str):
+        """Persist the index, atomically replacing the previous index file."""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as indexf:
+            indexf.write(serialized)
+        os.replace(tmp_path, self.index_path)
+
+    def _scan(self) -> dict[str, tuple[int, list[str]]]:
+        """
+        Walk the directory, returning the latest mtime and metadata prefixes for each
+        record stem. Only directory entries are stat'ed; no files are read.
+        """
+        found = {}
+        pending = [""]
+        while pending:
+            reldir = pending.pop()
+            with os.scandir(os.path.join(self.root, reldir)) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    relpath = f"{reldir}/{entry.name}" if reldir else entry.name
+                    if "\t" in relpath or "\n" in relpath:
+                        # Not representable in the index file
+                        continue
+                    if entry.is_dir():
+                        pending.append(relpath)
+                        continue
+                    mtime = int(entry.stat().st_mtime)
+                    if self.sets == "sidecar" and relpath.endswith(".sets"):
+                        stem, prefix = relpath[:-len(".sets")], None
+                    else:
+                        prefix = next((
+                            prefix for prefix, suffix in self.suffixes.items()
+                            if relpath.endswith(suffix)
+                        ), None)
+                        if prefix is None:
+                            continue
+                        stem = relpath[:-len(self.suffixes[prefix])]
+                    record = found.setdefault(stem, [0, []])
+                    record[0] = max(record[0], mtime)
+                    if prefix is not None:
+                        record[1].append(prefix)
+        return found
+
+    def _setspecs(self, stem: str) -> tuple:
+        """Return the setSpecs of a record"""
+        if self.sets == "path":
+            return (stem.rsplit("/", 1)[0].replace("/", ":"),) if "/" in stem else ()
+        if self.sets == "sidecar":
+            try:
+                with open(os.path.join(self.root, stem + ".sets"), "r", encoding="utf8") as setf:
+                    return tuple(line.strip() for line in setf if line.strip())
+            except FileNotFoundError:
+                pass
+        return ()
+
+    def refresh(self, force: bool = True) -> bool:
+        """
+        Update the index from the modification times of files in the directory, persisting
+        the index if it changed. Sidecar files are only read for new or changed records.
+        Requests continue to use the current index while the directory is walked, and the
+        new index replaces it at once.
+
+        Args:
+            force (bool): If False, only refresh if `refresh_interval` has passed
+                          since the last refresh
+
+        Returns:
+            True if the index changed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._refreshed is not None and \
+                    now - self._refreshed < self.refresh_interval:
+                return False
+            self._refreshed = now
+            current = self._index
+            changed = False
+            entries = {}
+            for stem, (mtime, prefixes) in self._scan().items():
+                if not prefixes:
+                    continue
+                prefixes = tuple(sorted(prefixes))
+                entry = current.entries.get(stem)
+                if entry is None or entry.mtime != mtime or entry.prefixes != prefixes:
+                    entry = IndexEntry(stem, mtime, prefixes, self._setspecs(stem))
+                    changed = True
+                entries[stem] = entry
+            changed = changed or len(entries) != len(current.entries)
+            if changed or current.state is None:
+                ordered = sorted(entries.values(), key=lambda entry: (entry.mtime, entry.stem))
+                serialized = self._serialize(ordered)
+                self._index = DirectoryIndex(
+                    entries, ordered, [entry.mtime for entry in ordered],
+                    hashlib.blake2b(serialized.encode("utf8"), digest_size=8).hexdigest()
+                )
+                if changed:
+                    self._save(serialized)
+            return changed
+
+    def refresh_due(self):
+        """
+        Start refreshing the index in a background thread, if `refresh_interval` has passed
+        since the last refresh and no refresh is running. Called while serving requests.
+        """
+        with self._due_lock:
+            if self._refreshing or (
+                self._refreshed is not None and
+                time.monotonic() - self._refreshed < self.refresh_interval
+            ):
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._refresh_background, name="oai-directory-refresh", daemon=True
+        ).start()
+
+    def _refresh_background(self):
+        """Refresh the index, as run by the thread started by `refresh_due()`"""
+        try:
+            self.refresh(force=False)
+        finally:
+            with self._due_lock:
+                self._refreshing = False
+
+    def identifier(self, stem: str) -> str:
+        """Return the identifier for a record"""
+        return self.identifier_prefix + stem
+
+    def entry(self, identifier: str) -> IndexEntry|None:
+        """Return the index entry for an identifier"""
+        if not identifier.startswith(self.identifier_prefix):
+            return None
+        return self._index.entries.get(identifier[len(self.identifier_prefix):])
+
+    def header(self, entry: IndexEntry) -> RecordHeader:
+        """Return the RecordHeader for an index entry"""
+        return RecordHeader(
+            self.identifier(entry.stem),
+            datetime.fromtimestamp(entry.mtime, timezone.utc),
+            list(entry.setspecs)
+        )
+
+    def get_identify(self) -> Identify:
+        return self.identify
+
+    def is_valid_identifier(self, identifier: str) -> bool:
+        return self.entry(identifier) is not None
+
+    def get_metadata_formats(self, identifier: str|None = None) -> list[MetadataFormat]:
+        if identifier is None:
+            return list(self.formats)
+        entry = self.entry(identifier)
+        return [
+            mdformat for mdformat in self.formats
+            if entry and mdformat.metadata_prefix in entry.prefixes
+        ]
+
+    def get_record_header(self, identifier: str) -> RecordHeader|None:
+        entry = self.entry(identifier)
+        return self.header(entry) if entry is not None else None
+
+    def get_record_metadata(self, identifier: str, metadataprefix: str) -> etree._Element|None:
+        entry = self.entry(identifier)
+        if entry is None or metadataprefix not in entry.prefixes:
+            return None
+        path = os.path.join(self.root, entry.stem + self.suffixes[metadataprefix])
+        try:
+            with open(path, "rb") as xmlf:
+                return bytes_to_xml(xmlf.read())
+        except FileNotFoundError:
+            # Removed since the index was last refreshed
+            return None
+
+    def get_record_abouts(self, identifier: str) -> list[etree._Element]:
+        return []
+
+    def list_set_specs(self, identifier: str=None, cursor: int=0) -> tuple:
+        if self.sets is None:
+            return None, None, None
+        if identifier is not None:
+            entry = self.entry(identifier)
+            return (list(entry.setspecs) if entry is not None else []), None, None
+        setspecs = set()
+        index = self._index
+        for entry in index.ordered:
+            for setspec in entry.setspecs:
+                # Include all ancestors of each set in the hierarchy
+                parts = setspec.split(":")
+                setspecs.update(":".join(parts[:idx]) for idx in range(1, len(parts) + 1))
+        return sorted(setspecs), len(setspecs), index.state
+
+    def get_set(self, setspec: str) -> Set|None:
+        if setspec not in (self.list_set_specs()[0] or []):
+            return None
+        return Set(setspec, self.set_names.get(setspec, setspec), [])
+
+    def matching(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None
+    ) -> tuple[list[IndexEntry], str]:
+        """
+        Return the index entries matching the filters in datestamp order, and the
+        state of the index they are from.
+        """
+        self.refresh_due()
+        index = self._index
+        entries, mtimes = index.ordered, index.mtimes
+        start = bisect_left(mtimes, to_epoch(filter_from)) if filter_from else 0
+        end = bisect_right(mtimes, to_epoch(filter_until)) if filter_until else len(entries)
+        matched = [
+            entry for entry in entries[start:end]
+            if metadataprefix in entry.prefixes and (filter_set is None or any(
+                setspec == filter_set or setspec.startswith(filter_set + ":")
+                for setspec in entry.setspecs
+            ))
+        ]
+        return matched, index.state
+
+    def list_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0
+    ) -> tuple:
+        matched, state = self.matching(metadataprefix, filter_from, filter_until, filter_set)
+        page = matched[cursor:cursor + self.limit]
+        return [self.identifier(entry.stem) for entry in page], len(matched), state
+
+    def list_headers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        matched, state = self.matching(metadataprefix, filter_from, filter_until, filter_set)
+        page = matched[cursor:cursor + self.limit]
+        return [self.header(entry) for entry in page], len(matched), state
@@ -11,6 +11,21 @@ class OAIRepoInternalException(OAIRepoException):
 class OAIRepoExternalException(OAIRepoException):
     """Base class for failures external to oai_repo"""
 
+class OAIRepoUnavailableException(OAIRepoExternalException):
+    """
+    Raised when a request cannot be served now, but may be retried later; respond
+    with HTTP 503 and a `Retry-After` header of `retry_after` seconds.
+    """
+    def __init__(self, message: str = "", retry_after: int|None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class OAIRepoDeadlineException(OAIRepoUnavailableException):
+    """Raised when the deadline for a request passed before its response was complete"""
+
+class OAIRepoOverloadedException(OAIRepoUnavailableException):
+    """Raised when a request is refused by admission control, to shed excess load"""
+
 class OAIError(Exception):
     """Shared base class for official OAI errors."""
     @classmethod
@@ -4,10 +4,11 @@ Implementation of GetRecord verb
 from datetime import datetime
 from lxml import etree
 from .request import OAIRequest
-from .response import OAIResponse
+from .response import OAIResponse, RAW_METADATA_PI
 from .exceptions import OAIErrorIdDoesNotExist, OAIErrorCannotDisseminateFormat
-from .helpers import granularity_format
-from .interfacedata import RecordHeader
+from .helpers import granularity_format, timestamp_format, timestamps_format, bytes_to_xml
+from .interfacedata import RecordHeader, RecordHeaderBatch, RecordBundle
+from .context import current_context, set_metric, check_deadline
 
 
 class GetRecordRequest(OAIRequest):
@@ -44,13 +45,27 @@ class GetRecordResponse(OAIResponse):
         return f"GetRecordResponse(identifier={self.request.identifier},"\
                f"metadataprefix={self.request.metadataprefix})"
 
+    def metadata_prefix(self) -> str|None:
+        return self.request.metadataprefix
+
     def body(self) -> etree.Element:
         """Response body"""
         identifier, metadataprefix = self.request.identifier, self.request.metadataprefix
+        # Derived formats are transformed from the metadata of their source format
+        if not self.repository.is_derived(metadataprefix):
+            try:
+                bundle = self.repository.data.get_record_bundle(identifier, metadataprefix)
+            except NotImplementedError:
+                pass
+            else:
+                set_metric("data_path", "get_record_bundle")
+                return self.bundle_body(bundle)
+        set_metric("data_path", "get_records")
+
         if not self.repository.data.is_valid_identifier(identifier):
             raise OAIErrorIdDoesNotExist("The given identifier does not exist.")
 
-        mdformats = self.repository.data.get_metadata_formats(identifier)
+        mdformats = self.repository.get_metadata_formats(identifier)
         if metadataprefix not in [mdf.metadata_prefix for mdf in mdformats]:
             raise OAIErrorCannotDisseminateFormat(
                 "The requested metadataPrefix does not exist for the given identifier."
@@ -60,24 +75,103 @@ class GetRecordResponse(OAIResponse):
         add_records(self.repository, [identifier], metadataprefix, xmlb)
         return xmlb
 
-def add_header(repository: "OAIRepository", header: RecordHeader, xmlb: etree._Element):
+    def bundle_body(self, bundle: RecordBundle|None) -> etree.Element:
+        """Response body from a RecordBundle"""
+        if bundle is None:
+            raise OAIErrorIdDoesNotExist("The given identifier does not exist.")
+        if self.request.metadataprefix not in bundle.metadata_prefixes:
+            raise OAIErrorCannotDisseminateFormat(
+                "The requested metadataPrefix does not exist for the given identifier."
+            )
+
+        xmlb = etree.Element("GetRecord")
+        add_record(self.repository, bundle.header, bundle.metadata, bundle.abouts, xmlb)
+        return xmlb
+
+def add_header(
+    repository: "OAIRepository",
+    header: RecordHeader|RecordHeaderBatch,
+    xmlb: etree._Element,
+    index: int|None = None
+):
     """
     Append a OAI <header> element for a given RecordHeader to an XML element.
 
     Args:
         repository (OAIRepository): An instantiated repository class
-        header (RecordHeader): A RecordHeader instance
+        header (RecordHeader|RecordHeaderBatch): A RecordHeader instance, or a batch
+                                                 of headers
         xmlb (lxml.etree._Element): The element to add the header to
+        index (int|None): The index of the header in the batch
+
+    Raises:
+        OAIRepoDeadlineException: If the deadline of the request has passed
+    """
+    check_deadline()
+    granularity = repository.get_identify().granularity
+    if isinstance(header, RecordHeaderBatch):
+        _append_header(
+            xmlb,
+            header.identifiers[index],
+            timestamp_format(granularity, header.timestamps[index]),
+            header.setspecs[index],
+            header.is_deleted(index)
+        )
+    else:
+        _append_header(
+            xmlb,
+            header.identifier,
+            granularity_format(granularity, header.datestamp)
+                if isinstance(header.datestamp, datetime) else header.datestamp,
+            header.setspecs,
+            header.status == "deleted"
+        )
+
+def add_headers(
+    repository: "OAIRepository",
+    headers: list[RecordHeader]|RecordHeaderBatch,
+    xmlb: etree._Element
+):
     """
+    Append OAI <header> elements for the given headers to an XML element. The
+    datestamps of a RecordHeaderBatch are formatted together for the page.
+
+    Args:
+        repository (OAIRepository): An instantiated repository class
+        headers (list[RecordHeader]|RecordHeaderBatch): The headers to add
+        xmlb (lxml.etree._Element): The element to add the headers to
+
+    Raises:
+        OAIRepoDeadlineException: If the deadline of the request has passed
+    """
+    if not isinstance(headers, RecordHeaderBatch):
+        for header in headers:
+            # Records removed since being listed have no header
+            if header is not None:
+                add_header(repository, header, xmlb)
+        return
+    datestamps = timestamps_format(repository.get_identify().granularity, headers.timestamps)
+    rows = zip(headers.identifiers, datestamps, headers.setspecs)
+    for idx, (identifier, datestamp, setspecs) in enumerate(rows):
+        check_deadline()
+        _append_header(xmlb, identifier, datestamp, setspecs, headers.is_deleted(idx))
+
+def _append_header(
+    xmlb: etree._Element,
+    identifier: str,
+    datestamp: str,
+    setspecs: list[str],
+    deleted: bool = False
+):
+    """Append a <header> element with the given values"""
     xhead = etree.SubElement(xmlb, "header")
+    if deleted:
+        xhead.set("status", "deleted")
     xident = etree.SubElement(xhead, "identifier")
-    xident.text = header.identifier
+    xident.text = identifier
     xstamp = etree.SubElement(xhead, "datestamp")
-    xstamp.text = granularity_format(
-        repository.data.get_identify().granularity,
-        header.datestamp
-    ) if isinstance(header.datestamp, datetime) else header.datestamp
-    for setspec in header.setspecs:
+    xstamp.text = datestamp
+    for setspec in setspecs:
         xset = etree.SubElement(xhead, "setSpec")
         xset.text = setspec
 
@@ -101,22 +195,69 @@ def add_records(
         int The count of records added to the XML
     """
     count = 0
-    recmetas = repository.data.get_records_metadata(identifiers, metadataprefix)
-    recheads = repository.data.get_records_header(identifiers)
+    if repository.is_derived(metadataprefix):
+        recheads = repository.data.get_records_header(identifiers)
+        recmetas = repository.crosswalk.get_records_metadata(
+            repository.data, identifiers, metadataprefix, recheads
+        )
+    else:
+        recmetas = repository.data.get_records_metadata(identifiers, metadataprefix)
+        recheads = repository.data.get_records_header(identifiers)
     recabouts = repository.data.get_records_abouts(identifiers)
 
+    if isinstance(recheads, RecordHeaderBatch):
+        for idx, (recmeta, recabout) in enumerate(zip(recmetas, recabouts)):
+            count += add_record(repository, recheads, recmeta, recabout, xmlb, idx)
+        return count
     for recmeta, rechead, recabout in zip(recmetas, recheads, recabouts):
-        if recmeta is None:
-            continue
-        xrec = etree.SubElement(xmlb, "record")
-        # Header
-        add_header(repository, rechead, xrec)
-        # Metadata
-        xmeta = etree.SubElement(xrec, "metadata")
-        xmeta.append(recmeta)
-        # About
-        for about in recabout:
-            xabout = etree.SubElement(xrec, "about")
-            xabout.append(about)
-        count += 1
+        count += add_record(repository, rechead, recmeta, recabout, xmlb)
     return count
+
+def add_record(
+    repository: "OAIRepository",
+    header: RecordHeader|RecordHeaderBatch,
+    metadata: etree._Element|bytes|memoryview|None,
+    abouts: list[etree._Element],
+    xmlb: etree._Element,
+    index: int|None = None
+) -> bool:
+    """
+    Append a <record> OAI element to an XML doc, unless there is no metadata.
+
+    Metadata given as serialized XML is not parsed while processing a request; a
+    placeholder is added instead, which is replaced by the bytes when the response
+    is serialized.
+
+    Args:
+        repository (OAIRepository): An instantiated repository class
+        header (RecordHeader|RecordHeaderBatch): The header for the record, or a batch
+                                                 of headers
+        metadata (lxml.etree._Element|bytes|memoryview|None): The metadata for the record
+        abouts (list): The elements to wrap in <about> tags
+        xmlb (lxml.etree._Element): The element to add the record to
+        index (int|None): The index of the header in the batch
+
+    Returns:
+        True if the record was added
+    """
+    if metadata is None:
+        return False
+    xrec = etree.SubElement(xmlb, "record")
+    # Header
+    add_header(repository, header, xrec, index)
+    # Metadata
+    xmeta = etree.SubElement(xrec, "metadata")
+    if isinstance(metadata, (bytes, bytearray, memoryview)):
+        ctx = current_context()
+        if ctx is None:
+            metadata = bytes_to_xml(bytes(metadata))
+        else:
+            raw = ctx.cache.setdefault("raw_metadata", [])
+            raw.append(metadata)
+            metadata = etree.ProcessingInstruction(RAW_METADATA_PI, str(len(raw) - 1))
+    xmeta.append(metadata)
+    # About
+    for about in abouts:
+        xabout = etree.SubElement(xrec, "about")
+        xabout.append(about)
+    return True
@@ -0,0 +1,108 @@
+"""
+Latency tracking and load limits for hedging slow backend calls
+"""
+import math
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    A thread-safe record of the latencies of the most recent calls to a backend,
+    for deriving how long a call may take before it is considered slow.
+
+    Args:
+        window (int): Number of recent latencies to keep
+        min_samples (int): Latencies needed before percentiles are reported
+
+    **Examples:**
+    ```python
+    tracker = oai_repo.LatencyTracker()
+    tracker.record(0.120)
+    p95 = tracker.percentile(95)
+    ```
+    """
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, elapsed: float):
+        """
+        Record the latency of a call.
+
+        Args:
+            elapsed (float): Seconds the call took
+        """
+        with self._lock:
+            self._samples.append(elapsed)
+
+    def percentile(self, percent: float) -> float|None:
+        """
+        Return the given percentile of recent latencies, using the nearest-rank method.
+
+        Args:
+            percent (float): The percentile, from 0 to 100
+
+        Returns:
+            The latency in seconds, or None if fewer than `min_samples` were recorded.
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        rank = max(math.ceil(percent / 100 * len(samples)), 1)
+        return samples[rank - 1]
+
+
+class HedgeBudget:
+    """
+    A thread-safe token bucket capping the extra load from hedged calls to a fraction of
+    all calls. Each call adds `ratio` of a token, up to `burst` tokens, and each hedged
+    call spends a whole token.
+
+    Args:
+        ratio (float): Max hedged calls, as a fraction of all calls
+        burst (float): Max tokens saved up while calls are not being hedged
+
+    Attributes:
+        stats (dict): Counts of `calls`, `hedged` calls and `denied` hedges
+
+    **Examples:**
+    ```python
+    budget = oai_repo.HedgeBudget(ratio=0.05)
+    budget.record_call()
+    if response_is_slow and budget.try_hedge():
+        ...
+    ```
+    """
+    def __init__(self, ratio: float = 0.05, burst: float = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self.stats = {"calls": 0, "hedged": 0, "denied": 0}
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+
+    def record_call(self):
+        """Record a call, adding to the tokens available for hedging."""
+        with self._lock:
+            self.stats["calls"] += 1
+            self._tokens = min(self._tokens + self.ratio, self.burst)
+
+    def try_hedge(self) -> bool:
+        """
+        Spend a token on a hedged call, if available.
+
+        Returns:
+            True if the call may be hedged.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                self.stats["denied"] += 1
+                return False
+            self._tokens -= 1
+            self.stats["hedged"] += 1
+            return True
@@ -2,13 +2,44 @@
 These are functions which may prove useful when implementing your
 your custom DataInterface instance.
 """
+import os
 import json
-from datetime import datetime
+import math
+import time
+import itertools
+import threading
+import importlib
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, timezone
+from typing import Iterable
 from io import BytesIO
-import requests
-import jsonpath_ng
+from urllib.parse import urlsplit
 from lxml import etree
-from .exceptions import OAIRepoInternalException, OAIRepoExternalException
+from .exceptions import (
+    OAIRepoInternalException, OAIRepoExternalException, OAIRepoDeadlineException
+)
+from .context import current_context
+from .cache import LRUCache
+from .circuit import CircuitBreaker
+from .hedge import LatencyTracker, HedgeBudget
+
+# Dependencies which are slow to import, so are only imported when first used
+LAZY_MODULES = ("requests", "jsonpath_ng")
+
+def _lazy_import(name: str):
+    """Return the module, importing it if not yet imported"""
+    module = globals().get(name)
+    if module is None:
+        module = importlib.import_module(name)
+        globals()[name] = module
+    return module
+
+def __getattr__(name: str):
+    """Allow access to lazily imported modules, e.g. `helpers.requests`"""
+    if name in LAZY_MODULES:
+        return _lazy_import(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def bytes_to_xml(bdata: bytes|BytesIO) -> etree._Element:
     """
@@ -50,7 +81,7 @@ def datestamp_short(timestamp: datetime) -> str:
     timestr = helpers.datestamp_short(datetime.now())
     ```
     """
-    return timestamp.strftime("%Y-%m-%d")
+    return f"{timestamp.year:04d}-{timestamp.month:02d}-{timestamp.day:02d}"
 
 def datestamp_long(timestamp: datetime) -> str:
     """
@@ -70,7 +101,10 @@ def datestamp_long(timestamp: datetime) -> str:
     timestr = helpers.datestamp_long(datetime.now())
     ```
     """
-    return timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        f"{timestamp.year:04d}-{timestamp.month:02d}-{timestamp.day:02d}"
+        f"T{timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}Z"
+    )
 
 def granularity_format(granularity: str, timestamp: datetime) -> str:
     """
@@ -94,6 +128,178 @@ def granularity_format(granularity: str, timestamp: datetime) -> str:
         if granularity == "YYYY-MM-DD" \
         else datestamp_long(timestamp)
 
+# Ordinal of the first day of POSIX time
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+@functools.lru_cache(maxsize=4096)
+def _day_datestamp(day: int) -> str:
+    """Return the YYYY-MM-DD datestamp for the number of days since the epoch"""
+    return datestamp_short(date.fromordinal(_EPOCH_ORDINAL + day))
+
+def timestamp_format(granularity: str, timestamp: float) -> str:
+    """
+    Format a POSIX timestamp in UTC according to the OAI granularity and return it.
+    Faster than `granularity_format()` as no datetime is created, and the date part
+    is memoized, as many records typically share a day.
+
+    Args:
+        granularity (str): The granularity from OAI (either `YYYY-MM-DDThh:mm:ssZ` or `YYYY-MM-DD`)
+        timestamp (float): A POSIX timestamp
+
+    Returns:
+        A granularity formatted date string appropriate to the granularity passed in
+
+    **Examples:**
+    ```python
+    from oai_repo import helpers
+    timestr = helpers.timestamp_format("YYYY-MM-DDThh:mm:ssZ", 1577836800.0)
+    # "2020-01-01T00:00:00Z"
+    ```
+    """
+    day, seconds = divmod(math.floor(timestamp), 86400)
+    datestamp = _day_datestamp(day)
+    if granularity == "YYYY-MM-DD":
+        return datestamp
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{datestamp}T{hours:02d}:{minutes:02d}:{seconds:02d}Z"
+
+def timestamps_format(granularity: str, timestamps: Iterable[float]) -> list[str]:
+    """
+    Format a page of POSIX timestamps in UTC according to the OAI granularity, as with
+    `timestamp_format()`. Repeated timestamps are only formatted once.
+
+    Args:
+        granularity (str): The granularity from OAI (either `YYYY-MM-DDThh:mm:ssZ` or `YYYY-MM-DD`)
+        timestamps (Iterable[float]): The POSIX timestamps
+
+    Returns:
+        A list of the formatted date strings, in the same order as the timestamps
+
+    **Examples:**
+    ```python
+    from oai_repo import helpers
+    timestrs = helpers.timestamps_format("YYYY-MM-DD", batch.timestamps)
+    ```
+    """
+    formatted = {}
+    results = []
+    for timestamp in timestamps:
+        datestamp = formatted.get(timestamp)
+        if datestamp is None:
+            datestamp = formatted[timestamp] = timestamp_format(granularity, timestamp)
+        results.append(datestamp)
+    return results
+
+@functools.lru_cache(maxsize=256)
+def parse_datestamp(datestr: str, granularity: str = "YYYY-MM-DDThh:mm:ssZ") -> datetime:
+    """
+    Parse an OAI datestamp into a UTC datetime. Datestamps of either granularity
+    are allowed when the granularity is `YYYY-MM-DDThh:mm:ssZ`, but only
+    `YYYY-MM-DD` datestamps otherwise. Parsed datestamps are memoized, as the
+    same `from` and `until` arguments are parsed for every page of a harvest.
+
+    Args:
+        datestr (str): The datestamp
+        granularity (str): The granularity from OAI (either `YYYY-MM-DDThh:mm:ssZ` or `YYYY-MM-DD`)
+
+    Returns:
+        The datetime, in UTC
+
+    Raises:
+        ValueError: If the datestamp is not valid for the granularity
+
+    **Examples:**
+    ```python
+    from oai_repo import helpers
+    helpers.parse_datestamp("2020-01-01T12:30:00Z")
+    ```
+    """
+    datestr = datestr.strip()
+    try:
+        if (
+            len(datestr) == 10 and datestr[4] == datestr[7] == "-" and
+            datestr[:4].isdigit() and datestr[5:7].isdigit() and datestr[8:].isdigit()
+        ):
+            return datetime(
+                int(datestr[:4]), int(datestr[5:7]), int(datestr[8:]), tzinfo=timezone.utc
+            )
+        if (
+            granularity == "YYYY-MM-DDThh:mm:ssZ" and len(datestr) == 20 and
+            datestr[10] == "T" and datestr[13] == datestr[16] == ":" and datestr[19] == "Z" and
+            datestr[4] == datestr[7] == "-" and
+            datestr[:4].isdigit() and datestr[5:7].isdigit() and datestr[8:10].isdigit() and
+            datestr[11:13].isdigit() and datestr[14:16].isdigit() and datestr[17:19].isdigit()
+        ):
+            return datetime(
+                int(datestr[:4]), int(datestr[5:7]), int(datestr[8:10]),
+                int(datestr[11:13]), int(datestr[14:16]), int(datestr[17:19]),
+                tzinfo=timezone.utc
+            )
+    except ValueError:
+        pass
+    # Fall back to the permissive parsing of strptime, for unpadded values and the like
+    datefmts = ["%Y-%m-%d"]
+    if granularity == "YYYY-MM-DDThh:mm:ssZ":
+        datefmts.append("%Y-%m-%dT%H:%M:%SZ")
+    for datefmt in datefmts:
+        try:
+            return datetime.strptime(datestr, datefmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid datestamp for granularity {granularity}: {datestr}")
+
+@functools.lru_cache(maxsize=256)
+def compile_jsonpath(path: str) -> "jsonpath_ng.JSONPath":
+    """
+    Compile a JSONPath, returning the compiled expression. Compiled expressions are
+    cached, so each path is only compiled once.
+
+    Args:
+        path (str): The JSONPath to compile
+
+    Returns:
+        The compiled jsonpath_ng expression
+
+    Raises:
+        jsonpath_ng.exceptions.JSONPathError: On jsonpath failure
+
+    **Examples:**
+    ```python
+    # Compile ahead of the first request, in DataInterface.warm()
+    helpers.compile_jsonpath('$.docs[*].id')
+    ```
+    """
+    return _lazy_import("jsonpath_ng").parse(path)
+
+def compile_xpath(path: str, namespaces: dict = None) -> etree.XPath:
+    """
+    Compile an XPath with the given namespaces, returning the compiled expression.
+    Compiled expressions are cached, so each path is only compiled once.
+
+    Args:
+        path (str): The xpath query
+        namespaces (dict): Mapping of namespace prefixes used in the query
+
+    Returns:
+        The compiled lxml.etree.XPath
+
+    Raises:
+        lxml.etree.XPathError: On xpath failure
+
+    **Examples:**
+    ```python
+    find_ids = helpers.compile_xpath("/response/result/doc/str[name=id]/text()")
+    ids = find_ids(loaded_xml)
+    ```
+    """
+    return _compile_xpath(path, frozenset((namespaces or {}).items()))
+
+@functools.lru_cache(maxsize=256)
+def _compile_xpath(path: str, namespaces: frozenset) -> etree.XPath:
+    """Cached compilation of XPaths, with namespaces as hashable items"""
+    return etree.XPath(path, namespaces=dict(namespaces))
+
 def jsonpath_find(data: dict|list, path: str) -> list:
     """
     Get all matching values for a given JSONPath.
@@ -113,8 +319,7 @@ def jsonpath_find(data: dict|list, path: str) -> list:
     ids = helpers.jsonpath_find(loaded_json, '$.docs[*].id')
     ```
     """
-    pattern = jsonpath_ng.parse(path)
-    matches = pattern.find(data)
+    matches = compile_jsonpath(path).find(data)
     return [match.value for match in matches]
 
 def jsonpath_find_first(data: dict|list, path: str) -> any:
@@ -158,7 +363,7 @@ def xpath_find(xmlr: etree.Element, path: str) -> list:
     ids = helpers.xpath_find(loaded_xml, "/response/result/doc/str[name=id]/text()")
     ```
     """
-    return xmlr.xpath(path, namespaces=xmlr.nsmap)
+    return compile_xpath(path, xmlr.nsmap)(xmlr)
 
 def xpath_find_first(xmlr: etree.Element, path: str) -> any:
     """
@@ -182,8 +387,331 @@ def xpath_find_first(xmlr: etree.Element, path: str) -> any:
     matches = xpath_find(xmlr, path)
     return next(iter(matches)) if matches else None
 
-# Exact repeat API calls will be pulled from here
+# Exact repeat API calls made outside of processing a request will be pulled from here;
+# while processing a request, the cache in the request context is used instead
 __APICALL_CACHE = {}
+__APICALL_LOCK = threading.Lock()
+
+def _apicall_cache() -> dict:
+    """Return the API call cache for the current request"""
+    ctx = current_context()
+    if ctx is None:
+        return __APICALL_CACHE
+    return ctx.cache.setdefault("apicall", {})
+
+def http_session() -> "requests.Session":
+    """
+    Return the `requests.Session` used for API calls by the helpers, which keeps a pool
+    of open connections for reuse. The session is shared by all threads of a process, and
+    a new session is created in processes forked after it was created.
+
+    Returns:
+        The requests.Session
+
+    **Examples:**
+    ```python
+    resp = helpers.http_session().post(my_api_url, json=query, timeout=10)
+    ```
+    """
+    global __HTTP_SESSION   # pylint: disable=global-statement
+    with __HTTP_SESSION_LOCK:
+        if __HTTP_SESSION is None:
+            __HTTP_SESSION = _lazy_import("requests").Session()
+        return __HTTP_SESSION
+
+def _reset_http_session():
+    """
+    Discard the session in a forked process; its connections belong to the parent,
+    and its lock may have been held by another thread of the parent when forking.
+    """
+    global __HTTP_SESSION, __HEDGE_EXECUTOR, __HTTP_SESSION_LOCK  # pylint: disable=global-statement
+    __HTTP_SESSION_LOCK = threading.Lock()
+    __HTTP_SESSION = None
+    __HEDGE_EXECUTOR = None
+    __BREAKERS.clear()
+    __LATENCIES.clear()
+    __HEDGE_BUDGETS.clear()
+
+__HTTP_SESSION = None
+__HEDGE_EXECUTOR = None
+__HTTP_SESSION_LOCK = threading.Lock()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_http_session)
+
+# Settings for API calls made by the helpers, as set by configure_http()
+__HTTP_CONFIG = {
+    "timeout": 10,
+    "failure_threshold": 5,
+    "latency_threshold": None,
+    "reset_timeout": 30,
+    "stale_cache": None,
+    "replicas": [],
+    "hedge_percentile": None,
+    "hedge_ratio": 0.05,
+}
+# Host => CircuitBreaker, LatencyTracker and HedgeBudget for API calls to that host
+__BREAKERS = {}
+__LATENCIES = {}
+__HEDGE_BUDGETS = {}
+# Rotates hedged calls between replicas
+__REPLICA_TURN = itertools.count()
+
+def configure_http(
+    timeout: float = 10,
+    failure_threshold: int = 5,
+    latency_threshold: float|None = None,
+    reset_timeout: float = 30,
+    stale_cache: LRUCache|None = None,
+    replicas: list[list[str]] = None,
+    hedge_percentile: float|None = None,
+    hedge_ratio: float = 0.05
+):
+    """
+    Configure API calls made by the helpers. Calls to each host go through a
+    `CircuitBreaker`, so that once a backend is failing or slow, calls to it fail fast
+    with an `OAIRepoExternalException` rather than each waiting for the timeout.
+
+    If a `stale_cache` is given, successful responses are kept in it, and are served
+    in place of failing calls while the backend is unavailable (stale-if-error). The
+    cache's `ttl` sets how stale a response may be.
+
+    If `replicas` and a `hedge_percentile` are given, calls to a replicated backend are
+    hedged: when a call has not answered within that percentile of recent latencies
+    for its host, the same call is also made to another replica, and the first
+    response is used. At most `hedge_ratio` of calls to a host are hedged.
+
+    Existing circuit breakers and latency records are discarded.
+
+    Args:
+        timeout (float): Seconds to wait for a response to each API call
+        failure_threshold (int): Consecutive failures which open the circuit for a host
+        latency_threshold (float|None): Seconds after which a successful call is counted
+                                        as a failure, or None to ignore latency
+        reset_timeout (float): Seconds the circuit stays open before a trial call
+        stale_cache (LRUCache|None): Cache of responses for serving stale, or None
+        replicas (list): Groups of interchangeable base URLs; a call to a URL starting
+                         with one base URL of a group may be hedged to the others
+        hedge_percentile (float|None): Percentile of latency, from 0 to 100, after which
+                                       calls are hedged, or None to disable hedging
+        hedge_ratio (float): Max fraction of calls to a host which are hedged
+
+    **Examples:**
+    ```python
+    helpers.configure_http(
+        timeout=5,
+        latency_threshold=2.0,
+        stale_cache=oai_repo.LRUCache(maxsize=4096, ttl=3600),
+        replicas=[["https://solr1.example.edu/solr", "https://solr2.example.edu/solr"]],
+        hedge_percentile=95,
+    )
+    ```
+    """
+    with __HTTP_SESSION_LOCK:
+        __HTTP_CONFIG.update(
+            timeout=timeout,
+            failure_threshold=failure_threshold,
+            latency_threshold=latency_threshold,
+            reset_timeout=reset_timeout,
+            stale_cache=stale_cache,
+            replicas=[list(group) for group in replicas or []],
+            hedge_percentile=hedge_percentile,
+            hedge_ratio=hedge_ratio,
+        )
+        __BREAKERS.clear()
+        __LATENCIES.clear()
+        __HEDGE_BUDGETS.clear()
+
+def _per_host(registry: dict, url: str, factory):
+    """Return the registry's object for the host of the URL, created by factory if needed"""
+    host = urlsplit(url).netloc or url
+    with __HTTP_SESSION_LOCK:
+        value = registry.get(host)
+        if value is None:
+            value = registry[host] = factory()
+        return value
+
+def circuit_breaker(url: str) -> CircuitBreaker:
+    """
+    Return the `CircuitBreaker` for API calls to the host of the URL.
+
+    Args:
+        url (str): A URL, or just the host of it
+
+    Returns:
+        The CircuitBreaker for the host
+
+    **Examples:**
+    ```python
+    if helpers.circuit_breaker(my_solr_url).state == "open":
+        log.warning("Solr is unavailable")
+    ```
+    """
+    return _per_host(__BREAKERS, url, lambda: CircuitBreaker(
+        failure_threshold=__HTTP_CONFIG["failure_threshold"],
+        latency_threshold=__HTTP_CONFIG["latency_threshold"],
+        reset_timeout=__HTTP_CONFIG["reset_timeout"],
+    ))
+
+def latency_tracker(url: str) -> LatencyTracker:
+    """
+    Return the `LatencyTracker` of API calls to the host of the URL.
+
+    Args:
+        url (str): A URL, or just the host of it
+
+    Returns:
+        The LatencyTracker for the host
+
+    **Examples:**
+    ```python
+    p99 = helpers.latency_tracker(my_solr_url).percentile(99)
+    ```
+    """
+    return _per_host(__LATENCIES, url, LatencyTracker)
+
+def _hedge_budget(url: str) -> HedgeBudget:
+    """Return the HedgeBudget for calls to the host of the URL"""
+    return _per_host(__HEDGE_BUDGETS, url, lambda: HedgeBudget(__HTTP_CONFIG["hedge_ratio"]))
+
+def _replica_urls(url: str) -> list[str]:
+    """Return the URL as called on each other replica of its backend"""
+    for group in __HTTP_CONFIG["replicas"]:
+        for base in group:
+            if url.startswith(base):
+                return [other + url[len(base):] for other in group if other != base]
+    return []
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    """Return the executor running hedged calls"""
+    global __HEDGE_EXECUTOR   # pylint: disable=global-statement
+    with __HTTP_SESSION_LOCK:
+        if __HEDGE_EXECUTOR is None:
+            __HEDGE_EXECUTOR = ThreadPoolExecutor(
+                max_workers=32, thread_name_prefix="oai_repo_hedge"
+            )
+        return __HEDGE_EXECUTOR
+
+def _timed_get(url: str, params: dict|list, timeout: float) -> "requests.Response":
+    """Perform a GET request to the URL, recording its latency"""
+    started = time.monotonic()
+    resp = http_session().get(url, params=params, timeout=timeout)
+    latency_tracker(url).record(time.monotonic() - started)
+    return resp
+
+def _hedged_get(url: str, params: dict|list, timeout: float) -> "requests.Response":
+    """
+    Perform a GET request to the URL. If hedging is configured and the call is slow to
+    answer, also perform it on a replica, returning the first successful response.
+
+    Raises:
+        requests.RequestException: if all calls made fail
+    """
+    percentile = __HTTP_CONFIG["hedge_percentile"]
+    replicas = _replica_urls(url) if percentile is not None else []
+    if not replicas:
+        return _timed_get(url, params, timeout)
+    budget = _hedge_budget(url)
+    budget.record_call()
+    delay = latency_tracker(url).percentile(percentile)
+    if delay is None or delay >= timeout:
+        return _timed_get(url, params, timeout)
+
+    executor = _hedge_executor()
+    futures = [executor.submit(_timed_get, url, params, timeout)]
+    if not wait(futures, timeout=delay).done and budget.try_hedge():
+        replica = replicas[next(__REPLICA_TURN) % len(replicas)]
+        futures.append(executor.submit(_timed_get, replica, params, timeout - delay))
+        ctx = current_context()
+        if ctx is not None:
+            ctx.metrics["hedged_api_calls"] = ctx.metrics.get("hedged_api_calls", 0) + 1
+    pending = set(futures)
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+        if not pending:
+            return done.pop().result()
+
+def _stale_response(
+    key: tuple,
+    message: str,
+    cause: Exception = None,
+    exc_class: type = OAIRepoExternalException
+) -> "requests.Response":
+    """
+    Return the stale response for a failed API call, if cached.
+
+    Raises:
+        OAIRepoExternalException: of exc_class with the message, if no stale response
+                                  is cached.
+    """
+    stale_cache = __HTTP_CONFIG["stale_cache"]
+    resp = stale_cache.get(key) if stale_cache is not None else None
+    if resp is None:
+        raise exc_class(message) from cause
+    ctx = current_context()
+    if ctx is not None:
+        ctx.metrics["stale_api_responses"] = ctx.metrics.get("stale_api_responses", 0) + 1
+    return resp
+
+def _http_get(url: str, params: dict|list = None) -> "requests.Response":
+    """
+    Perform a GET request to the URL, returning the response, or a stale response
+    if the call fails and one is cached.
+
+    The timeout for the call is limited to the time remaining until the deadline
+    of the request being processed, if any.
+
+    Raises:
+        OAIRepoExternalException: on API call failure, a non-200 response, or if the
+                                  circuit for the host is open.
+        OAIRepoDeadlineException: if the deadline of the request passed.
+    """
+    requests = _lazy_import("requests")
+    items = params.items() if isinstance(params, dict) else params or ()
+    key = (url, tuple(map(tuple, items)))
+    ctx = current_context()
+    timeout = __HTTP_CONFIG["timeout"]
+    remaining = ctx.remaining() if ctx is not None else None
+    if remaining is not None:
+        if remaining <= 0:
+            return _stale_response(
+                key, f"Request deadline passed before call to API: {url}",
+                exc_class=OAIRepoDeadlineException
+            )
+        timeout = min(timeout, remaining)
+    breaker = circuit_breaker(url)
+    if not breaker.allow():
+        return _stale_response(key, f"Circuit open for API host: {url}")
+    started = time.monotonic()
+    try:
+        resp = _hedged_get(url, params, timeout)
+    except requests.RequestException as exc:
+        if remaining is not None and ctx.remaining() <= 0:
+            # Timed out due to the request deadline, which says nothing of the backend
+            breaker.release()
+            return _stale_response(
+                key, f"Request deadline passed during call to API: {url}", exc,
+                OAIRepoDeadlineException
+            )
+        breaker.record_failure()
+        return _stale_response(key, f"Call to API failed: {url}", exc)
+    except BaseException:
+        # Failed without an outcome for the backend, which must not leave a trial pending
+        breaker.release()
+        raise
+    if resp.status_code >= 500 or resp.status_code == 429:
+        # The backend is unavailable or overloaded
+        breaker.record_failure()
+        return _stale_response(key, f"Call to API returned {resp.status_code}: {url}")
+    breaker.record_success(time.monotonic() - started)
+    if not resp.status_code == 200:
+        raise OAIRepoExternalException(f"Call to API returned {resp.status_code}: {url}")
+    stale_cache = __HTTP_CONFIG["stale_cache"]
+    if stale_cache is not None:
+        stale_cache.set(key, resp)
+    return resp
 
 def apicall_querypath(
     url: str = None,
@@ -235,22 +763,20 @@ def apicall_querypath(
     if jsonpath and xpath:
         raise OAIRepoInternalException("apicall_querypath with both jsonpath and xpath provided.")
 
-    if url not in __APICALL_CACHE:
-        try:
-            resp = requests.get(url, timeout=10)
-        except requests.RequestException as exc:
-            raise OAIRepoExternalException(f"Call to API failed: {url}") from exc
-        if not resp.status_code == 200:
-            raise OAIRepoExternalException(f"Call to API returned {resp.status_code}: {url}")
-        __APICALL_CACHE[url] = resp
-    resp = __APICALL_CACHE[url]
+    cache = _apicall_cache()
+    with __APICALL_LOCK:
+        resp = cache.get(url)
+    if resp is None:
+        resp = _http_get(url)
+        with __APICALL_LOCK:
+            cache[url] = resp
 
     match = None
     if jsonpath:
         try:
             loaded = json.loads(resp.text)
             match = jsonpath_find_first(loaded, jsonpath)
-        except jsonpath_ng.exceptions.JSONPathError as exc:
+        except _lazy_import("jsonpath_ng").exceptions.JSONPathError as exc:
             raise OAIRepoInternalException(f"JSONPath is not valid: {jsonpath}") from exc
     elif xpath:
         try:
@@ -285,15 +811,43 @@ def apicall_getxml(url: str = None) ->  etree._Element:
     """
     if not url:
         raise OAIRepoInternalException("apicall_getxml called without a URL provided.")
-    try:
-        resp = requests.get(url, timeout=10)
-    except requests.RequestException as exc:
-        raise OAIRepoExternalException(f"Call to API failed: {url}") from exc
-    if not resp.status_code == 200:
-        raise OAIRepoExternalException(f"Call to API returned {resp.status_code}: {url}")
+    resp = _http_get(url)
 
     try:
         loaded = etree.fromstring(resp.content)
     except etree.XMLSyntaxError as exc:
         raise OAIRepoInternalException(f"Response to API call was not valid XML: {url}") from exc
     return loaded
+
+
+def apicall_getjson(url: str = None, params: dict|list = None) -> dict|list:
+    """
+    Perform API call to a URL and load the response as JSON.
+
+    Args:
+        url (str): A URL path to call.
+        params (dict|list): Optional query parameters to add to the URL; a list
+                            of (key, value) tuples allows for repeated keys.
+
+    Returns:
+        The loaded JSON data.
+
+    Raises:
+        OAIRepoExternalException: when the URL call fails or returns non-200 response.
+        OAIRepoInternalException: when call to URL does not return valid JSON
+                                  or no URL was provided.
+
+    **Examples:**
+    ```python
+    loaded = helpers.apicall_getjson(f"{my_solr_url}/select", {"q": "*:*", "rows": 10})
+    ```
+    """
+    if not url:
+        raise OAIRepoInternalException("apicall_getjson called without a URL provided.")
+    resp = _http_get(url, params)
+
+    try:
+        loaded = json.loads(resp.text)
+    except ValueError as exc:
+        raise OAIRepoInternalException(f"Response to API call was not valid JSON: {url}") from exc
+    return loaded
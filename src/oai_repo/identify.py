@@ -5,7 +5,7 @@ from lxml import etree
 from .request import OAIRequest
 from .response import OAIResponse
 from .exceptions import OAIRepoInternalException
-from .helpers import bytes_to_xml, granularity_format
+from .helpers import granularity_format
 
 
 class IdentifyRequest(OAIRequest):
@@ -26,7 +26,7 @@ class IdentifyResponse(OAIResponse):
 
     def body(self):
         """Response body"""
-        identify = self.repository.data.get_identify()
+        identify = self.repository.get_identify()
         errors = identify.errors()
         if errors:
             raise OAIRepoInternalException(f"Invalid Identify instance: {errors}")
@@ -54,7 +54,7 @@ class IdentifyResponse(OAIResponse):
         for compress_type in identify.compression:
             compression = etree.SubElement(xmlb, "compression")
             compression.text = compress_type
-        for desc in identify.description:
+        for desc in identify.description_xml():
             desc_elem = etree.SubElement(xmlb, "description")
-            desc_elem.append(bytes_to_xml(desc))
+            desc_elem.append(desc)
         return xmlb
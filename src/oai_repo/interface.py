@@ -3,7 +3,10 @@ Interface to be implemented by OAI instance developer
 """
 from datetime import datetime
 import lxml
-from .interfacedata import Identify, MetadataFormat, RecordHeader, Set
+from .interfacedata import (
+    Identify, MetadataFormat,
+    RecordHeader, RecordHeaderBatch, Set, ApproximateSize, RecordBundle
+)
 
 
 class DataInterface:
@@ -24,6 +27,14 @@ class DataInterface:
 
         Returns:
             The Identify object with all properties set appropriately
+
+        Note:
+            The Identify is loaded once for each request by the `OAIRepository`, as are the
+            metadata formats from `get_metadata_formats()` and the sets from
+            `list_set_specs()` and `get_set()` for the whole repository, or cached across
+            requests with the `static` argument to `OAIRepository`.
+            It is frozen with `Identify.freeze()` when loaded, so that it is only validated
+            and its descriptions only parsed once.
         """
         raise NotImplementedError
 
@@ -52,10 +63,15 @@ class DataInterface:
                 set appropriately to the identifer.
                 If identifier is None, then list of all possible MetadataFormat
                 objects for the entire repository.
+
+        Note:
+            Formats are frozen with `MetadataFormat.freeze()` before use, and equal frozen
+            formats are only validated once. Return `FrozenMetadataFormat` instances to
+            skip freezing copies on each request.
         """
         raise NotImplementedError
 
-    def get_record_header(self, identifier: str) -> RecordHeader:
+    def get_record_header(self, identifier: str) -> RecordHeader|None:
         """
         Return a RecordHeader instance for the identifier.
 
@@ -63,7 +79,8 @@ class DataInterface:
             identifier (str): A valid identifier string
 
         Returns:
-            The RecordHeader object with all properties set appropriately.
+            The RecordHeader object with all properties set appropriately, or None
+                if the record no longer exists, such as when removed since being listed.
 
         Note:
             If you implement `get_records_header`, you may not need this
@@ -72,7 +89,9 @@ class DataInterface:
         """
         raise NotImplementedError
 
-    def get_records_header(self, identifiers: list[str]) -> list[RecordHeader]:
+    def get_records_header(
+        self, identifiers: list[str]
+    ) -> list[RecordHeader]|RecordHeaderBatch:
         """
         Return a list of RecordHeader instances for the identifiers.
 
@@ -80,7 +99,9 @@ class DataInterface:
             identifier (list): A list of valid identifier strings
 
         Returns:
-            A list of the RecordHeader objects with all properties set appropriately.
+            A list of the RecordHeader objects with all properties set appropriately,
+                with None for records which no longer exist, or a RecordHeaderBatch
+                of the headers.
 
         Note:
             Implementing this function in your DataInterface is _optional_. You may
@@ -101,6 +122,9 @@ class DataInterface:
         Returns:
             The lxml.etree.Element for the requested record metadata,
                 or None if record has no metadata for provided prefix.
+                Metadata may also be returned already serialized, as `bytes` or a
+                `memoryview` (e.g. from a `MmapRecordStore`), which is written into
+                the response as is; it must declare all namespaces it uses.
 
         Important:
             oai_repo will wrap the response with a `<metadata>` tag; do not add it yourself.
@@ -174,6 +198,26 @@ class DataInterface:
         """
         return [self.get_record_abouts(identifier) for identifier in identifiers]
 
+    def get_record_bundle(self, identifier: str, metadataprefix: str) -> RecordBundle|None:
+        """
+        Return everything needed for a GetRecord response in a single call: the record
+        header, the metadata formats available for it, and its metadata and abouts.
+
+        Args:
+            identifier (str): An identifier string, which may not exist
+            metadataprefix (str): A metadata prefix
+
+        Returns:
+            A RecordBundle for the record, or None if the identifier does not exist.
+
+        Note:
+            Implementing this function in your DataInterface is _optional_. When implemented,
+            GetRecord uses it instead of calling `is_valid_identifier`, `get_metadata_formats`,
+            `get_records_metadata`, `get_records_header`, and `get_records_abouts` in turn,
+            which you may want if each call is a separate round trip to a remote backend.
+        """
+        raise NotImplementedError
+
     def list_set_specs(self, identifier: str=None, cursor: int=0) -> tuple:
         """
         Return a list of setSpec string for the given identifier string if provided,
@@ -210,6 +254,28 @@ class DataInterface:
         """
         raise NotImplementedError
 
+    def get_snapshot(self) -> any:
+        """
+        Return an identifier for the current state of the repository data, such as a
+        timestamp or a generation counter, to pin harvests to.
+
+        When a value is returned, `resumptionToken`s for a harvest carry the snapshot from
+        when the harvest began, and `list_identifiers` is passed it as the `snapshot`
+        keyword argument (as a string) on every page of that harvest. Your implementation
+        must then return results as they were at that snapshot, so paging continues consistently
+        while the data changes; records changed since are picked up by the next incremental
+        harvest. Tokens are not invalidated by size or state changes in this mode.
+
+        Returns:
+            An str()-able snapshot identifier, or None to not pin harvests to snapshots.
+
+        Note:
+            Implementing this function in your DataInterface is _optional_. By default, no
+            snapshot is used and tokens are invalidated whenever the results change.
+            If a snapshot can no longer be served, raise `OAIErrorBadResumptionToken`.
+        """
+        return None
+
     def list_identifiers(self,
         metadataprefix: str,
         filter_from: datetime = None,
@@ -226,13 +292,17 @@ class DataInterface:
             filter_until (datetime.datetime): Include only identifiers on or before given datetime.
             filter_set (str): Include only identifers within the matching setSpec string.
             cursor (int): position in results to start retrieving from
+            snapshot (str): Only passed if `get_snapshot` is implemented; the snapshot
+                            the results must be as of
 
         Returns:
             A tuple of length 3:
 
                 1. (list) Valid identifier strings for the repository, filtered appropriately,
                     or None if no `resuptionToken` is needed.
-                2. (int|None) The `completeListSize` for a `resumptionToken` or Null to not send.
+                2. (int|ApproximateSize|None) The `completeListSize` for a `resumptionToken`,
+                    an `ApproximateSize` if only an estimate is available, or Null to
+                    use `count_identifiers` (if implemented) or otherwise not send.
                 3. (Any|None) An str()-able value which indicates the constant-ness of the complete
                     result set. If any value in the results changes, this value should also
                     change. A changed value will invalidate current `resumptionToken`s.
@@ -240,3 +310,114 @@ class DataInterface:
                     reduction in in `completeListSize`.
         """
         raise NotImplementedError
+
+    def list_headers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        """
+        Return record headers, filtered appropriately to passed parameters.
+
+        Args:
+            metadataprefix (str): The metadata prefix to match.
+            filter_from (datetime.datetime): Include only headers on or after given datetime.
+            filter_until (datetime.datetime): Include only headers on or before given datetime.
+            filter_set (str): Include only headers within the matching setSpec string.
+            cursor (int): position in results to start retrieving from
+            kwargs: The `snapshot` keyword argument, as described for `list_identifiers`.
+
+        Returns:
+            A tuple of length 3, the same as `list_identifiers`, except the first item is
+                a list of RecordHeader objects, or a RecordHeaderBatch, rather than
+                identifier strings.
+
+        Note:
+            Implementing this function in your DataInterface is _optional_. When implemented,
+            ListIdentifiers uses it instead of calling `list_identifiers` followed by
+            `get_records_header`, which you may want if your backend can return the full
+            headers in the same query which finds the matching identifiers.
+        """
+        raise NotImplementedError
+
+    def list_records(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        """
+        Return complete records, filtered appropriately to passed parameters.
+
+        Args:
+            metadataprefix (str): The metadata prefix to match, and to return metadata for.
+            filter_from (datetime.datetime): Include only records on or after given datetime.
+            filter_until (datetime.datetime): Include only records on or before given datetime.
+            filter_set (str): Include only records within the matching setSpec string.
+            cursor (int): position in results to start retrieving from
+            kwargs: The `snapshot` keyword argument, as described for `list_identifiers`.
+
+        Returns:
+            A tuple of length 3, the same as `list_identifiers`, except the first item is
+                a list of RecordBundle objects with the `header`, `metadata` and `abouts` set
+                (`metadata_formats` is not used).
+
+        Note:
+            Implementing this function in your DataInterface is _optional_. When implemented,
+            ListRecords uses it instead of calling `list_identifiers` followed by
+            `get_records_metadata`, `get_records_header` and `get_records_abouts`,
+            which you may want if your backend can return the full records in the same
+            query which finds the matching identifiers.
+        """
+        raise NotImplementedError
+
+    def count_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        **kwargs
+    ) -> int|ApproximateSize|None:
+        """
+        Return the number of identifiers matching the parameters; the `completeListSize`.
+
+        Args:
+            metadataprefix (str): The metadata prefix to match.
+            filter_from (datetime.datetime): Include only identifiers on or after given datetime.
+            filter_until (datetime.datetime): Include only identifiers on or before given datetime.
+            filter_set (str): Include only identifers within the matching setSpec string.
+            kwargs: The `snapshot` keyword argument, as described for `list_identifiers`.
+
+        Returns:
+            The exact number of matching identifiers, an `ApproximateSize` estimate,
+                or None to not send a `completeListSize`.
+
+        Note:
+            Implementing this function in your DataInterface is _optional_. It is only
+            called when `list_identifiers` returns None for the size, allowing the count to be
+            made separately from retrieving a page. Counts are cached by the `OAIRepository`
+            across pages of a harvest, keyed by the parameters and the state returned from
+            `list_identifiers`, so the count is not repeated for every page.
+        """
+        raise NotImplementedError
+
+    def warm(self, connections: bool = False):
+        """
+        Prepare to serve requests, called by `OAIRepository.warm()`. Use this to
+        precompile expressions (see `helpers.compile_xpath()` and `helpers.compile_jsonpath()`)
+        and load any lookup data your implementation uses.
+
+        Args:
+            connections (bool): Whether to also open connections, such as to a database
+                                or API. Only True after the process was forked, as
+                                connections must not be shared between processes.
+
+        Note:
+            Implementing this function in your DataInterface is _optional_. By default,
+            it does nothing.
+        """
@@ -1,14 +1,21 @@
 """
 Interface DataClasses used by the OAI DataInterface
 """
+import copy
+import sys
+from array import array
 from io import BytesIO
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
 from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
 import lxml
+from lxml import etree
 from .validators import (
     IdentifyValidator, MetadataFormatValidator,
     RecordHeaderValidator, SetValidator
 )
+from .helpers import parse_datestamp
 
 
 @dataclass
@@ -47,6 +54,113 @@ class Identify(IdentifyValidator):
     compression: list = field(default_factory=list)
     description: list[BytesIO|bytes|lxml.etree._Element] = field(default_factory=list)
 
+    def freeze(self) -> "FrozenIdentify":
+        """
+        Return an immutable copy of this Identify, which is validated only once.
+
+        Returns:
+            The FrozenIdentify with the same data.
+        """
+        return FrozenIdentify(
+            repository_name=self.repository_name,
+            base_url=self.base_url,
+            admin_email=tuple(self.admin_email or ()),
+            earliest_datestamp=self.earliest_datestamp,
+            deleted_record=self.deleted_record,
+            granularity=self.granularity,
+            compression=tuple(self.compression or ()),
+            description=tuple(_description_bytes(desc) for desc in self.description or ())
+        )
+
+def _description_bytes(desc: BytesIO|bytes|lxml.etree._Element) -> bytes:
+    """Return a description as bytes, so that it is immutable and hashable"""
+    # pylint: disable=protected-access
+    if isinstance(desc, etree._Element):
+        return etree.tostring(desc)
+    if isinstance(desc, BytesIO):
+        return desc.getvalue()
+    return desc
+
+@lru_cache(maxsize=1024)
+def _frozen_errors(frozen) -> tuple[str]:
+    """Validate frozen interface data, once for all equal instances"""
+    return tuple(frozen.validate())
+
+class FrozenMixin:
+    """
+    Memoizes `errors()` for immutable interface data; as the data can't change once
+    created, it only needs to be validated once. The result is shared by all equal
+    instances, so freshly frozen copies of the same data aren't validated again.
+    """
+    def validate(self) -> list[str]:
+        """Run the validation, without memoizing"""
+        return super().errors()
+
+    def errors(self) -> list[str]:
+        """
+        Verify fields are valid and present where required. Returning a list of descriptive
+        errors if any issues were found.
+        """
+        return list(_frozen_errors(self))
+
+    def freeze(self):
+        """Return this instance, as it is already immutable"""
+        return self
+
+@dataclass(frozen=True)
+class FrozenIdentify(FrozenMixin, IdentifyValidator):
+    """
+    An immutable, hashable `Identify`, as returned by `Identify.freeze()`. It is only
+    validated once, and its descriptions are only parsed once.
+
+    Attributes:
+        repository_name (str): The name of the OAI repository
+        base_url (str): the base url for this repository
+        admin_email (tuple): email addresses, cannot be empty
+        earliest_datestamp (str|datetime): a string in the granularity format or a datetime object
+        deleted_record (str): OAI deleted record value, one of `no`, `persistent`, `transient`
+        granularity (str): OAI granularity, either `YYYY-MM-DDThh:mm:ssZ` or `YYYY-MM-DD`
+        compression (tuple): compression to be available (typically left empty)
+        description (tuple): descriptions as XML bytes
+
+    **Examples:**
+    ```python
+    IDENTIFY = oai_repo.Identify(
+        repository_name="My Repo",
+        ... # remaining attributes
+    ).freeze()
+
+    def get_identify(self) -> oai_repo.Identify:
+        return IDENTIFY
+    ```
+    """
+    repository_name: str = None
+    base_url: str = None
+    admin_email: tuple[str] = ()
+    earliest_datestamp: str|datetime = None
+    deleted_record: str = None
+    granularity: str = None
+    compression: tuple[str] = ()
+    description: tuple[bytes] = ()
+
+    @cached_property
+    def _description_xml(self) -> tuple[lxml.etree._Element]:
+        """The parsed descriptions"""
+        return tuple(etree.fromstring(desc) for desc in self.description)
+
+    def description_xml(self) -> list[lxml.etree._Element]:
+        """
+        Return the descriptions as XML, parsed only once. Each call returns new copies,
+        which may be added to a response.
+
+        Returns:
+            A list of lxml Elements, one for each description.
+
+        Raises:
+            etree.XMLSyntaxError: If a description is not valid XML
+        """
+        return [copy.deepcopy(desc) for desc in self._description_xml]
+
 @dataclass
 class MetadataFormat(MetadataFormatValidator):
     """
@@ -71,11 +185,45 @@ class MetadataFormat(MetadataFormatValidator):
     schema: str = None
     metadata_namespace: str = None
 
-@dataclass
+    def freeze(self) -> "FrozenMetadataFormat":
+        """
+        Return an immutable copy of this MetadataFormat, which is validated only once.
+
+        Returns:
+            The FrozenMetadataFormat with the same data.
+        """
+        return FrozenMetadataFormat(self.metadata_prefix, self.schema, self.metadata_namespace)
+
+@dataclass(frozen=True)
+class FrozenMetadataFormat(FrozenMixin, MetadataFormatValidator):
+    """
+    An immutable, hashable `MetadataFormat`, as returned by `MetadataFormat.freeze()`.
+    It is only validated once, even across equal instances.
+
+    Attributes:
+        metadata_prefix (str): A metadataPrefix string
+        schema (str): The schema for the metadata
+        metadata_namespace (str): The namespace for the metadata
+
+    **Examples:**
+    ```python
+    OAI_DC = oai_repo.FrozenMetadataFormat(
+        "oai_dc",
+        "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+        "http://www.openarchives.org/OAI/2.0/oai_dc/"
+    )
+    ```
+    """
+    metadata_prefix: str = None
+    schema: str = None
+    metadata_namespace: str = None
+
+@dataclass(slots=True)
 class RecordHeader(RecordHeaderValidator):
     """
     Class to define a record header for an identifier. Your definition of the
     `DataInterface.get_record_header()` method should return one of these.
+    Instances use `__slots__`, so they can't be given other attributes.
 
     Attributes:
         identifier (str): The OAI identifier
@@ -88,6 +236,135 @@ class RecordHeader(RecordHeaderValidator):
     setspecs: list[str] = field(default_factory=list)
     status: str = None
 
+class RecordHeaderBatch:
+    """
+    A columnar batch of record headers, held in parallel arrays rather than as a
+    `RecordHeader` per record. `DataInterface.get_records_header()` and
+    `DataInterface.list_headers()` may return one of these in place of a list of
+    RecordHeaders; responses are built from the columns directly, without creating
+    an object per record.
+
+    Datestamps are held as POSIX timestamps, equal setSpec lists share a single
+    tuple, and the deleted status of records is held as a bitmask.
+
+    Indexing a batch returns a `RecordHeader` for the record, and slicing it returns
+    a new batch, so a batch of all headers can be kept in memory and paged through.
+
+    Attributes:
+        identifiers (list[str]): The OAI identifiers
+        timestamps (array): The datestamps as POSIX timestamps
+        setspecs (list[tuple[str]]): The setSpecs of each record
+        deleted (int): Bitmask with bit `i` set if record `i` is deleted
+
+    **Examples:**
+    ```python
+    batch = oai_repo.RecordHeaderBatch()
+    for row in rows:
+        batch.append(row["id"], row["modified"], row["sets"], row["deleted"] and "deleted")
+    return batch
+    ```
+    """
+    __slots__ = ("identifiers", "timestamps", "setspecs", "deleted", "_interned")
+
+    def __init__(self):
+        self.identifiers: list[str] = []
+        self.timestamps = array("d")
+        self.setspecs: list[tuple[str]] = []
+        self.deleted = 0
+        # setSpec tuple => the shared instance of it
+        self._interned: dict[tuple, tuple] = {}
+
+    @classmethod
+    def from_headers(cls, headers: Iterable[RecordHeader]) -> "RecordHeaderBatch":
+        """
+        Create a batch from RecordHeaders.
+
+        Args:
+            headers (Iterable[RecordHeader]): The headers to add
+
+        Returns:
+            The new batch.
+        """
+        batch = cls()
+        for header in headers:
+            batch.append(header.identifier, header.datestamp, header.setspecs, header.status)
+        return batch
+
+    def __repr__(self):
+        return f"RecordHeaderBatch(size={len(self)})"
+
+    def __len__(self):
+        return len(self.identifiers)
+
+    def __iter__(self) -> Iterator[RecordHeader]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, idx: int|slice) -> "RecordHeader|RecordHeaderBatch":
+        if isinstance(idx, slice):
+            batch = RecordHeaderBatch()
+            batch.identifiers = self.identifiers[idx]
+            batch.timestamps = self.timestamps[idx]
+            batch.setspecs = self.setspecs[idx]
+            batch._interned = self._interned
+            start, _, step = idx.indices(len(self))
+            if step == 1:
+                batch.deleted = self.deleted >> start & ((1 << len(batch)) - 1)
+            else:
+                for new_idx, old_idx in enumerate(range(*idx.indices(len(self)))):
+                    if self.is_deleted(old_idx):
+                        batch.deleted |= 1 << new_idx
+            return batch
+        idx = range(len(self))[idx]
+        return RecordHeader(
+            self.identifiers[idx],
+            datetime.fromtimestamp(self.timestamps[idx], timezone.utc),
+            list(self.setspecs[idx]),
+            "deleted" if self.is_deleted(idx) else None
+        )
+
+    def append(
+        self,
+        identifier: str,
+        datestamp: datetime|str|float,
+        setspecs: Iterable[str] = (),
+        status: str|None = None
+    ):
+        """
+        Add a record header to the batch.
+
+        Args:
+            identifier (str): The OAI identifier
+            datestamp (datetime|str|float): The datestamp, as a datetime, an ISO 8601
+                                            string, or a POSIX timestamp; datestamps
+                                            without a timezone are taken to be UTC
+            setspecs (Iterable[str]): The setSpecs the record is part of
+            status (str|None): The optional OAI status
+        """
+        if isinstance(datestamp, str):
+            try:
+                datestamp = parse_datestamp(datestamp)
+            except ValueError:
+                # Other ISO 8601 forms; fromisoformat only accepts a `Z` from Python 3.11
+                datestamp = datetime.fromisoformat(
+                    datestamp[:-1] + "+00:00" if datestamp.endswith("Z") else datestamp
+                )
+        if isinstance(datestamp, datetime):
+            if datestamp.tzinfo is None:
+                datestamp = datestamp.replace(tzinfo=timezone.utc)
+            datestamp = datestamp.timestamp()
+        setspecs = tuple(setspecs)
+        setspecs = self._interned.setdefault(setspecs, tuple(sys.intern(s) for s in setspecs))
+        if status == "deleted":
+            self.deleted |= 1 << len(self.identifiers)
+        self.identifiers.append(identifier)
+        self.timestamps.append(datestamp)
+        self.setspecs.append(setspecs)
+
+    def is_deleted(self, idx: int) -> bool:
+        """Return if the record at the index is deleted"""
+        return bool(self.deleted >> idx & 1)
+
 @dataclass
 class Set(SetValidator):
     """
@@ -103,3 +380,53 @@ class Set(SetValidator):
     spec: str = None
     name: str = None
     description: list = None
+
+@dataclass
+class RecordBundle:
+    """
+    Class to bundle together everything needed to disseminate a record, for
+    DataInterface methods which retrieve it all at once, such as
+    `DataInterface.get_record_bundle()`.
+
+    Attributes:
+        header (RecordHeader): The header for the record
+        metadata_formats (list): The metadataPrefix strings (or MetadataFormat objects)
+                                 available for the record
+        metadata (lxml.etree._Element|None): The metadata for the requested prefix,
+                                             or None if not available for the prefix
+        abouts (list): A list of lxml.etree.Elements to populate `<about>` tags for the record
+    """
+    header: RecordHeader = None
+    metadata_formats: list[str|MetadataFormat] = field(default_factory=list)
+    metadata: lxml.etree._Element = None
+    abouts: list[lxml.etree._Element] = field(default_factory=list)
+
+    @property
+    def metadata_prefixes(self) -> list[str]:
+        """The metadataPrefix strings available for the record"""
+        return [
+            mdf if isinstance(mdf, str) else mdf.metadata_prefix
+            for mdf in self.metadata_formats
+        ]
+
+
+class ApproximateSize(int):
+    """
+    An estimated `completeListSize`. Return an instance of this in place of an
+    `int` size from `DataInterface.list_identifiers()` or `DataInterface.count_identifiers()`
+    when counting the exact number of results would be expensive.
+
+    Depending on the `approximate_size` setting of the `OAIRepository`, the estimate
+    is either sent as the `completeListSize` or omitted. Paging continues for as long
+    as full pages are returned, regardless of the estimate.
+
+    **Examples:**
+    ```python
+    return identifiers, oai_repo.ApproximateSize(1200000), None
+    ```
+    """
+    def __repr__(self):
+        return f"ApproximateSize({int(self)})"
+
+    def __str__(self):
+        return int.__repr__(self)
@@ -3,13 +3,10 @@ Implementation of ListIdentifiers verb
 """
 from lxml import etree
 from .request import OAIRequest
-from .response import OAIResponse
-from .getrecord import add_header
-from .resumption import ResumptionToken
-from .exceptions import (
-    OAIErrorNoRecordsMatch, OAIErrorBadResumptionToken,
-    OAIErrorCannotDisseminateFormat
-)
+from .getrecord import add_headers
+from .context import set_metric
+from .resumption import ResumptionToken, ResumableResponse
+from .exceptions import OAIErrorNoRecordsMatch, OAIErrorBadResumptionToken
 
 
 class ListIdentifiersRequest(OAIRequest):
@@ -50,62 +47,29 @@ class ListIdentifiersRequest(OAIRequest):
             raise OAIErrorBadResumptionToken("The resumption token is not valid for given verb.")
 
 
-class ListIdentifiersResponse(OAIResponse):
+class ListIdentifiersResponse(ResumableResponse):
     """Generate a resposne for the ListIdentifiers verb"""
     def body(self) -> etree.Element:
         """Response body"""
-        mdformats = self.repository.data.get_metadata_formats()
-        if self.request.metadata_prefix not in [mdf.metadata_prefix for mdf in mdformats]:
-            raise OAIErrorCannotDisseminateFormat(
-                "The given metadataPrefix not suported by this repository"
-            )
+        self.check_metadata_prefix()
+        cursor = self.next_cursor()
+        snapshot = self.current_snapshot()
+        try:
+            recheads, new_size, state = self.list_page("list_headers", cursor, snapshot)
+            set_metric("data_path", "list_headers")
+        except NotImplementedError:
+            identifiers, new_size, state = self.list_page("list_identifiers", cursor, snapshot)
+            recheads = self.repository.data.get_records_header(identifiers) if identifiers else []
+            set_metric("data_path", "list_identifiers")
+        self.check_token(new_size, state, snapshot)
 
-        cursor = (
-            self.request.token.cursor + self.repository.data.limit
-            if self.request.token.cursor is not None else 0
-        )
-
-        identifiers, new_size, state = self.repository.data.list_identifiers(
-            self.request.metadata_prefix,
-            self.repository.valid_date(self.request.filter_from),
-            self.repository.valid_date(self.request.filter_until),
-            self.request.filter_set,
-            cursor
-        )
-
-        # TODO allow custom token invalidation logic
-        if (
-            new_size is not None and
-            self.request.token.complete_list_size is not None and
-            new_size < self.request.token.complete_list_size
-        ):
-            raise OAIErrorBadResumptionToken("Token is no longer valid as data has changed.")
-
-        if not identifiers:
+        if not recheads and not self.no_results():
             raise OAIErrorNoRecordsMatch("No identifiers were found matching given parameters.")
 
         xmlb = etree.Element("ListIdentifiers")
-        recheads = self.repository.data.get_records_header(identifiers)
         # populate response body with record headers
-        for rechead in recheads:
-            add_header(self.repository, rechead, xmlb)
+        add_headers(self.repository, recheads, xmlb)
 
         # append a resumptionToken if needed
-        if new_size > self.repository.data.limit:
-            token = ResumptionToken()
-            token.cursor = cursor
-            token.complete_list_size = new_size
-            token.set_state(state)
-            token.args = { "metadataPrefix": self.request.metadata_prefix }
-            if self.request.filter_from:
-                token.args['from'] = self.request.filter_from
-            if self.request.filter_until:
-                token.args['until'] = self.request.filter_until
-            if self.request.filter_set:
-                token.args['set'] = self.request.filter_set
-            if (token_xml := token.xml(self.repository.data.limit)) is not None:
-                xmlb.append(token_xml)
-        # State change
-        if self.request.token.state_hash and self.request.token.state_hash != token.state_hash:
-            raise OAIErrorBadResumptionToken("Token is no longer valid as data has changed.")
+        self.append_token(xmlb, cursor, new_size, state, snapshot)
         return xmlb
@@ -40,6 +40,8 @@ class ListMetadataFormatsResponse(OAIResponse):
         OAIErrorIdDoesNotExist
         OAIErrorNoMetadataFormats
     """
+    pretty_print = False
+
     def __repr__(self):
         return f"ListMetadataFormatsResponse(identifier={self.request.identifier})"
 
@@ -49,13 +51,15 @@ class ListMetadataFormatsResponse(OAIResponse):
         if identifier and not self.repository.data.is_valid_identifier(identifier):
             raise OAIErrorIdDoesNotExist("The given identifier does not exist.")
 
-        mdformats = self.repository.data.get_metadata_formats(identifier)
+        mdformats = self.repository.get_metadata_formats(identifier or None)
         if not mdformats:
             raise OAIErrorNoMetadataFormats("No metadata fomats found for given identifier.")
 
         xmlb = etree.Element("ListMetadataFormats")
         for mdformat in mdformats:
-            # Report errors if any MetadataFormat object were invalid
+            # Report errors if any MetadataFormat object were invalid; frozen formats
+            # are only validated once
+            mdformat = mdformat.freeze()
             errors = mdformat.errors()
             if errors:
                 raise OAIRepoInternalException(f"Invalid MetadataFormat instance: {errors}")
@@ -3,13 +3,10 @@ Implementation of ListRecords verb
 """
 from lxml import etree
 from .request import OAIRequest
-from .response import OAIResponse
-from .getrecord import add_records
-from .resumption import ResumptionToken
-from .exceptions import (
-    OAIErrorNoRecordsMatch, OAIErrorBadResumptionToken,
-    OAIErrorCannotDisseminateFormat
-)
+from .getrecord import add_records, add_record
+from .context import set_metric
+from .resumption import ResumptionToken, ResumableResponse
+from .exceptions import OAIErrorNoRecordsMatch, OAIErrorBadResumptionToken
 
 class ListRecordsRequest(OAIRequest):
     """
@@ -49,60 +46,39 @@ class ListRecordsRequest(OAIRequest):
             raise OAIErrorBadResumptionToken("The resumption token is not valid for given verb.")
 
 
-class ListRecordsResponse(OAIResponse):
+class ListRecordsResponse(ResumableResponse):
     """Generate a resposne for the ListRecords verb"""
+    def metadata_prefix(self) -> str|None:
+        return self.request.metadata_prefix
+
     def body(self) -> etree.Element:
         """Response body"""
-        mdformats = self.repository.data.get_metadata_formats()
-        if self.request.metadata_prefix not in [mdf.metadata_prefix for mdf in mdformats]:
-            raise OAIErrorCannotDisseminateFormat(
-                "The given metadataPrefix not suported by this repository"
-            )
-
-        cursor = (
-            self.request.token.cursor + self.repository.data.limit
-            if self.request.token.cursor is not None else 0
-        )
-
-        identifiers, new_size, state = self.repository.data.list_identifiers(
-            self.request.metadata_prefix,
-            self.repository.valid_date(self.request.filter_from),
-            self.repository.valid_date(self.request.filter_until),
-            self.request.filter_set,
-            cursor
-        )
-
-        # TODO allow custom token invalidation logic
-        if (
-            new_size is not None and
-            self.request.token.complete_list_size is not None and
-            new_size < self.request.token.complete_list_size
-        ):
-            raise OAIErrorBadResumptionToken("Token is no longer valid as data has changed.")
+        self.check_metadata_prefix()
+        cursor = self.next_cursor()
+        snapshot = self.current_snapshot()
+        identifiers = bundles = None
+        # Derived formats are transformed from the metadata of their source format
+        if not self.repository.is_derived(self.request.metadata_prefix):
+            try:
+                bundles, new_size, state = self.list_page("list_records", cursor, snapshot)
+                set_metric("data_path", "list_records")
+            except NotImplementedError:
+                pass
+        if bundles is None:
+            identifiers, new_size, state = self.list_page("list_identifiers", cursor, snapshot)
+            set_metric("data_path", "list_identifiers")
+        self.check_token(new_size, state, snapshot)
 
-        if not identifiers:
+        if not (bundles or identifiers) and not self.no_results():
             raise OAIErrorNoRecordsMatch("No identifiers were found matching given parameters.")
 
         xmlb = etree.Element("ListRecords")
 
-        add_records(self.repository, identifiers, self.request.metadata_prefix, xmlb)
+        if bundles is None:
+            add_records(self.repository, identifiers, self.request.metadata_prefix, xmlb)
+        for bundle in bundles or []:
+            add_record(self.repository, bundle.header, bundle.metadata, bundle.abouts, xmlb)
 
         # append a resumptionToken if needed
-        if new_size > self.repository.data.limit:
-            token = ResumptionToken()
-            token.cursor = cursor
-            token.complete_list_size = new_size
-            token.set_state(state)
-            token.args = { "metadataPrefix": self.request.metadata_prefix }
-            if self.request.filter_from:
-                token.args['from'] = self.request.filter_from
-            if self.request.filter_until:
-                token.args['until'] = self.request.filter_until
-            if self.request.filter_set:
-                token.args['set'] = self.request.filter_set
-            if (token_xml := token.xml(self.repository.data.limit)) is not None:
-                xmlb.append(token_xml)
-        # State change
-        if self.request.token.state_hash and self.request.token.state_hash != token.state_hash:
-            raise OAIErrorBadResumptionToken("Token is no longer valid as data has changed.")
+        self.append_token(xmlb, cursor, new_size, state, snapshot)
         return xmlb
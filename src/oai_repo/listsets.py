@@ -32,16 +32,17 @@ class ListSetsResponse(OAIResponse):
         OAIErrorBadResumptionToken
         OAIErrorNoSetHierarchy
     """
+    pretty_print = False
+
     def body(self) -> etree.Element:
         """Response body"""
         # TODO identifier, cursor, total count, resumption token
-        setspecs, size, unhashed = self.repository.data.list_set_specs()
-        if setspecs is None:
+        sets = self.repository.list_sets()
+        if sets is None:
             raise OAIErrorNoSetHierarchy("Repository does not support sets.")
 
         xmlb = etree.Element("ListSets")
-        for setspec in setspecs:
-            setobj = self.repository.data.get_set(setspec)
+        for setobj in sets:
             xset = etree.SubElement(xmlb, "set")
             xspec = etree.SubElement(xset, "setSpec")
             xspec.text = setobj.spec
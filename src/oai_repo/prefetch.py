@@ -0,0 +1,193 @@
+"""
+Predictive prefetching of resumptionToken pages
+"""
+from __future__ import annotations      # To use non-string type hinting; can remove in Python 3.11
+from typing import TYPE_CHECKING
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .context import RequestContext
+if TYPE_CHECKING:                       # Prevent circular imports for type hinting
+    from .repository import OAIRepository
+    from .response import OAIResponse
+
+
+class Prefetcher:
+    """
+    Render the next page of a resumptionToken chain in the background, so a harvester
+    following the chain finds the page already prepared when it asks for it.
+
+    After a response for one of the `verbs` is generated with a resumptionToken, the
+    page for that token is rendered on a worker thread and parked in a short lived cache
+    keyed by the token. Entries are served once, then dropped.
+
+    Pages are rendered with the repository's deadline for the verb, and are not
+    prefetched while the repository's admission control has no free slots, so
+    prefetching only uses spare capacity.
+
+    Args:
+        workers (int): Number of worker threads rendering pages
+        ttl (float): Seconds a prefetched page is kept before being discarded
+        max_pending (int): Max number of prefetches queued or running at once;
+                           further prefetches are skipped until one completes
+        max_bytes (int): Max combined serialized size of cached pages, including
+                         metadata spliced in as serialized XML; the oldest pages
+                         are evicted when exceeded
+        verbs (tuple): The verbs whose responses trigger a prefetch
+
+    Important:
+        Pages are rendered concurrently with regular requests, so your `DataInterface`
+        must be safe to call from multiple threads.
+
+    **Examples:**
+    ```python
+    repo = oai_repo.OAIRepository(MyOAIData(), prefetcher=oai_repo.Prefetcher(workers=2))
+    ...
+    print(repo.prefetcher.stats, repo.prefetcher.hit_rate)
+    ```
+    """
+    def __init__(
+        self,
+        workers: int = 2,
+        ttl: float = 60.0,
+        max_pending: int = 4,
+        max_bytes: int = 64 * 1024 * 1024,
+        verbs: tuple = ("ListRecords",)
+    ):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.verbs = verbs
+        self.stats = {
+            "hits": 0, "misses": 0, "scheduled": 0, "skipped": 0,
+            "failed": 0, "evicted": 0, "expired": 0
+        }
+        self._workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        # (verb, token) => (expires, size, response)
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_bytes = 0
+        self._pending = set()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of token requests answered from prefetched pages."""
+        with self._lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return self.stats["hits"] / total if total else 0.0
+
+    def get(self, verb: str, token: str) -> OAIResponse|None:
+        """
+        Take a prefetched response for the resumptionToken from the cache.
+
+        Args:
+            verb (str): The verb of the request
+            token (str): The resumptionToken of the request
+
+        Returns:
+            The prefetched response, or None if there was none available.
+        """
+        with self._lock:
+            self._expire()
+            entry = self._cache.pop((verb, token), None)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._cache_bytes -= entry[1]
+            self.stats["hits"] += 1
+            return entry[2]
+
+    def schedule(self, repository: OAIRepository, response: OAIResponse):
+        """
+        Start rendering the page following the given response, if it has one.
+
+        Args:
+            repository (OAIRepository): The repository to render the page with
+            response (OAIResponse): A response which may contain a resumptionToken
+        """
+        if not response or response.request is None or response.request.verb not in self.verbs:
+            return
+        token = next(iter(response.xpath("//resumptionToken/text()")), None)
+        if not token:
+            return
+        key = (response.request.verb, str(token))
+        with self._lock:
+            if key in self._pending or key in self._cache:
+                return
+            if len(self._pending) >= self.max_pending or self._saturated(repository):
+                self.stats["skipped"] += 1
+                return
+            self._pending.add(key)
+            self.stats["scheduled"] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="oai-prefetch"
+                )
+            executor = self._executor
+        executor.submit(self._render, repository, key)
+
+    @staticmethod
+    def _saturated(repository: OAIRepository) -> bool:
+        """Return if the admission control of the repository has no free slots"""
+        admission = repository.admission
+        return admission is not None and \
+            (admission.waiting > 0 or admission.active >= admission.max_active)
+
+    def _render(self, repository: OAIRepository, key: tuple):
+        """Render the page for the key and store it in the cache."""
+        verb, token = key
+        args = {"verb": verb, "resumptionToken": token}
+        if self._saturated(repository):
+            with self._lock:
+                self._pending.discard(key)
+                self.stats["skipped"] += 1
+            return
+        timeout = repository.verb_deadlines.get(verb, repository.deadline)
+        try:
+            with RequestContext(args, timeout=timeout):
+                request = repository.create_request(args)
+                response = repository.create_response(request)
+                # Serialized now, so the size includes any metadata spliced in as bytes
+                response.serialized = bytes(response)
+            size = len(response.serialized)
+        except Exception:                 # pylint: disable=broad-exception-caught
+            # Failures are reported again to the harvester when it requests the page itself
+            with self._lock:
+                self._pending.discard(key)
+                self.stats["failed"] += 1
+            return
+        with self._lock:
+            self._pending.discard(key)
+            if size > self.max_bytes:
+                self.stats["evicted"] += 1
+                return
+            self._cache[key] = (time.monotonic() + self.ttl, size, response)
+            self._cache_bytes += size
+            while self._cache_bytes > self.max_bytes:
+                _, (_, old_size, _) = self._cache.popitem(last=False)
+                self._cache_bytes -= old_size
+                self.stats["evicted"] += 1
+
+    def _expire(self):
+        """Drop expired entries; must be called with the lock held."""
+        now = time.monotonic()
+        for key in [key for key, entry in self._cache.items() if entry[0] < now]:
+            self._cache_bytes -= self._cache.pop(key)[1]
+            self.stats["expired"] += 1
+
+    def close(self, wait: bool = True):
+        """
+        Stop the worker threads and discard all prefetched pages.
+
+        Args:
+            wait (bool): Wait for running prefetches to finish
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
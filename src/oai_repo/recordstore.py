@@ -0,0 +1,232 @@
+"""
+Memory-mapped store of serialized record metadata
+"""
+import os
+import mmap
+import struct
+import shutil
+import hashlib
+import threading
+from bisect import bisect_left
+from typing import Iterable
+from lxml import etree
+from .exceptions import OAIRepoInternalException
+from .helpers import bytes_to_xml
+
+# Index entries: 8 byte key hash, u64 offset of the pack entry, u32 length of the metadata
+INDEX_ENTRY = struct.Struct("<8sQI")
+# Pack entries: u16 length of the key, the key, then the metadata
+PACK_KEY = struct.Struct("<H")
+PACK_FILE = "records.pack"
+INDEX_FILE = "records.idx"
+CURRENT = "current"
+
+
+def record_key(identifier: str, metadataprefix: str) -> bytes:
+    """The key for a record's metadata in the store"""
+    return f"{identifier}\0{metadataprefix}".encode("utf8")
+
+def key_hash(key: bytes) -> bytes:
+    """The 8 byte hash of a key, as sorted in the index"""
+    return hashlib.blake2b(key, digest_size=8).digest()
+
+
+class _IndexKeys:
+    """Sequence of the key hashes in a memory-mapped index, for bisecting"""
+    def __init__(self, index: mmap.mmap):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index) // INDEX_ENTRY.size
+
+    def __getitem__(self, pos: int) -> bytes:
+        start = pos * INDEX_ENTRY.size
+        return self.index[start:start + 8]
+
+
+class MmapRecordStore:
+    """
+    A read-only store of serialized metadata for each (identifier, metadataPrefix),
+    held in an append-only pack file with a sorted fixed-width index, both memory-mapped.
+
+    Lookups are a binary search of the index and return a `memoryview` of the pack file,
+    without copying or parsing the metadata. Returning those from
+    `DataInterface.get_record_metadata()` writes them directly into the response.
+
+    A store is rebuilt with `MmapRecordStore.build()`, which writes a new generation of
+    files alongside the current one, then atomically swaps it in. Open stores continue to
+    read their generation until `refresh()` is called.
+
+    Files are mapped read-only, so a store opened before forking worker processes
+    shares its pages between all the workers.
+
+    Args:
+        path (str): Directory of the store, as previously passed to `build()`
+
+    **Examples:**
+    ```python
+    # Building (or rebuilding) the store from your records
+    oai_repo.MmapRecordStore.build("/var/lib/oai/store", (
+        (record.identifier, "oai_dc", record.oai_dc_xml) for record in all_records()
+    ))
+
+    class MyOAIData(oai_repo.DataInterface):
+        store = oai_repo.MmapRecordStore("/var/lib/oai/store")
+
+        def get_record_metadata(self, identifier, metadataprefix):
+            return self.store.get(identifier, metadataprefix)
+    ```
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = None
+        self._lock = threading.Lock()
+        # The (pack, index, keys) of the open generation, replaced as a whole so
+        # readers always see a consistent generation
+        self._current = None
+        self.refresh()
+
+    def __len__(self):
+        return len(self._current[2])
+
+    def _open(self, filename: str) -> mmap.mmap|bytes:
+        with open(filename, "rb") as fhandle:
+            if os.fstat(fhandle.fileno()).st_size == 0:
+                # Empty files cannot be mapped
+                return b""
+            return mmap.mmap(fhandle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def refresh(self) -> bool:
+        """
+        Switch to the current generation of the store, if it changed since it was opened.
+        Metadata previously returned remains valid.
+
+        Returns:
+            True if a new generation was opened
+
+        Raises:
+            OAIRepoInternalException: If the store does not exist
+        """
+        try:
+            generation = os.readlink(os.path.join(self.path, CURRENT))
+        except OSError as exc:
+            raise OAIRepoInternalException(f"No record store found at: {self.path}") from exc
+        with self._lock:
+            if generation == self.generation:
+                return False
+            gendir = os.path.join(self.path, generation)
+            pack = self._open(os.path.join(gendir, PACK_FILE))
+            index = self._open(os.path.join(gendir, INDEX_FILE))
+            # Previous maps are not closed, as returned memoryviews may still refer to them
+            self._current = (memoryview(pack), index, _IndexKeys(index))
+            self.generation = generation
+        return True
+
+    def get(self, identifier: str, metadataprefix: str) -> memoryview|None:
+        """
+        Return the serialized metadata for the record.
+
+        Args:
+            identifier (str): The identifier of the record
+            metadataprefix (str): The metadataPrefix of the metadata
+
+        Returns:
+            A memoryview of the serialized metadata, or None if not in the store
+        """
+        key = record_key(identifier, metadataprefix)
+        khash = key_hash(key)
+        pack, index, keys = self._current
+        pos = bisect_left(keys, khash)
+        # Entries with colliding hashes are adjacent; check the key stored in the pack
+        while pos < len(keys) and keys[pos] == khash:
+            _, offset, length = INDEX_ENTRY.unpack_from(index, pos * INDEX_ENTRY.size)
+            keylen, = PACK_KEY.unpack_from(pack, offset)
+            start = offset + PACK_KEY.size + keylen
+            if pack[offset + PACK_KEY.size:start] == key:
+                return pack[start:start + length]
+            pos += 1
+        return None
+
+    def get_many(self, identifiers: list[str], metadataprefix: str) -> list[memoryview|None]:
+        """
+        Return the serialized metadata for the records.
+
+        Args:
+            identifiers (list): The identifiers of the records
+            metadataprefix (str): The metadataPrefix of the metadata
+
+        Returns:
+            A list with a memoryview for each record, or None if not in the store
+        """
+        return [self.get(identifier, metadataprefix) for identifier in identifiers]
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        records: Iterable[tuple[str, str, bytes|etree._Element]]
+    ) -> "MmapRecordStore":
+        """
+        Write a new generation of the store from all records, then atomically make
+        it the current generation. Earlier generations are removed; stores which have
+        them open can continue to read from them until refreshed.
+
+        Args:
+            path (str): Directory of the store; created if it does not exist
+            records (Iterable): Tuples of (identifier, metadataPrefix, metadata), where the
+                                metadata is an lxml.etree.Element or serialized XML bytes
+
+        Returns:
+            The store opened at the new generation
+
+        Raises:
+            OAIRepoInternalException: If records include the same identifier and
+                                      metadataPrefix more than once
+        """
+        os.makedirs(path, exist_ok=True)
+        current = os.path.join(path, CURRENT)
+        previous = os.readlink(current) if os.path.islink(current) else None
+        number = int(previous.rsplit("-", 1)[-1]) + 1 if previous else 1
+        generation = f"gen-{number}"
+        gendir = os.path.join(path, generation)
+        os.makedirs(gendir)
+
+        entries = []
+        seen = set()
+        try:
+            with open(os.path.join(gendir, PACK_FILE), "wb") as pack:
+                offset = 0
+                for identifier, metadataprefix, metadata in records:
+                    key = record_key(identifier, metadataprefix)
+                    if key in seen:
+                        raise OAIRepoInternalException(
+                            f"Duplicate record in store: {identifier} ({metadataprefix})"
+                        )
+                    seen.add(key)
+                    if not etree.iselement(metadata):
+                        # Parsing ensures it is well-formed, and drops any XML declaration
+                        metadata = bytes_to_xml(bytes(metadata))
+                    metadata = etree.tostring(metadata, encoding="UTF-8", xml_declaration=False)
+                    pack.write(PACK_KEY.pack(len(key)) + key + metadata)
+                    entries.append((key_hash(key), offset, len(metadata)))
+                    offset += PACK_KEY.size + len(key) + len(metadata)
+                pack.flush()
+                os.fsync(pack.fileno())
+        except BaseException:
+            # The incomplete generation never becomes current
+            shutil.rmtree(gendir, ignore_errors=True)
+            raise
+        entries.sort()
+        with open(os.path.join(gendir, INDEX_FILE), "wb") as index:
+            index.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in entries))
+            index.flush()
+            os.fsync(index.fileno())
+
+        # Swap the current generation by atomically replacing the symlink
+        swap = os.path.join(path, f".{CURRENT}-{generation}")
+        os.symlink(generation, swap)
+        os.replace(swap, current)
+        for entry in os.listdir(path):
+            if entry.startswith("gen-") and entry != generation:
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+        return cls(path)
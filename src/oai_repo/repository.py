@@ -1,58 +1,160 @@
 """
 OAIRepository functionality
 """
+import copy
+import importlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
 from typing import NamedTuple
-from datetime import datetime, timezone
-from .getrecord import GetRecordRequest, GetRecordResponse
-from .identify import IdentifyRequest, IdentifyResponse
-from .listidentifiers import ListIdentifiersRequest, ListIdentifiersResponse
-from .listmetadataformats import ListMetadataFormatsRequest, ListMetadataFormatsResponse
-from .listrecords import ListRecordsRequest, ListRecordsResponse
-from .listsets import ListSetsRequest, ListSetsResponse
+from datetime import datetime
 from .exceptions import (
-    OAIError, OAIErrorBadVerb, OAIErrorBadArgument
+    OAIError, OAIErrorBadVerb, OAIErrorBadArgument, OAIRepoInternalException,
+    OAIRepoUnavailableException, OAIRepoDeadlineException
 )
 from .error import OAIErrorResponse
 from .request import OAIRequest
-from .response import OAIResponse
+from .response import OAIResponse, SerializationOptions
 from .interface import DataInterface
+from .interfacedata import FrozenIdentify, MetadataFormat, Set
+from .prefetch import Prefetcher
+from .admission import AdmissionController
+from .singleflight import SingleFlight
+from .crosswalk import Crosswalk
+from .context import RequestContext, current_context
+from .cache import LRUCache
+from .helpers import parse_datestamp
+
+_MISSING = object()
 
 class VerbClasses(NamedTuple):
     """Named access to verb classes"""
     request: OAIRequest
     response: OAIResponse
 
-VERBS = {
-    'GetRecord': VerbClasses(GetRecordRequest, GetRecordResponse),
-    'Identify': VerbClasses(IdentifyRequest, IdentifyResponse),
-    'ListIdentifiers': VerbClasses(ListIdentifiersRequest, ListIdentifiersResponse),
-    'ListMetadataFormats': VerbClasses(ListMetadataFormatsRequest, ListMetadataFormatsResponse),
-    'ListRecords': VerbClasses(ListRecordsRequest, ListRecordsResponse),
-    'ListSets': VerbClasses(ListSetsRequest, ListSetsResponse)
+# Module implementing each verb, imported when the verb is first used
+VERB_MODULES = {
+    'GetRecord': 'getrecord',
+    'Identify': 'identify',
+    'ListIdentifiers': 'listidentifiers',
+    'ListMetadataFormats': 'listmetadataformats',
+    'ListRecords': 'listrecords',
+    'ListSets': 'listsets'
 }
+VERBS: dict[str, VerbClasses] = {}
+
+def verb_classes(verb: str) -> VerbClasses:
+    """
+    Return the request and response classes for a verb, importing them on first use.
+
+    Raises:
+        KeyError: If the verb is not valid
+    """
+    classes = VERBS.get(verb)
+    if classes is None:
+        module = importlib.import_module(f".{VERB_MODULES[verb]}", __package__)
+        classes = VerbClasses(
+            getattr(module, f"{verb}Request"), getattr(module, f"{verb}Response")
+        )
+        VERBS[verb] = classes
+    return classes
+
+def request_key(args: dict) -> tuple:
+    """Return a canonical key for request arguments, equal for identical requests"""
+    return tuple(sorted((key, str(value)) for key, value in args.items()))
 
 class OAIRepository:
     """
     The primary OAI repository class which processes requests and
     returns responses.
     """
-    def __init__(self, data: DataInterface):
+    def __init__(
+        self,
+        data: DataInterface,
+        *,
+        prefetcher: Prefetcher = None,
+        approximate_size: str = "estimate",
+        counts: LRUCache = None,
+        static: LRUCache = None,
+        deadline: float|None = None,
+        verb_deadlines: dict[str, float] = None,
+        retry_after: int = 30,
+        admission: AdmissionController = None,
+        single_flight: SingleFlight = None,
+        serialization: SerializationOptions = None,
+        crosswalk: Crosswalk = None
+    ):
         """
         Initialize OAIRepository by passing in an implementation of
         the DataInterface class.
 
         Args:
             data (DataInterface): The implemented data class
+            prefetcher (Prefetcher): Optional prefetcher to render the next page
+                                     of resumptionToken chains in the background
+            approximate_size (str): When the DataInterface returns an `ApproximateSize`,
+                                    either `estimate` to send it as the `completeListSize`,
+                                    or `omit` to leave `completeListSize` out
+            counts (LRUCache): Cache for results of `DataInterface.count_identifiers`;
+                               by default up to 1024 counts are cached for 5 minutes
+            static (LRUCache): Optional cache for the Identify, metadata formats and sets
+                              of the repository from the DataInterface, such as
+                              `LRUCache(maxsize=16, ttl=300)`; by default they are only
+                              loaded once for each request
+            deadline (float|None): Seconds a request may take before it is abandoned with an
+                                   `OAIRepoDeadlineException`, or None for no deadline
+            verb_deadlines (dict): Mapping of verb to the deadline for requests of that verb,
+                                   overriding `deadline`
+            retry_after (int): Seconds after which a harvester should retry a request which
+                               raised an `OAIRepoUnavailableException`, when not set by
+                               what raised it
+            admission (AdmissionController): Optional admission control, limiting the
+                                             requests processed at once
+            single_flight (SingleFlight): Optional coalescing of identical requests, so
+                                          a request identical to one being processed
+                                          shares its response instead of repeating the work
+            serialization (SerializationOptions): Options for serializing responses; by
+                                                  default the List verbs are compact, and
+                                                  others indented
+            crosswalk (Crosswalk): Optional metadata formats derived from the formats
+                                   of the DataInterface by XSLT
         """
+        if approximate_size not in ("estimate", "omit"):
+            raise OAIRepoInternalException("approximate_size must be either: estimate, omit")
         self.data = data
+        self.prefetcher = prefetcher
+        self.approximate_size = approximate_size
+        self.counts = counts if counts is not None else LRUCache(maxsize=1024, ttl=300)
+        self.static = static
+        self.deadline = deadline
+        self.verb_deadlines = verb_deadlines or {}
+        self.retry_after = retry_after
+        self.admission = admission
+        self.single_flight = single_flight
+        self.serialization = serialization if serialization is not None \
+            else SerializationOptions()
+        self.crosswalk = crosswalk
 
-    def process(self, request: dict) -> OAIResponse:
+    def process(self, request: dict, client: str|None = None) -> OAIResponse:
         """
         Given request arguments, route to appropriate action, process the
-        request and return a response.
+        request and return a response. The request is processed within a new
+        `RequestContext`, and the passed arguments are not modified.
+
+        If the request has a deadline, processing is abandoned once it has passed,
+        raising an `OAIRepoDeadlineException`; respond to it with HTTP 503 and a
+        `Retry-After` header from its `retry_after`. The same applies to an
+        `OAIRepoOverloadedException` for requests refused by admission control.
+
+        With `single_flight`, a request with the same arguments as one being processed
+        waits for and shares its response, which is serialized once for all of them.
+        Each request is subject to admission control for its own client, before it is
+        shared. Only responses are shared; if the request being shared fails, such as
+        by passing its deadline, waiting requests are processed separately instead.
 
         Args:
             request (dict): The request arguments
+            client (str|None): Identifies the client for admission control, such as
+                               the IP address of the harvester
 
         Returns:
             An completed OAIResponse
@@ -60,20 +162,275 @@ class OAIRepository:
         Raises:
             OAIRepoInternalException: When resp creation fails due to code or API misconfiguration.
             OAIRepoExternalException: When resp creation fails due to an external API call.
+            OAIRepoUnavailableException: When the request should be retried later.
+        """
+        timeout = self.verb_deadlines.get(request.get("verb"), self.deadline)
+        with RequestContext(request, timeout=timeout) as ctx:
+            admit = self.admission.admit(request, client) if self.admission else nullcontext()
+            try:
+                with admit:
+                    if self.single_flight is None:
+                        return self._process(request)
+                    return self._coalesce(request, ctx)
+            except OAIRepoUnavailableException as exc:
+                raise self._unavailable(exc)
+
+    async def process_async(self, request: dict, client: str|None = None) -> OAIResponse:
+        """
+        Process a request as `process()` does, in a worker thread so the event loop
+        is not blocked. With `single_flight`, a request identical to one already in
+        flight awaits its result without using a thread.
+
+        Args:
+            request (dict): The request arguments
+            client (str|None): Identifies the client for admission control, such as
+                               the IP address of the harvester
+
+        Returns:
+            An completed OAIResponse
+
+        Raises:
+            OAIRepoInternalException: When resp creation fails due to code or API misconfiguration.
+            OAIRepoExternalException: When resp creation fails due to an external API call.
+            OAIRepoUnavailableException: When the request should be retried later.
+
+        **Examples:**
+        ```python
+        async def oai(request):
+            response = await repo.process_async(dict(request.query), client=request.remote)
+            return web.Response(body=bytes(response), content_type="text/xml")
+        ```
+        """
+        asyncio = importlib.import_module("asyncio")
+        future = None
+        if self.single_flight is not None:
+            future = self.single_flight.in_flight(request_key(request))
+        if future is None:
+            return await asyncio.to_thread(self.process, request, client)
+        timeout = self.verb_deadlines.get(request.get("verb"), self.deadline)
+        with RequestContext(request, timeout=timeout) as ctx:
+            key = None
+            try:
+                if self.admission is not None:
+                    key = self.admission.client_key(request, client)
+                    await asyncio.to_thread(self.admission.acquire, key)
+                try:
+                    # Shielded, so timing out does not cancel the call shared with others
+                    response = await asyncio.wait_for(
+                        asyncio.shield(asyncio.wrap_future(future)), ctx.remaining()
+                    )
+                except asyncio.TimeoutError as exc:
+                    raise OAIRepoDeadlineException(
+                        "Request deadline passed waiting for an identical request"
+                    ) from exc
+                except Exception:   # pylint: disable=broad-except
+                    # The shared request failed for reasons of its own
+                    return await asyncio.to_thread(self._process, request)
+                finally:
+                    if self.admission is not None:
+                        self.admission.release(key)
+            except OAIRepoUnavailableException as exc:
+                raise self._unavailable(exc)
+            return self._follow(response)
+
+    def _coalesce(self, request: dict, ctx: RequestContext) -> OAIResponse:
+        """
+        Process a request within the current RequestContext, sharing the response of
+        an identical request in flight, or leading one for others to share.
+        """
+        led = False
+        def lead():
+            nonlocal led
+            led = True
+            return self._process(request, serialize=True)
+        try:
+            response, shared = self.single_flight.call(
+                request_key(request), lead, timeout=ctx.remaining()
+            )
+        except FutureTimeoutError as exc:
+            if led:
+                raise
+            raise OAIRepoDeadlineException(
+                "Request deadline passed waiting for an identical request"
+            ) from exc
+        except Exception:   # pylint: disable=broad-except
+            if led:
+                raise
+            # The shared request failed for reasons of its own, such as its deadline
+            return self._process(request)
+        return self._follow(response) if shared else response
+
+    def _process(self, request: dict, serialize: bool = False) -> OAIResponse:
+        """
+        Process a request within the current RequestContext, optionally serializing
+        the response so the serialized bytes can be shared.
         """
         try:
             request = self.create_request(request)
-            response = self.create_response(request)
+            response = None
+            if self.prefetcher and "resumptionToken" in request.args:
+                response = self.prefetcher.get(request.verb, request.args["resumptionToken"])
+            if response is None:
+                response = self.create_response(request)
+            if self.prefetcher:
+                self.prefetcher.schedule(self, response)
         except OAIError as exc:
             response = OAIErrorResponse(self, exc)
+        if serialize and response.serialized is None:
+            response.serialized = bytes(response)
         return response
 
+    def _unavailable(self, exc: OAIRepoUnavailableException) -> OAIRepoUnavailableException:
+        """Complete an exception for a request to be retried later, returning it"""
+        ctx = current_context()
+        if ctx is not None and isinstance(exc, OAIRepoDeadlineException):
+            ctx.metrics["deadline_exceeded"] = True
+        if exc.retry_after is None:
+            exc.retry_after = self.retry_after
+        return exc
+
+    @staticmethod
+    def _follow(response: OAIResponse) -> OAIResponse:
+        """Return a copy of a shared response, for the current RequestContext"""
+        ctx = current_context()
+        ctx.metrics["coalesced"] = True
+        follower = copy.copy(response)
+        follower.context = ctx
+        return follower
+
+    def warm(self, connections: bool = False):
+        """
+        Load everything needed to serve requests ahead of the first request: the Identify,
+        metadata formats and sets of the repository are loaded and validated, into the
+        `static` cache if there is one, the code for every verb is imported, and
+        `DataInterface.warm()` is called.
+
+        For pre-fork servers, call this in the parent process before workers are forked,
+        so the loaded data is shared copy-on-write by all workers. Connections should not
+        be shared between processes, so call it again with `connections=True` in each
+        worker after it is forked.
+
+        Args:
+            connections (bool): Whether the DataInterface should also open its connections
+
+        Raises:
+            OAIRepoInternalException: If the Identify, a MetadataFormat, or a Set is invalid
+
+        **Examples:**
+        ```python
+        # gunicorn.conf.py, with preload_app = True
+        from myapp import repo
+
+        def when_ready(server):
+            repo.warm()
+
+        def post_fork(server, worker):
+            repo.warm(connections=True)
+        ```
+        """
+        for verb in VERB_MODULES:
+            verb_classes(verb)
+        errors = self.get_identify().errors()
+        if errors:
+            raise OAIRepoInternalException(f"Invalid Identify instance: {errors}")
+        for mdformat in self.get_metadata_formats():
+            errors = mdformat.errors()
+            if errors:
+                raise OAIRepoInternalException(f"Invalid MetadataFormat instance: {errors}")
+        try:
+            sets = self.list_sets()
+        except NotImplementedError:
+            sets = None
+        for setobj in sets or []:
+            errors = setobj.errors()
+            if errors:
+                raise OAIRepoInternalException(f"Invalid Set instance: {errors}")
+        self.data.warm(connections)
+
+    def _static(self, name: str, loader):
+        """
+        Return the named value from the `static` cache, loading it if not cached. Without
+        a `static` cache, values are cached for the current request only.
+        """
+        if self.static is None:
+            ctx = current_context()
+            if ctx is None:
+                return loader()
+            key = ("static", name)
+            if key not in ctx.cache:
+                ctx.cache[key] = loader()
+            return ctx.cache[key]
+        value = self.static.get(name, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.static.set(name, value)
+        return value
+
+    def get_identify(self) -> FrozenIdentify:
+        """Return the Identify from `DataInterface.get_identify()`, frozen and cached."""
+        return self._static("identify", lambda: self.data.get_identify().freeze())
+
+    def get_metadata_formats(self, identifier: str|None = None) -> list[MetadataFormat]:
+        """
+        Return the metadata formats from `DataInterface.get_metadata_formats()`,
+        along with the formats derived from them by the `crosswalk`. The formats of
+        the whole repository are frozen and cached; those for an identifier are not.
+
+        Args:
+            identifier (str|None): An identifier, or None for all formats of the repository
+
+        Returns:
+            The list of MetadataFormats
+        """
+        if identifier is not None:
+            formats = self.data.get_metadata_formats(identifier)
+            return self.crosswalk.extend(formats) if self.crosswalk is not None else formats
+        def load_formats():
+            formats = self.data.get_metadata_formats() or []
+            if self.crosswalk is not None:
+                formats = self.crosswalk.extend(formats)
+            return [mdformat.freeze() for mdformat in formats]
+        return self._static("metadata_formats", load_formats)
+
+    def is_derived(self, metadataprefix: str) -> bool:
+        """Return if the metadataPrefix is derived from another format by the `crosswalk`"""
+        return self.crosswalk is not None and self.crosswalk.derives(metadataprefix)
+
+    def source_prefix(self, metadataprefix: str) -> str:
+        """
+        Return the metadataPrefix to query the DataInterface with for a format; the source
+        format of a derived format, otherwise the format itself.
+        """
+        return self.crosswalk.source_prefix(metadataprefix) \
+            if self.crosswalk is not None else metadataprefix
+
+    def list_sets(self) -> list[Set]|None:
+        """
+        Return all sets of the repository, from `DataInterface.list_set_specs()` and
+        `DataInterface.get_set()`, cached.
+
+        Returns:
+            The list of Sets, or None if the repository does not support sets.
+        """
+        def load_sets():
+            setspecs = []
+            while True:
+                page, size, _ = self.data.list_set_specs(cursor=len(setspecs))
+                if page is None and not setspecs:
+                    return None
+                setspecs.extend(page or [])
+                # Continue through the further pages of a resumable list
+                if not page or size is None or len(setspecs) >= size:
+                    return [self.data.get_set(setspec) for setspec in setspecs]
+        return self._static("sets", load_sets)
+
     @staticmethod
     def create_request(args: dict) -> OAIRequest:
         """Given arguments, create an appropriate new OAI request object"""
         try:
+            args = dict(args)
             verb = args.pop('verb')
-            request = VERBS[verb].request()
+            request = verb_classes(verb).request()
             request.parse(args)
             return request
         except KeyError:
@@ -83,7 +440,40 @@ class OAIRepository:
 
     def create_response(self, request: OAIRequest) -> OAIResponse:
         """Given a request, create an appropriate OAI response object"""
-        return VERBS[request.verb].response(self, request)
+        return verb_classes(request.verb).response(self, request)
+
+    def count_identifiers(
+        self,
+        metadataprefix: str,
+        filter_from: datetime,
+        filter_until: datetime,
+        filter_set: str,
+        state = None,
+        snapshot: str = None
+    ) -> int|None:
+        """
+        Return the count from `DataInterface.count_identifiers` for the parameters, using
+        a cached count when available for the same parameters and state.
+
+        Returns:
+            The count, or None if the DataInterface does not implement counting.
+        """
+        key = (
+            metadataprefix, filter_from, filter_until, filter_set,
+            str(state) if state is not None else None, snapshot
+        )
+        size = self.counts.get(key)
+        if size is None:
+            kwargs = {"snapshot": snapshot} if snapshot is not None else {}
+            try:
+                size = self.data.count_identifiers(
+                    metadataprefix, filter_from, filter_until, filter_set, **kwargs
+                )
+            except NotImplementedError:
+                return None
+            if size is not None:
+                self.counts.set(key, size)
+        return size
 
     def valid_date(self, datestr: str):
         """
@@ -100,21 +490,11 @@ class OAIRepository:
                 or if date was not valid according to the repository
                 granularity.
         """
-        allowed_datefmts = ["%Y-%m-%d"]
-
-        if self.data.get_identify().granularity == "YYYY-MM-DDThh:mm:ssZ":
-            allowed_datefmts.append("%Y-%m-%dT%H:%M:%SZ")
-
         if datestr is None:
             return None
-
-        for datefmt in allowed_datefmts:
-            try:
-                date = datetime.strptime(datestr.strip(), datefmt).replace(tzinfo=timezone.utc)
-                return date
-            except (TypeError, ValueError):
-                continue
-
-        raise OAIErrorBadArgument(
-            "A date passed in not in a valid format. See Identify for granularity."
-        ) from None
+        try:
+            return parse_datestamp(datestr, self.get_identify().granularity)
+        except (TypeError, ValueError):
+            raise OAIErrorBadArgument(
+                "A date passed in not in a valid format. See Identify for granularity."
+            ) from None
@@ -2,10 +2,13 @@
 Handling OAI-PMH responses
 """
 from __future__ import annotations      # To use non-string type hinting; can remove in Python 3.11
+import re
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 from datetime import datetime, timezone
 from lxml import etree
 from .helpers import datestamp_long
+from .context import current_context
 if TYPE_CHECKING:                       # Prevent circular imports for type hinting
     from .request import OAIRequest
     from .repository import OAIRepository
@@ -36,11 +39,65 @@ OAIDC_SCHEMA = (
     b"http://www.openarchives.org/OAI/2.0/oai_dc/ "
     b"http://www.openarchives.org/OAI/2.0/oai_dc.xsd"
 )
+# Processing instruction marking where serialized metadata is placed in a response
+RAW_METADATA_PI = "oai-raw"
+RAW_METADATA_RE = re.compile(rb"<\?" + RAW_METADATA_PI.encode() + rb" (\d+)\?>")
+
+@dataclass(frozen=True)
+class SerializationOptions:
+    """
+    Options for serializing responses to bytes, passed as the `serialization` argument
+    of `OAIRepository`.
+
+    Attributes:
+        pretty_print (bool|None): Whether to indent the XML, or None for the default of
+                                  each verb: compact for the List verbs, as their responses
+                                  are large and harvesters don't need the whitespace, and
+                                  indented otherwise
+        xml_declaration (bool): Whether to start the response with an XML declaration
+        encoding (str): The character encoding; must be ASCII compatible, such as
+                        `UTF-8` or `ISO-8859-1`
+        namespaces (dict): Mapping of metadataPrefix to the namespaces used by its
+                           metadata, as a dict of prefix to namespace URI like
+                           `NSMAP_OAIDC`. These are declared once on the root element
+                           of GetRecord and ListRecords responses for the metadataPrefix,
+                           instead of on the metadata of every record. Metadata provided
+                           as serialized XML keeps its own declarations.
+
+    **Examples:**
+    ```python
+    repo = oai_repo.OAIRepository(
+        MyOAIData(),
+        serialization=oai_repo.SerializationOptions(
+            pretty_print=True,
+            namespaces={"oai_dc": oai_repo.NSMAP_OAIDC}
+        )
+    )
+    ```
+    """
+    pretty_print: bool|None = None
+    xml_declaration: bool = True
+    encoding: str = "UTF-8"
+    namespaces: dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def utf8(self) -> bool:
+        """Whether the encoding is UTF-8"""
+        return self.encoding.lower().replace("-", "").replace("_", "") == "utf8"
+
+    def declaration(self) -> bytes:
+        """Return the XML declaration line for the encoding"""
+        if self.utf8:
+            return XML_HEADER
+        return f'<?xml version="1.0" encoding="{self.encoding}" ?>\n'.encode("ascii")
 
 class OAIResponse:
     """
     Base class for OAI responses
     """
+    # Whether the response is indented when `SerializationOptions.pretty_print` is None
+    pretty_print: bool = True
+
     def __init__(
         self,
         repository: OAIRepository,
@@ -49,8 +106,12 @@ class OAIResponse:
     ):
         self.repository = repository
         self.request = request
+        # The context of the request this response was generated for
+        self.context = current_context()
+        # The response as bytes, once serialized for sharing between requests
+        self.serialized: bytes|None = None
         # root element
-        self.xmlr = etree.Element("OAI-PMH", nsmap=NSMAP_BASE)
+        self.xmlr = etree.Element("OAI-PMH", nsmap=self.root_nsmap())
         self.xmlr.set(*NSMAP_SCHEMA)
         # responseDate element
         response_date = response_date if response_date else datetime.now(timezone.utc)
@@ -58,7 +119,7 @@ class OAIResponse:
         response_date_elem.text = datestamp_long(response_date)
         # request element
         request_elem = etree.SubElement(self.xmlr, "request")
-        request_elem.text = self.repository.data.get_identify().base_url
+        request_elem.text = self.repository.get_identify().base_url
         if self and self.request:
             for argk, argv in self.request.args.items():
                 request_elem.set(argk, argv)
@@ -79,6 +140,30 @@ class OAIResponse:
         """
         return True
 
+    def metadata_prefix(self) -> str|None:
+        """
+        Return the metadataPrefix of the metadata in the response, or None if it
+        has no metadata.
+        """
+        return None
+
+    def root_nsmap(self) -> dict:
+        """
+        Return the namespaces to declare on the root element: those of the OAI-PMH
+        envelope, and those registered in `SerializationOptions.namespaces` for the
+        metadataPrefix of the response. Metadata added to the response then reuses
+        these declarations rather than repeating its own.
+        """
+        namespaces = self.repository.serialization.namespaces
+        hoisted = namespaces.get(self.metadata_prefix()) if namespaces else None
+        if not hoisted:
+            return NSMAP_BASE
+        # The envelope namespaces take precedence over conflicting prefixes
+        return {
+            **NSMAP_BASE,
+            **{prefix: uri for prefix, uri in hoisted.items() if prefix not in NSMAP_BASE}
+        }
+
     def body(self) -> etree.Element:
         """
         Abstract method to generate OAI response body.
@@ -96,16 +181,38 @@ class OAIResponse:
 
     def xpath(self, query: str) -> etree.Element:
         """
-        Return results of an xpath query from the root element.
+        Return results of an xpath query from the root element. Metadata provided
+        as serialized XML is not included in the results.
         """
         return self.xmlr.xpath(query)
 
     def __bytes__(self):
         """
-        Return the XML response as bytes, including an XML header line.
+        Return the XML response as bytes, including an XML header line unless disabled.
+        Serialized according to the `SerializationOptions` of the repository.
         ```python
         response = repo.process(args)
         xml_bytes = bytes(response)
         ```
         """
-        return XML_HEADER + etree.tostring(self.xmlr, pretty_print=True)
+        if self.serialized is not None:
+            return self.serialized
+        options = self.repository.serialization
+        pretty_print = self.pretty_print if options.pretty_print is None \
+            else options.pretty_print
+        xml = etree.tostring(
+            self.xmlr, pretty_print=pretty_print, encoding=options.encoding,
+            xml_declaration=False
+        )
+        raw = self.context.cache.get("raw_metadata") if self.context is not None else None
+        if raw:
+            # Splice in serialized metadata; odd parts are indexes of the metadata
+            parts = RAW_METADATA_RE.split(xml)
+            parts[1::2] = [raw[int(idx)] for idx in parts[1::2]]
+            if not options.utf8:
+                parts[1::2] = [
+                    bytes(part).decode("utf-8").encode(options.encoding, "xmlcharrefreplace")
+                    for part in parts[1::2]
+                ]
+            xml = b"".join(parts)
+        return options.declaration() + xml if options.xml_declaration else xml
@@ -8,7 +8,10 @@ from hashlib import blake2s
 from urllib.parse import urlencode, parse_qs
 from lxml import etree
 from . import helpers
-from .exceptions import OAIErrorBadResumptionToken
+from .response import OAIResponse
+from .interfacedata import ApproximateSize
+from .context import check_deadline
+from .exceptions import OAIErrorBadResumptionToken, OAIErrorCannotDisseminateFormat
 
 
 class ResumptionToken:
@@ -23,11 +26,15 @@ class ResumptionToken:
         self.cursor: int = None
         self.complete_list_size: int = None
         self.expiration_date: datetime = None
+        # An optional snapshot the results are pinned to; see DataInterface.get_snapshot()
+        self.snapshot: str = None
+        # Whether complete_list_size is only an estimate
+        self.approximate: bool = False
 
     def __repr__(self):
         return (
             f"ResumptionToken(cursor={self.cursor}, size={self.complete_list_size}, "
-            f"expiration={self.expiration_date}, args={self.args})"
+            f"expiration={self.expiration_date}, snapshot={self.snapshot}, args={self.args})"
         )
 
     @property
@@ -52,6 +59,18 @@ class ResumptionToken:
         if state:
             self._state_hash = blake2s(str(state).encode('utf8'), digest_size=8).hexdigest()
 
+    def chain(self) -> str:
+        """
+        Return an identifier for the chain of tokens this token is part of, which is
+        the same for the token of every page of a list.
+
+        Returns:
+            The chain identifier as a hex string
+        """
+        parts = sorted((self.args or {}).items())
+        parts += [("h", self.state_hash or ""), ("a", self.snapshot or "")]
+        return blake2s(urlencode(parts).encode('utf8'), digest_size=8).hexdigest()
+
     def __bool__(self):
         """
         Return True if this ResumptionToken instance have data sufficient to generate
@@ -111,6 +130,10 @@ class ResumptionToken:
                 ).replace(tzinfo=timezone.utc)
             if 'h' in tdict:
                 self._state_hash = tdict.pop('h')
+            if 'a' in tdict:
+                self.snapshot = tdict.pop('a')
+            if 'x' in tdict:
+                self.approximate = tdict.pop('x') == '1'
             self.args = tdict
         except Exception as exc:
             raise OAIErrorBadResumptionToken from exc
@@ -131,5 +154,158 @@ class ResumptionToken:
             tdict['e'] = int(time.mktime(self.expiration_date.timetuple()))
         if self.state_hash is not None:
             tdict['h'] = self.state_hash
+        if self.snapshot is not None:
+            tdict['a'] = self.snapshot
+        if self.approximate:
+            tdict['x'] = 1
         targstr = urlencode(tdict).encode('utf8')
         return base64.b64encode(targstr)
+
+
+class ResumableResponse(OAIResponse):  # pylint: disable=abstract-method
+    """
+    Shared functionality for responses to verbs which list results across
+    multiple pages using resumptionTokens
+    """
+    pretty_print = False
+
+    def check_metadata_prefix(self):
+        """
+        Verify the requested metadataPrefix is supported by the repository
+
+        Raises:
+            OAIErrorCannotDisseminateFormat
+        """
+        mdformats = self.repository.get_metadata_formats()
+        if self.request.metadata_prefix not in [mdf.metadata_prefix for mdf in mdformats]:
+            raise OAIErrorCannotDisseminateFormat(
+                "The given metadataPrefix not suported by this repository"
+            )
+
+    def next_cursor(self) -> int:
+        """Return the cursor position for the page being generated"""
+        return (
+            self.request.token.cursor + self.repository.data.limit
+            if self.request.token.cursor is not None else 0
+        )
+
+    def current_snapshot(self) -> str|None:
+        """
+        Return the snapshot this response is pinned to: the one from the request token,
+        or for a new harvest, the current snapshot from the DataInterface.
+        """
+        if self.request.token.snapshot is not None:
+            return self.request.token.snapshot
+        snapshot = self.repository.data.get_snapshot()
+        return str(snapshot) if snapshot is not None else None
+
+    def list_page(self, method: str, cursor: int, snapshot: str|None) -> tuple:
+        """
+        Query the DataInterface for the page of results at the cursor position.
+
+        Args:
+            method (str): The DataInterface method to call, one of `list_identifiers`,
+                          `list_headers`, or `list_records`
+            cursor (int): The cursor position of the page
+            snapshot (str|None): The snapshot the results are pinned to
+
+        Returns:
+            The tuple as returned by the DataInterface method, with the size
+                filled in by `count_identifiers` if needed.
+
+        Raises:
+            NotImplementedError: If the DataInterface does not implement the method
+            OAIRepoDeadlineException: If the deadline of the request has passed
+        """
+        kwargs = {"snapshot": snapshot} if snapshot is not None else {}
+        filters = (
+            self.repository.source_prefix(self.request.metadata_prefix),
+            self.repository.valid_date(self.request.filter_from),
+            self.repository.valid_date(self.request.filter_until),
+            self.request.filter_set
+        )
+        results, new_size, state = getattr(self.repository.data, method)(
+            *filters, cursor, **kwargs
+        )
+        check_deadline()
+        if new_size is None:
+            new_size = self.repository.count_identifiers(*filters, state, snapshot)
+        results = results or []
+        return results, self.page_size(new_size, cursor, len(results)), state
+
+    def page_size(self, new_size: int|None, cursor: int, count: int) -> int|None:
+        """
+        Return the size to use for paging. An approximate size is adjusted so that paging
+        continues while pages are full, and ends at the first page which is not.
+        """
+        if not isinstance(new_size, ApproximateSize):
+            return new_size
+        limit = self.repository.data.limit
+        if count < limit:
+            return ApproximateSize(cursor + count)
+        return ApproximateSize(max(new_size, cursor + limit + 1))
+
+    def no_results(self) -> bool:
+        """
+        Whether it is acceptable for this page to have no results; the final page of a
+        harvest with an approximate size may turn out to be empty.
+        """
+        return self.request.token.approximate
+
+    def check_token(self, new_size: int|None, state, snapshot: str|None):
+        """
+        Verify the request token is still valid for the current results. Tokens pinned
+        to a snapshot remain valid regardless of changes in the data.
+
+        Raises:
+            OAIErrorBadResumptionToken
+        """
+        if snapshot is not None:
+            return
+        # TODO allow custom token invalidation logic
+        if (
+            not self.request.token.approximate and
+            not isinstance(new_size, ApproximateSize) and
+            new_size is not None and
+            self.request.token.complete_list_size is not None and
+            new_size < self.request.token.complete_list_size
+        ):
+            raise OAIErrorBadResumptionToken("Token is no longer valid as data has changed.")
+        if self.request.token.state_hash:
+            current = ResumptionToken()
+            current.set_state(state)
+            if self.request.token.state_hash != current.state_hash:
+                raise OAIErrorBadResumptionToken("Token is no longer valid as data has changed.")
+
+    def append_token(
+        self,
+        xmlb: etree._Element,
+        cursor: int,
+        new_size: int|None,
+        state,
+        snapshot: str|None
+    ):
+        """
+        Append a resumptionToken to the response body if there are more results than fit
+        on a single page.
+        """
+        if new_size is None or new_size <= self.repository.data.limit:
+            return
+        token = ResumptionToken()
+        token.cursor = cursor
+        token.complete_list_size = new_size
+        token.snapshot = snapshot
+        token.approximate = isinstance(new_size, ApproximateSize)
+        if snapshot is None:
+            token.set_state(state)
+        token.args = { "metadataPrefix": self.request.metadata_prefix }
+        if self.request.filter_from:
+            token.args['from'] = self.request.filter_from
+        if self.request.filter_until:
+            token.args['until'] = self.request.filter_until
+        if self.request.filter_set:
+            token.args['set'] = self.request.filter_set
+        if (token_xml := token.xml(self.repository.data.limit)) is not None:
+            if token.approximate and self.repository.approximate_size == "omit":
+                token_xml.attrib.pop("completeListSize", None)
+            xmlb.append(token_xml)
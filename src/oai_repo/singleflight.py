@@ -0,0 +1,91 @@
+"""
+Coalescing of identical concurrent calls into a single call
+"""
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, so that while a call for a key is in
+    flight, further calls for that key wait for and share its result instead of making
+    the call again. Results are not kept once the call completes.
+
+    In-flight calls are `concurrent.futures.Future`s, which threads wait on directly,
+    and asyncio tasks can await with `asyncio.wrap_future()`.
+
+    Attributes:
+        stats (dict): Counts of `leaders` which made calls, and `followers` which
+                      shared the result of a call in flight
+
+    **Examples:**
+    ```python
+    flights = oai_repo.SingleFlight()
+    result, shared = flights.call(("record", identifier), lambda: load_record(identifier))
+    ```
+    """
+    def __init__(self):
+        self.stats = {"leaders": 0, "followers": 0}
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def in_flight(self, key: Hashable) -> Future|None:
+        """
+        Return the future of the call in flight for the key, if any.
+
+        Args:
+            key (Hashable): The call key
+
+        Returns:
+            The Future of the call, or None if no call is in flight for the key.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["followers"] += 1
+            return future
+
+    def call(self, key: Hashable, func: Callable, timeout: float|None = None) -> tuple:
+        """
+        Call the function, unless a call for the key is already in flight, in which case
+        wait for that call's result. Exceptions raised by the call are raised to all
+        callers sharing it.
+
+        Args:
+            key (Hashable): The call key; calls with equal keys must be interchangeable
+            func (Callable): The function to call, without arguments
+            timeout (float|None): Max seconds to wait for a call in flight, or None
+                                  to wait until it completes
+
+        Returns:
+            A tuple of the result, and whether it was shared from a call in flight.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the call in flight did not complete in time
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.stats["leaders"] += 1
+                leader = True
+            else:
+                self.stats["followers"] += 1
+                leader = False
+        if not leader:
+            return future.result(timeout), True
+        try:
+            result = func()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, False
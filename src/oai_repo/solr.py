@@ -0,0 +1,359 @@
+"""
+A ready to use DataInterface for repositories indexed in Solr
+"""
+from datetime import datetime, timezone
+from lxml import etree
+from . import helpers
+from .cache import LRUCache
+from .context import current_context
+from .interface import DataInterface
+from .interfacedata import Identify, MetadataFormat, RecordHeader, RecordBundle, Set
+
+
+def solr_quote(value: str) -> str:
+    """Quote a value for use as a term in a Solr query"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def solr_date(timestamp: datetime) -> str:
+    """Format a datetime for use in a Solr date range query"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return helpers.datestamp_long(timestamp)
+
+def parse_solr_date(value: str) -> datetime:
+    """Parse a date as returned by Solr into a datetime"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+# Sizes of lists are always known, so the optional count_identifiers is deliberately left out
+class SolrDataInterface(DataInterface):  # pylint: disable=abstract-method
+    """
+    A DataInterface serving records from a Solr index, where each Solr document is
+    one OAI record and its metadata is stored as serialized XML in a stored field.
+
+    Each page of results is retrieved with a single request, using `cursorMark` deep
+    paging to avoid the cost of large `start` offsets, and ListSets uses a facet query
+    on the sets field.
+
+    Args:
+        url (str): The URL of the Solr core, e.g. `http://localhost:8983/solr/oai`
+        identify (Identify): The Identify for the repository
+        formats (list): The MetadataFormats available in the repository
+        metadata_fields (dict): Mapping of metadataPrefix to the stored Solr field holding
+                                the metadata XML for that format; defaults to a field
+                                named the same as the metadataPrefix
+        fields (dict): Mapping of OAI header fields to Solr fields. Keys are `identifier`
+                       (must be the uniqueKey), `datestamp` (a date field), `setspecs`
+                       (a multi-valued string field, also holding all ancestors of each
+                       setSpec), `deleted` (a boolean field) and `about` (a multi-valued
+                       stored field of XML). Set `setspecs`, `deleted` or `about`
+                       to None if not available.
+        query (str): The Solr query selecting documents which are OAI records
+        set_names (dict): Mapping of setSpec to setName; setSpecs not in the mapping
+                          use the setSpec as the name
+        cursor_cache (LRUCache): Cache of `cursorMark` values for continuing a result
+                                 list at a cursor position
+
+    **Examples:**
+    ```python
+    data = oai_repo.SolrDataInterface(
+        "http://localhost:8983/solr/oai",
+        identify,
+        [oai_dc_format, mods_format],
+        {"oai_dc": "oai_dc_xml", "mods": "mods_xml"},
+        fields={"identifier": "id", "datestamp": "modified_dt", "setspecs": "sets_ss"},
+    )
+    repo = oai_repo.OAIRepository(data)
+    ```
+    """
+    default_fields = {
+        "identifier": "id",
+        "datestamp": "timestamp",
+        "setspecs": "sets",
+        "deleted": None,
+        "about": None,
+    }
+
+    def __init__(
+        self,
+        url: str,
+        identify: Identify,
+        formats: list[MetadataFormat],
+        metadata_fields: dict[str, str] = None,
+        fields: dict = None,
+        query: str = "*:*",
+        set_names: dict = None,
+        cursor_cache: LRUCache = None
+    ):
+        self.url = url.rstrip("/")
+        self.identify = identify
+        self.formats = formats
+        self.metadata_fields = metadata_fields or {}
+        self.fields = {**self.default_fields, **(fields or {})}
+        self.query = query
+        self.set_names = set_names or {}
+        self.cursor_cache = cursor_cache if cursor_cache is not None else LRUCache(4096, 3600)
+
+    def metadata_field(self, metadataprefix: str) -> str|None:
+        """Return the Solr field holding metadata for the prefix"""
+        for mdformat in self.formats:
+            if mdformat.metadata_prefix == metadataprefix:
+                return self.metadata_fields.get(metadataprefix, metadataprefix)
+        return None
+
+    def available_formats(self, doc: dict) -> list[MetadataFormat]:
+        """Return the MetadataFormats with metadata in a Solr document"""
+        return [
+            mdformat for mdformat in self.formats
+            if doc.get(self.metadata_field(mdformat.metadata_prefix))
+        ]
+
+    def all_metadata_fields(self) -> list[str]:
+        """Solr fields holding metadata for any format"""
+        return [self.metadata_field(mdformat.metadata_prefix) for mdformat in self.formats]
+
+    def select(self, params: list) -> dict:
+        """Run a query on the Solr select handler"""
+        return helpers.apicall_getjson(
+            f"{self.url}/select",
+            [("q", self.query), ("wt", "json")] + params
+        )
+
+    def header_fields(self) -> list[str]:
+        """Solr fields needed to build a RecordHeader"""
+        return [
+            field for key, field in self.fields.items()
+            if key in ("identifier", "datestamp", "setspecs", "deleted") and field
+        ]
+
+    def doc_header(self, doc: dict) -> RecordHeader:
+        """Build a RecordHeader from a Solr document"""
+        datestamp = doc.get(self.fields["datestamp"])
+        if isinstance(datestamp, list):
+            datestamp = datestamp[0]
+        deleted = doc.get(self.fields["deleted"]) if self.fields["deleted"] else False
+        return RecordHeader(
+            doc[self.fields["identifier"]],
+            parse_solr_date(datestamp) if datestamp else None,
+            list(doc.get(self.fields["setspecs"], [])) if self.fields["setspecs"] else [],
+            "deleted" if deleted else None
+        )
+
+    def doc_metadata(self, doc: dict, metadataprefix: str) -> etree._Element|None:
+        """Load the metadata for the prefix from a Solr document"""
+        value = doc.get(self.metadata_field(metadataprefix))
+        if isinstance(value, list):
+            value = value[0] if value else None
+        return helpers.bytes_to_xml(value.encode("utf8")) if value else None
+
+    def doc_abouts(self, doc: dict) -> list[etree._Element]:
+        """Load the abouts from a Solr document"""
+        if not self.fields["about"]:
+            return []
+        return [
+            helpers.bytes_to_xml(about.encode("utf8"))
+            for about in doc.get(self.fields["about"], [])
+        ]
+
+    def docs_by_identifier(self, identifiers: list[str], fields: list[str]) -> dict:
+        """
+        Retrieve the Solr documents for the identifiers in a single request.
+
+        Returns:
+            A dict of identifier to Solr document
+        """
+        if not identifiers:
+            return {}
+        idfield = self.fields["identifier"]
+        resp = self.select([
+            ("fq", "{!terms f=" + idfield + " separator='\u001f'}" + "\u001f".join(identifiers)),
+            ("fl", ",".join(dict.fromkeys([idfield] + fields))),
+            ("rows", len(identifiers)),
+        ])
+        return {doc[idfield]: doc for doc in resp["response"]["docs"]}
+
+    def warm(self, connections: bool = False):
+        if connections:
+            # Open a pooled connection to Solr
+            self.select([("rows", 0)])
+
+    def get_identify(self) -> Identify:
+        return self.identify
+
+    def is_valid_identifier(self, identifier: str) -> bool:
+        return identifier in self.docs_by_identifier([identifier], [])
+
+    def get_metadata_formats(self, identifier: str|None = None) -> list[MetadataFormat]:
+        if identifier is None:
+            return list(self.formats)
+        doc = self.docs_by_identifier([identifier], self.all_metadata_fields()).get(identifier)
+        return self.available_formats(doc) if doc is not None else []
+
+    def get_record_header(self, identifier: str) -> RecordHeader|None:
+        return self.get_records_header([identifier])[0]
+
+    def get_records_header(self, identifiers: list[str]) -> list[RecordHeader|None]:
+        docs = self.docs_by_identifier(identifiers, self.header_fields())
+        return [
+            self.doc_header(docs[identifier]) if identifier in docs else None
+            for identifier in identifiers
+        ]
+
+    def get_record_metadata(self, identifier: str, metadataprefix: str) -> etree._Element|None:
+        return self.get_records_metadata([identifier], metadataprefix)[0]
+
+    def get_records_metadata(self, identifiers: list[str], metadataprefix: str) \
+        -> list[etree._Element|None]:
+        field = self.metadata_field(metadataprefix)
+        if field is None:
+            return [None] * len(identifiers)
+        docs = self.docs_by_identifier(identifiers, [field])
+        return [
+            self.doc_metadata(docs[identifier], metadataprefix) if identifier in docs else None
+            for identifier in identifiers
+        ]
+
+    def get_record_abouts(self, identifier: str) -> list[etree._Element]:
+        return self.get_records_abouts([identifier])[0]
+
+    def get_records_abouts(self, identifiers: list[str]) -> list[list[etree._Element]]:
+        if not self.fields["about"]:
+            return [[] for _ in identifiers]
+        docs = self.docs_by_identifier(identifiers, [self.fields["about"]])
+        return [self.doc_abouts(docs.get(identifier, {})) for identifier in identifiers]
+
+    def get_record_bundle(self, identifier: str, metadataprefix: str) -> RecordBundle|None:
+        fields = self.header_fields() + self.all_metadata_fields()
+        if self.fields["about"]:
+            fields.append(self.fields["about"])
+        doc = self.docs_by_identifier([identifier], fields).get(identifier)
+        if doc is None:
+            return None
+        return RecordBundle(
+            self.doc_header(doc),
+            self.available_formats(doc),
+            self.doc_metadata(doc, metadataprefix),
+            self.doc_abouts(doc)
+        )
+
+    def set_facets(self) -> list[str]:
+        """
+        Return all setSpecs in the index using a facet query; the result is cached
+        for the duration of the request.
+        """
+        ctx = current_context()
+        cache = ctx.cache if ctx is not None else {}
+        if "solr_sets" not in cache:
+            field = self.fields["setspecs"]
+            resp = self.select([
+                ("rows", 0), ("facet", "true"), ("facet.field", field),
+                ("facet.limit", -1), ("facet.mincount", 1), ("facet.sort", "index"),
+            ])
+            counts = resp["facet_counts"]["facet_fields"][field]
+            # Solr returns facets as a flat list of [value, count, value, count, ...]
+            cache["solr_sets"] = counts[::2]
+        return cache["solr_sets"]
+
+    def list_set_specs(self, identifier: str=None, cursor: int=0) -> tuple:
+        if not self.fields["setspecs"]:
+            return None, None, None
+        if identifier is not None:
+            header = self.get_record_header(identifier)
+            return (header.setspecs if header is not None else []), None, None
+        setspecs = self.set_facets()
+        return setspecs, len(setspecs), None
+
+    def get_set(self, setspec: str) -> Set|None:
+        if not self.fields["setspecs"] or setspec not in self.set_facets():
+            return None
+        return Set(setspec, self.set_names.get(setspec, setspec), [])
+
+    def page(self,
+        metadataprefix: str,
+        filter_from: datetime,
+        filter_until: datetime,
+        filter_set: str,
+        cursor: int,
+        fields: list[str]
+    ) -> tuple[list[dict], int]:
+        """
+        Retrieve the Solr documents for a page of results in a single request,
+        continuing from a cached `cursorMark` when one is available for the cursor.
+
+        Returns:
+            A tuple of the Solr documents, and the total number of results
+        """
+        has_format = f"{self.metadata_field(metadataprefix)}:[* TO *]"
+        if self.fields["deleted"]:
+            # Deleted records no longer have metadata, but are still listed
+            has_format += f" OR {self.fields['deleted']}:true"
+        filters = [("fq", has_format)]
+        if filter_from or filter_until:
+            date_start = solr_date(filter_from) if filter_from else "*"
+            date_end = solr_date(filter_until) if filter_until else "*"
+            filters.append(("fq", f"{self.fields['datestamp']}:[{date_start} TO {date_end}]"))
+        if filter_set:
+            filters.append(("fq", f"{self.fields['setspecs']}:{solr_quote(filter_set)}"))
+        sort = f"{self.fields['datestamp']} asc,{self.fields['identifier']} asc"
+        params = filters + [
+            ("sort", sort), ("rows", self.limit),
+            ("fl", ",".join(dict.fromkeys([self.fields["identifier"]] + fields)))
+        ]
+
+        cache_key = (tuple(filters), cursor)
+        mark = "*" if cursor == 0 else self.cursor_cache.get(cache_key)
+        if mark is None:
+            # No cursorMark for this position; fall back to an offset
+            resp = self.select(params + [("start", cursor)])
+        else:
+            resp = self.select(params + [("cursorMark", mark)])
+            if "nextCursorMark" in resp:
+                self.cursor_cache.set((tuple(filters), cursor + self.limit), resp["nextCursorMark"])
+        return resp["response"]["docs"], resp["response"]["numFound"]
+
+    def list_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0
+    ) -> tuple:
+        docs, size = self.page(metadataprefix, filter_from, filter_until, filter_set, cursor, [])
+        return [doc[self.fields["identifier"]] for doc in docs], size, None
+
+    def list_headers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        docs, size = self.page(
+            metadataprefix, filter_from, filter_until, filter_set, cursor, self.header_fields()
+        )
+        return [self.doc_header(doc) for doc in docs], size, None
+
+    def list_records(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        fields = self.header_fields() + [self.metadata_field(metadataprefix)]
+        if self.fields["about"]:
+            fields.append(self.fields["about"])
+        docs, size = self.page(
+            metadataprefix, filter_from, filter_until, filter_set, cursor, fields
+        )
+        bundles = [
+            RecordBundle(
+                self.doc_header(doc),
+                metadata=self.doc_metadata(doc, metadataprefix),
+                abouts=self.doc_abouts(doc)
+            )
+            for doc in docs
+        ]
+        return bundles, size, None
@@ -0,0 +1,564 @@
+"""
+A ready to use DataInterface for repositories stored in a SQL database
+"""
+import os
+import queue
+import weakref
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable
+from lxml import etree
+from . import helpers
+from .cache import LRUCache
+from .context import current_context, check_deadline
+from .exceptions import OAIRepoExternalException, OAIRepoInternalException
+from .interface import DataInterface
+from .interfacedata import Identify, MetadataFormat, RecordHeader, RecordBundle, Set
+
+PARAMSTYLES = ("qmark", "numeric", "named", "format", "pyformat")
+# All pools, to discard connections inherited by forked processes
+_POOLS = weakref.WeakSet()
+
+
+def parse_sql_date(value: str|datetime) -> datetime:
+    """Parse a datestamp as returned by the database into a datetime, assuming UTC if naive"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of DB-API 2.0 connections, opened as needed up to a max size.
+    Connections opened before a process forks are not used by the forked process.
+
+    Args:
+        connect (Callable): A function returning a new DB-API connection
+        size (int): Max number of connections to open
+        timeout (float): Seconds to wait for a connection when all are in use
+
+    **Examples:**
+    ```python
+    pool = oai_repo.ConnectionPool(lambda: psycopg2.connect(dsn), size=8)
+    with pool.connection() as conn:
+        ...
+    ```
+    """
+    def __init__(self, connect: Callable, size: int = 4, timeout: float = 10):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        _POOLS.add(self)
+
+    def _after_fork(self):
+        """
+        Forget connections inherited from the parent process, without closing them
+        as that could also close them for the parent.
+        """
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            opening = self._opened < self.size
+            if opening:
+                self._opened += 1
+        if opening:
+            try:
+                return self.connect()
+            except Exception as exc:
+                with self._lock:
+                    self._opened -= 1
+                raise OAIRepoExternalException("Unable to connect to database") from exc
+        # Wait no longer than the deadline of the current request
+        ctx = current_context()
+        remaining = ctx.remaining() if ctx is not None else None
+        timeout = self.timeout if remaining is None else max(min(self.timeout, remaining), 0)
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty as exc:
+            check_deadline()
+            raise OAIRepoExternalException("No database connection available") from exc
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager to borrow a connection from the pool. A connection which raised
+        an exception while borrowed is closed rather than returned to the pool.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            try:
+                conn.close()
+            except Exception:   # pylint: disable=broad-except
+                pass
+            raise
+        self._idle.put(conn)
+
+    def close(self):
+        """Close all idle connections in the pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+            conn.close()
+
+
+def _after_fork():
+    for pool in list(_POOLS):
+        pool._after_fork()     # pylint: disable=protected-access
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class SQLDataInterface(DataInterface):
+    """
+    A DataInterface serving records from a SQL database through any DB-API 2.0 driver,
+    where each row of a table is one OAI record with its metadata stored as serialized
+    XML in a column per metadata format.
+
+    Pages of results use keyset pagination on `(datestamp, identifier)`, continuing
+    after the last row of the previous page when it is known, and bulk retrieval
+    of headers, metadata and abouts is done in chunked `IN (...)` queries.
+
+    Args:
+        connect (Callable|ConnectionPool): A function returning a new DB-API connection,
+                                           or a ConnectionPool
+        identify (Identify): The Identify for the repository
+        formats (list): The MetadataFormats available in the repository
+        metadata_columns (dict): Mapping of metadataPrefix to the column holding the metadata
+                                 XML for that format, or NULL if not available for the record;
+                                 defaults to a column named the same as the metadataPrefix
+        table (str): The table of records
+        columns (dict): Mapping of OAI header fields to columns in the table. Keys are
+                        `identifier` (must be unique), `datestamp`, `deleted` (a boolean)
+                        and `about` (XML for a single `<about>`). Set `deleted` or `about`
+                        to None if not available.
+        set_table (str|None): A table with `identifier` and `setspec` columns for the set
+                              membership of records, or None if sets are not supported
+        set_names (dict): Mapping of setSpec to setName; setSpecs not in the mapping
+                          use the setSpec as the name
+        paramstyle (str): The `paramstyle` of the DB-API driver
+        date_format (str|None): A `strftime` format for datestamp query parameters when
+                                datestamps are stored as text, or None to pass datetimes
+        chunk_size (int): Max number of values in a single `IN (...)` query
+        keyset_cache (LRUCache): Cache of the last `(datestamp, identifier)` on each page,
+                                 for continuing a result list at a cursor position
+
+    **Examples:**
+    ```python
+    data = oai_repo.SQLDataInterface(
+        oai_repo.ConnectionPool(lambda: psycopg2.connect(dsn), size=8),
+        identify,
+        [oai_dc_format, mods_format],
+        {"oai_dc": "dc_xml", "mods": "mods_xml"},
+        table="records",
+        columns={"identifier": "oai_id", "datestamp": "modified", "deleted": "is_deleted"},
+        set_table="record_sets",
+        paramstyle="pyformat",
+    )
+    repo = oai_repo.OAIRepository(data)
+    ```
+    """
+    default_columns = {
+        "identifier": "identifier",
+        "datestamp": "datestamp",
+        "deleted": None,
+        "about": None,
+    }
+
+    def __init__(
+        self,
+        connect: Callable|ConnectionPool,
+        identify: Identify,
+        formats: list[MetadataFormat],
+        metadata_columns: dict[str, str] = None,
+        table: str = "records",
+        columns: dict = None,
+        set_table: str|None = None,
+        set_names: dict = None,
+        paramstyle: str = "qmark",
+        date_format: str|None = None,
+        chunk_size: int = 500,
+        keyset_cache: LRUCache = None
+    ):
+        if paramstyle not in PARAMSTYLES:
+            raise OAIRepoInternalException(f"Unknown DB-API paramstyle: {paramstyle}")
+        self.pool = connect if isinstance(connect, ConnectionPool) else ConnectionPool(connect)
+        self.identify = identify
+        self.formats = formats
+        self.metadata_columns = metadata_columns or {}
+        self.table = table
+        self.columns = {**self.default_columns, **(columns or {})}
+        self.set_table = set_table
+        self.set_names = set_names or {}
+        self.paramstyle = paramstyle
+        self.date_format = date_format
+        self.chunk_size = chunk_size
+        self.keyset_cache = keyset_cache if keyset_cache is not None else LRUCache(4096, 3600)
+
+    def metadata_column(self, metadataprefix: str) -> str|None:
+        """Return the column holding metadata for the prefix"""
+        for mdformat in self.formats:
+            if mdformat.metadata_prefix == metadataprefix:
+                return self.metadata_columns.get(metadataprefix, metadataprefix)
+        return None
+
+    def query(self, sql: str, params: list = None) -> list[tuple]:
+        """
+        Run a query, returning all rows. Parameters in the query are given as `?`
+        and are converted to the paramstyle of the driver.
+
+        Raises:
+            OAIRepoExternalException: If the query fails
+            OAIRepoDeadlineException: If the deadline of the request has passed
+        """
+        check_deadline()
+        params = list(params or [])
+        if self.paramstyle != "qmark":
+            parts = sql.split("?")
+            if self.paramstyle == "numeric":
+                holders = [f":{idx}" for idx in range(1, len(parts))]
+            elif self.paramstyle == "named":
+                holders = [f":p{idx}" for idx in range(1, len(parts))]
+                params = {f"p{idx}": param for idx, param in enumerate(params, 1)}
+            else:
+                holders = ["%s"] * (len(parts) - 1)
+            sql = parts[0] + "".join(h + part for h, part in zip(holders, parts[1:]))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            except Exception as exc:
+                raise OAIRepoExternalException(f"Database query failed: {exc}") from exc
+            finally:
+                cursor.close()
+
+    def date_param(self, timestamp: datetime) -> str|datetime:
+        """Convert a datetime into a query parameter"""
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc)
+        return timestamp.strftime(self.date_format) if self.date_format else timestamp
+
+    def rows_by_identifier(self, identifiers: list[str], columns: list[str]) -> dict:
+        """
+        Retrieve the columns for the identifiers, in `IN (...)` queries of up
+        to `chunk_size` identifiers.
+
+        Returns:
+            A dict of identifier to a dict of column values
+        """
+        idcol = self.columns["identifier"]
+        columns = list(dict.fromkeys([idcol] + columns))
+        rows = {}
+        unique = list(dict.fromkeys(identifiers))
+        for start in range(0, len(unique), self.chunk_size):
+            chunk = unique[start:start + self.chunk_size]
+            results = self.query(
+                f"SELECT {', '.join(columns)} FROM {self.table} "
+                f"WHERE {idcol} IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            for result in results:
+                rows[result[0]] = dict(zip(columns, result))
+        return rows
+
+    def setspecs_by_identifier(self, identifiers: list[str]) -> dict:
+        """
+        Retrieve the setSpecs of the identifiers, in `IN (...)` queries of up
+        to `chunk_size` identifiers.
+
+        Returns:
+            A dict of identifier to a list of setSpecs
+        """
+        setspecs = {identifier: [] for identifier in identifiers}
+        if not self.set_table:
+            return setspecs
+        unique = list(setspecs)
+        for start in range(0, len(unique), self.chunk_size):
+            chunk = unique[start:start + self.chunk_size]
+            results = self.query(
+                f"SELECT identifier, setspec FROM {self.set_table} "
+                f"WHERE identifier IN ({', '.join('?' * len(chunk))}) ORDER BY setspec",
+                chunk
+            )
+            for identifier, setspec in results:
+                setspecs[identifier].append(setspec)
+        return setspecs
+
+    def header_columns(self) -> list[str]:
+        """Columns needed to build a RecordHeader"""
+        return [
+            self.columns[key] for key in ("identifier", "datestamp", "deleted")
+            if self.columns[key]
+        ]
+
+    def row_headers(self, rows: list[dict]) -> list[RecordHeader]:
+        """Build the RecordHeaders for rows, retrieving their setSpecs in bulk"""
+        setspecs = self.setspecs_by_identifier([row[self.columns["identifier"]] for row in rows])
+        return [
+            RecordHeader(
+                row[self.columns["identifier"]],
+                parse_sql_date(row[self.columns["datestamp"]]),
+                setspecs[row[self.columns["identifier"]]],
+                "deleted" if self.columns["deleted"] and row[self.columns["deleted"]] else None
+            )
+            for row in rows
+        ]
+
+    def row_metadata(self, row: dict, metadataprefix: str) -> etree._Element|None:
+        """Load the metadata for the prefix from a row"""
+        value = row.get(self.metadata_column(metadataprefix))
+        if isinstance(value, str):
+            value = value.encode("utf8")
+        return helpers.bytes_to_xml(bytes(value)) if value else None
+
+    def row_abouts(self, row: dict) -> list[etree._Element]:
+        """Load the abouts from a row"""
+        value = row.get(self.columns["about"]) if self.columns["about"] else None
+        if isinstance(value, str):
+            value = value.encode("utf8")
+        return [helpers.bytes_to_xml(bytes(value))] if value else []
+
+    def warm(self, connections: bool = False):
+        if connections:
+            with self.pool.connection():
+                pass
+
+    def get_identify(self) -> Identify:
+        return self.identify
+
+    def is_valid_identifier(self, identifier: str) -> bool:
+        return identifier in self.rows_by_identifier([identifier], [])
+
+    def get_metadata_formats(self, identifier: str|None = None) -> list[MetadataFormat]:
+        if identifier is None:
+            return list(self.formats)
+        columns = [self.metadata_column(mdformat.metadata_prefix) for mdformat in self.formats]
+        row = self.rows_by_identifier([identifier], columns).get(identifier)
+        if row is None:
+            return []
+        return [
+            mdformat for mdformat in self.formats
+            if row[self.metadata_column(mdformat.metadata_prefix)] is not None
+        ]
+
+    def get_record_header(self, identifier: str) -> RecordHeader|None:
+        return self.get_records_header([identifier])[0]
+
+    def get_records_header(self, identifiers: list[str]) -> list[RecordHeader|None]:
+        rows = self.rows_by_identifier(identifiers, self.header_columns())
+        headers = dict(zip(rows, self.row_headers(list(rows.values()))))
+        return [headers.get(identifier) for identifier in identifiers]
+
+    def get_record_metadata(self, identifier: str, metadataprefix: str) -> etree._Element|None:
+        return self.get_records_metadata([identifier], metadataprefix)[0]
+
+    def get_records_metadata(self, identifiers: list[str], metadataprefix: str) \
+        -> list[etree._Element|None]:
+        column = self.metadata_column(metadataprefix)
+        if column is None:
+            return [None] * len(identifiers)
+        rows = self.rows_by_identifier(identifiers, [column])
+        return [
+            self.row_metadata(rows[identifier], metadataprefix) if identifier in rows else None
+            for identifier in identifiers
+        ]
+
+    def get_record_abouts(self, identifier: str) -> list[etree._Element]:
+        return self.get_records_abouts([identifier])[0]
+
+    def get_records_abouts(self, identifiers: list[str]) -> list[list[etree._Element]]:
+        if not self.columns["about"]:
+            return [[] for _ in identifiers]
+        rows = self.rows_by_identifier(identifiers, [self.columns["about"]])
+        return [self.row_abouts(rows.get(identifier, {})) for identifier in identifiers]
+
+    def get_record_bundle(self, identifier: str, metadataprefix: str) -> RecordBundle|None:
+        columns = self.header_columns() + [
+            self.metadata_column(mdformat.metadata_prefix) for mdformat in self.formats
+        ]
+        if self.columns["about"]:
+            columns.append(self.columns["about"])
+        row = self.rows_by_identifier([identifier], columns).get(identifier)
+        if row is None:
+            return None
+        return RecordBundle(
+            self.row_headers([row])[0],
+            [
+                mdformat for mdformat in self.formats
+                if row[self.metadata_column(mdformat.metadata_prefix)] is not None
+            ],
+            self.row_metadata(row, metadataprefix),
+            self.row_abouts(row)
+        )
+
+    def all_setspecs(self) -> list[str]:
+        """
+        Return all setSpecs in the repository; the result is cached for the
+        duration of the request.
+        """
+        ctx = current_context()
+        cache = ctx.cache if ctx is not None else {}
+        if "sql_sets" not in cache:
+            cache["sql_sets"] = [
+                row[0] for row in
+                self.query(f"SELECT DISTINCT setspec FROM {self.set_table} ORDER BY setspec")
+            ]
+        return cache["sql_sets"]
+
+    def list_set_specs(self, identifier: str=None, cursor: int=0) -> tuple:
+        if not self.set_table:
+            return None, None, None
+        if identifier is not None:
+            return self.setspecs_by_identifier([identifier])[identifier], None, None
+        setspecs = self.all_setspecs()
+        return setspecs, len(setspecs), None
+
+    def get_set(self, setspec: str) -> Set|None:
+        if not self.set_table or setspec not in self.all_setspecs():
+            return None
+        return Set(setspec, self.set_names.get(setspec, setspec), [])
+
+    def where(self,
+        metadataprefix: str,
+        filter_from: datetime,
+        filter_until: datetime,
+        filter_set: str
+    ) -> tuple[str, list]:
+        """
+        Build the WHERE clause selecting records matching the parameters.
+
+        Returns:
+            A tuple of the SQL clause, and its parameters
+        """
+        clauses = [f"{self.metadata_column(metadataprefix)} IS NOT NULL"]
+        params = []
+        if self.columns["deleted"]:
+            # Deleted records no longer have metadata, but are still listed
+            clauses[0] = f"({clauses[0]} OR {self.columns['deleted']} = ?)"
+            params.append(True)
+        if filter_from:
+            clauses.append(f"{self.columns['datestamp']} >= ?")
+            params.append(self.date_param(filter_from))
+        if filter_until:
+            clauses.append(f"{self.columns['datestamp']} <= ?")
+            params.append(self.date_param(filter_until))
+        if filter_set:
+            clauses.append(
+                f"{self.columns['identifier']} IN (SELECT identifier FROM {self.set_table} "
+                "WHERE setspec = ? OR setspec LIKE ?)"
+            )
+            params.extend([filter_set, filter_set + ":%"])
+        return " AND ".join(clauses), params
+
+    def page(self,
+        metadataprefix: str,
+        filter_from: datetime,
+        filter_until: datetime,
+        filter_set: str,
+        cursor: int,
+        columns: list[str]
+    ) -> list[dict]:
+        """
+        Retrieve the rows for a page of results in a single query, continuing after the
+        last `(datestamp, identifier)` of the previous page when it is known.
+
+        Returns:
+            A list of dicts of column values
+        """
+        where, params = self.where(metadataprefix, filter_from, filter_until, filter_set)
+        idcol, datecol = self.columns["identifier"], self.columns["datestamp"]
+        columns = list(dict.fromkeys([idcol, datecol] + columns))
+        sql = f"SELECT {', '.join(columns)} FROM {self.table} WHERE {where}"
+        cache_key = (where, tuple(params))
+        after = self.keyset_cache.get((cache_key, cursor)) if cursor else None
+        if after is not None:
+            sql += f" AND ({datecol} > ? OR ({datecol} = ? AND {idcol} > ?))"
+            params += [after[0], after[0], after[1]]
+        sql += f" ORDER BY {datecol}, {idcol} LIMIT {int(self.limit)}"
+        if cursor and after is None:
+            # No known position for this cursor; fall back to an offset
+            sql += f" OFFSET {int(cursor)}"
+        rows = [dict(zip(columns, result)) for result in self.query(sql, params)]
+        if len(rows) == self.limit:
+            self.keyset_cache.set(
+                (cache_key, cursor + self.limit), (rows[-1][datecol], rows[-1][idcol])
+            )
+        return rows
+
+    def count_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        **kwargs
+    ) -> int:
+        where, params = self.where(metadataprefix, filter_from, filter_until, filter_set)
+        return self.query(f"SELECT COUNT(*) FROM {self.table} WHERE {where}", params)[0][0]
+
+    def list_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0
+    ) -> tuple:
+        rows = self.page(metadataprefix, filter_from, filter_until, filter_set, cursor, [])
+        return [row[self.columns["identifier"]] for row in rows], None, None
+
+    def list_headers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        rows = self.page(
+            metadataprefix, filter_from, filter_until, filter_set, cursor, self.header_columns()
+        )
+        return self.row_headers(rows), None, None
+
+    def list_records(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0,
+        **kwargs
+    ) -> tuple:
+        columns = self.header_columns() + [self.metadata_column(metadataprefix)]
+        if self.columns["about"]:
+            columns.append(self.columns["about"])
+        rows = self.page(metadataprefix, filter_from, filter_until, filter_set, cursor, columns)
+        headers = self.row_headers(rows)
+        bundles = [
+            RecordBundle(
+                header,
+                metadata=self.row_metadata(row, metadataprefix),
+                abouts=self.row_abouts(row)
+            )
+            for header, row in zip(headers, rows)
+        ]
+        return bundles, None, None
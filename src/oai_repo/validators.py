@@ -4,8 +4,11 @@ Validators for oai_repo interface data classes
 import re
 from datetime import datetime
 from lxml import etree
-import validators
-from .helpers import bytes_to_xml
+from .helpers import bytes_to_xml, _lazy_import
+
+ALLOWED_DELETED_RECORD = ("no", "persistent", "transient")
+ALLOWED_GRANULARITY = ("YYYY-MM-DD", "YYYY-MM-DDThh:mm:ssZ")
+METADATA_PREFIX_PATTERN = re.compile(r"^[A-Za-z0-9-_.!~*'\(\)]+$")
 
 
 class IdentifyValidator:
@@ -25,7 +28,7 @@ class IdentifyValidator:
             failures.append("repository_name must be a non-empty string")
         if (
             not isinstance(self.base_url, str) or
-            not validators.url(self.base_url, simple_host=True)
+            not _lazy_import("validators").url(self.base_url, simple_host=True)
         ):
             failures.append("base_url must be a valid URL path")
         failures.extend(self._admin_email_failures())
@@ -39,25 +42,23 @@ class IdentifyValidator:
     def _admin_email_failures(self):
         """Return a list of admin_email failures"""
         failures = []
-        if not self.admin_email or not isinstance(self.admin_email, list):
+        if not self.admin_email or not isinstance(self.admin_email, (list, tuple)):
             failures.append("admin_email must be a list with at list one valid email address")
         else:
             for email in self.admin_email:
-                if not validators.email(email):
+                if not _lazy_import("validators").email(email):
                     failures.append(f"invalid address for admin_email: {email}")
         return failures
 
     def _deleted_record_failures(self):
         """Return a list of deleted_record failures"""
-        allowed_deleted_record = ["no", "persistent", "transient"]
-        return [f"deleted_record  must be one of {', '.join(allowed_deleted_record)}"] \
-            if self.deleted_record not in allowed_deleted_record else []
+        return [f"deleted_record  must be one of {', '.join(ALLOWED_DELETED_RECORD)}"] \
+            if self.deleted_record not in ALLOWED_DELETED_RECORD else []
 
     def _granularity_failures(self):
         """Return a list of granularity failures"""
-        allowed_granularity = ["YYYY-MM-DD", "YYYY-MM-DDThh:mm:ssZ"]
-        return [f"granularity must be either of: {', '.join(allowed_granularity)}"] \
-            if self.granularity not in allowed_granularity else []
+        return [f"granularity must be either of: {', '.join(ALLOWED_GRANULARITY)}"] \
+            if self.granularity not in ALLOWED_GRANULARITY else []
 
     def _compression_failures(self):
         """Return a list of compression failures"""
@@ -106,23 +107,24 @@ class MetadataFormatValidator:
 
     def _metadata_prefix_failures(self):
         """Return a list of metadata_prefix failures"""
-        pattern = re.compile(r"^[A-Za-z0-9-_.!~*'\(\)]+$")
-        return [] if pattern.search(self.metadata_prefix) is not None else \
+        return [] if METADATA_PREFIX_PATTERN.search(self.metadata_prefix) is not None else \
             ["metadata_prefix contains invalid character(s); allowed chars: A-Za-z0-9-_.!~*'()"]
 
     def _schema_failures(self):
         """Return a list of schema failures"""
         return ["schema must be a valid URL"] \
-            if not validators.url(self.schema, simple_host=True) else []
+            if not _lazy_import("validators").url(self.schema, simple_host=True) else []
 
     def _metadata_namespace_failures(self):
         """Return a list of metadata_namespace failures"""
         return ["metadata_namespace must be a valid URL"] \
-            if not validators.url(self.metadata_namespace, simple_host=True) else []
+            if not _lazy_import("validators").url(self.metadata_namespace, simple_host=True) else []
 
 
 class RecordHeaderValidator:
     """Validator for the RecordHeader class"""
+    __slots__ = ()
+
     def errors(self):
         """
         Verify fields are valid and present where required. Returning a list of descriptive
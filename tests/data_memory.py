@@ -0,0 +1,101 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from lxml import etree
+import oai_repo
+
+class DataInMemory(oai_repo.DataInterface):
+    """A OAI DataInterface serving generated records from memory, without any API calls"""
+    def __init__(self, count: int=250, limit: int=100) -> None:
+        super().__init__()
+        self.limit = limit
+        # Count of calls made to each DataInterface method
+        self.calls = Counter()
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.headers = [
+            oai_repo.RecordHeader(
+                f"oai:example.edu:{idx}",
+                start + timedelta(days=idx),
+                ["all", "even" if idx % 2 == 0 else "odd"]
+            )
+            for idx in range(count)
+        ]
+        self.by_identifier = {header.identifier: header for header in self.headers}
+
+    def get_identify(self):
+        self.calls["get_identify"] += 1
+        ident = oai_repo.Identify()
+        ident.repository_name = "In Memory Repo"
+        ident.base_url = "https://example.edu/oai"
+        ident.admin_email.append("oai@example.edu")
+        ident.deleted_record = "no"
+        ident.granularity = "YYYY-MM-DD"
+        ident.earliest_datestamp = "2020-01-01"
+        return ident
+
+    def is_valid_identifier(self, identifier: str):
+        self.calls["is_valid_identifier"] += 1
+        return identifier in self.by_identifier
+
+    def get_metadata_formats(self, identifier: str|None = None):
+        self.calls["get_metadata_formats"] += 1
+        return [
+            oai_repo.MetadataFormat(
+                "oai_dc",
+                "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+                "http://www.openarchives.org/OAI/2.0/oai_dc/"
+            )
+        ]
+
+    def get_record_header(self, identifier: str):
+        self.calls["get_record_header"] += 1
+        return self.by_identifier[identifier]
+
+    def get_record_metadata(self, identifier: str, metadataprefix: str):
+        self.calls["get_record_metadata"] += 1
+        if metadataprefix != "oai_dc":
+            return None
+        xdc = etree.Element(
+            b"{" + oai_repo.NSMAP_OAIDC["oai_dc"] + b"}dc",
+            nsmap=oai_repo.NSMAP_OAIDC
+        )
+        xdc.set(*oai_repo.OAIDC_SCHEMA)
+        xtitle = etree.SubElement(xdc, b"{" + oai_repo.NSMAP_OAIDC["dc"] + b"}title")
+        xtitle.text = f"Record {identifier.rsplit(':', 1)[-1]}"
+        return xdc
+
+    def get_record_abouts(self, identifier: str):
+        self.calls["get_record_abouts"] += 1
+        return []
+
+    def list_set_specs(self, identifier: str=None, cursor: int=0):
+        self.calls["list_set_specs"] += 1
+        if identifier:
+            return self.by_identifier[identifier].setspecs, None, None
+        return ["all", "even", "odd"], 3, None
+
+    def get_set(self, setspec: str):
+        self.calls["get_set"] += 1
+        if setspec not in ("all", "even", "odd"):
+            return None
+        return oai_repo.Set(setspec, f"The {setspec} set", [])
+
+    def filtered(self, filter_from=None, filter_until=None, filter_set=None):
+        """Custom method returning all headers matching filters"""
+        return [
+            header for header in self.headers
+            if (filter_from is None or header.datestamp >= filter_from) and
+               (filter_until is None or header.datestamp <= filter_until) and
+               (filter_set is None or filter_set in header.setspecs)
+        ]
+
+    def list_identifiers(self,
+        metadataprefix: str,
+        filter_from: datetime = None,
+        filter_until: datetime = None,
+        filter_set: str = None,
+        cursor: int = 0
+    ):
+        self.calls["list_identifiers"] += 1
+        headers = self.filtered(filter_from, filter_until, filter_set)
+        page = headers[cursor:cursor + self.limit]
+        return [header.identifier for header in page], len(headers), None
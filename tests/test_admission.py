@@ -0,0 +1,111 @@
+import re
+import threading
+import pytest
+import oai_repo
+from oai_repo.admission import AdmissionController
+from .data_memory import DataInMemory
+
+def hold(admission, client, release: threading.Event):
+    """Hold a slot of the admission controller in a thread, until released"""
+    held = threading.Event()
+    def worker():
+        with admission.admit({}, client):
+            held.set()
+            release.wait()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    held.wait()
+    return thread
+
+def test_concurrency_limits():
+    admission = AdmissionController(max_active=2, max_active_per_client=1, wait_timeout=0.05)
+    release = threading.Event()
+    threads = [hold(admission, "10.0.0.1", release), hold(admission, "10.0.0.2", release)]
+    assert admission.active == 2
+
+    # Over the global limit; waits in the queue, then is shed
+    with pytest.raises(oai_repo.OAIRepoOverloadedException) as exc:
+        admission.acquire("10.0.0.3")
+    assert exc.value.retry_after == 10
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert admission.active == 0
+
+    # Over the per-client limit, while others are admitted
+    release.clear()
+    thread = hold(admission, "10.0.0.1", release)
+    with pytest.raises(oai_repo.OAIRepoOverloadedException):
+        admission.acquire("10.0.0.1")
+    with admission.admit({}, "10.0.0.2"):
+        pass
+    # Queued requests get the slot once released
+    threading.Timer(0.01, release.set).start()
+    with admission.admit({}, "10.0.0.1"):
+        assert admission.active == 1
+    thread.join()
+    assert admission.stats == {"admitted": 5, "queued": 3, "shed": 2, "rate_limited": 0}
+
+def test_queue_full():
+    admission = AdmissionController(max_active=1, max_waiting=0)
+    release = threading.Event()
+    thread = hold(admission, None, release)
+    with pytest.raises(oai_repo.OAIRepoOverloadedException, match="waiting"):
+        admission.acquire(None)
+    release.set()
+    thread.join()
+    assert admission.stats["shed"] == 1
+    assert admission.stats["queued"] == 0
+
+def test_rate_limits():
+    admission = AdmissionController(client_rate=0.5, burst=2)
+    for _ in range(2):
+        with admission.admit({}, "10.0.0.1"):
+            pass
+    with pytest.raises(oai_repo.OAIRepoOverloadedException, match="rate") as exc:
+        admission.acquire("10.0.0.1")
+    assert exc.value.retry_after == 2
+    # Other clients have their own rate limit
+    with admission.admit({}, "10.0.0.2"):
+        pass
+
+    admission = AdmissionController(rate=1, burst=1)
+    with admission.admit({}, "10.0.0.1"):
+        pass
+    with pytest.raises(oai_repo.OAIRepoOverloadedException, match="rate"):
+        admission.acquire("10.0.0.2")
+    assert admission.stats["rate_limited"] == 1
+
+def test_client_key():
+    repo = oai_repo.OAIRepository(DataInMemory())
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' }
+    tokens = []
+    for _ in range(2):
+        resp = bytes(repo.process(request))
+        token = re.search(rb"<resumptionToken[^>]*>([^<]+)<", resp).group(1).decode()
+        tokens.append(token)
+        request = { 'verb': 'ListIdentifiers', 'resumptionToken': token }
+    # Pages of a token chain are limited together
+    keys = [AdmissionController.client_key({ 'resumptionToken': token }) for token in tokens]
+    assert keys[0] == keys[1]
+    assert keys[0].startswith("chain:")
+    assert AdmissionController.client_key({ 'resumptionToken': tokens[0] }, "10.0.0.1") == "10.0.0.1"
+    assert AdmissionController.client_key({ 'verb': 'Identify' }) is None
+    assert AdmissionController.client_key({ 'resumptionToken': '!!' }) is None
+
+def test_OAIRepository_admission():
+    admission = AdmissionController(max_active=1, wait_timeout=0.01, retry_after=60)
+    repo = oai_repo.OAIRepository(DataInMemory(), admission=admission)
+    assert repo.process({ 'verb': 'Identify' }, client="10.0.0.1").context.metrics["admission"] \
+        == "admitted"
+    release = threading.Event()
+    thread = hold(admission, "10.0.0.2", release)
+    with pytest.raises(oai_repo.OAIRepoOverloadedException) as exc:
+        repo.process({ 'verb': 'Identify' }, client="10.0.0.1")
+    assert exc.value.retry_after == 60
+    release.set()
+    thread.join()
+    assert admission.active == 0
+    # Slots are released when processing fails
+    assert not repo.process({ 'verb': 'NotAVerb' })
+    assert admission.active == 0
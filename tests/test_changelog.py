@@ -0,0 +1,189 @@
+from datetime import datetime, timezone
+import oai_repo
+from oai_repo.changelog import ChangeLog
+from .data_memory import DataInMemory
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+def test_ChangeLog(tmp_path):
+    path = str(tmp_path / "changes.log")
+    log = ChangeLog(path, bucket=86400, since=utc(2020, 1, 1))
+    log.append("oai:x:1", utc(2020, 1, 2), setspecs=["a:b"])
+    log.append("oai:x:2", utc(2020, 1, 3, 12), prefixes=["mods"])
+    log.extend([
+        ("oai:x:3", utc(2020, 1, 3, 6), None, ["a"]),
+        ("oai:x:4", utc(2020, 1, 9), None, [], "deleted"),
+    ])
+
+    # Ordered by datestamp, filtered by prefix
+    idents, size, state = log.list_identifiers("oai_dc")
+    assert idents == ["oai:x:1", "oai:x:3", "oai:x:4"]
+    assert size == 3
+    assert state
+
+    # Window and set (including subsets) filters
+    assert log.list_identifiers("oai_dc", utc(2020, 1, 3))[0] == ["oai:x:3", "oai:x:4"]
+    assert log.list_identifiers("mods", utc(2020, 1, 3), utc(2020, 1, 4))[0] == \
+        ["oai:x:3", "oai:x:2"]
+    assert log.list_identifiers("oai_dc", filter_set="a")[0] == ["oai:x:1", "oai:x:3"]
+    assert log.list_identifiers("oai_dc", filter_set="a:b")[0] == ["oai:x:1"]
+
+    # Paging
+    assert log.list_identifiers("oai_dc", cursor=1, limit=1) == (["oai:x:3"], 3, state)
+
+    # A newer change supersedes older ones, and changes the state
+    log.append("oai:x:1", utc(2020, 1, 10))
+    idents, size, new_state = log.list_identifiers("oai_dc")
+    assert idents == ["oai:x:3", "oai:x:4", "oai:x:1"]
+    assert new_state != state
+    assert log.list_identifiers("oai_dc", utc(2020, 1, 1), utc(2020, 1, 2))[0] == []
+    headers, size, _ = log.list_headers("oai_dc", cursor=1)
+    assert [header.identifier for header in headers] == ["oai:x:4", "oai:x:1"]
+    assert headers[1].datestamp == utc(2020, 1, 10)
+    header = log.get_record_header("oai:x:4")
+    assert header.datestamp == utc(2020, 1, 9)
+    assert header.status == "deleted"
+    assert log.get_record_header("oai:x:99") is None
+
+    # Results as of an earlier generation
+    assert log.list_identifiers("oai_dc", snapshot=4)[0] == ["oai:x:1", "oai:x:3", "oai:x:4"]
+    assert log.list_identifiers("oai_dc", snapshot=1)[0] == ["oai:x:1"]
+
+    # Coverage
+    assert log.covers(utc(2020, 1, 1))
+    assert not log.covers(utc(2019, 12, 31))
+    assert not log.covers(None)
+
+    # Log is persisted and replayed
+    log.close()
+    reloaded = ChangeLog(path, bucket=3600)
+    assert reloaded.generation == 5
+    assert reloaded.list_identifiers("oai_dc")[0] == idents
+    assert reloaded.covers(utc(2020, 1, 1))
+
+class DataWithChangeLog(DataInMemory):
+    """A DataInterface answering selective harvests from a ChangeLog"""
+    def __init__(self, path, snapshots=False):
+        super().__init__()
+        self.snapshots = snapshots
+        self.changelog = ChangeLog(path, since=0)
+        self.changelog.extend([
+            (header.identifier, header.datestamp, None, header.setspecs)
+            for header in self.headers
+        ])
+
+    def get_snapshot(self):
+        return self.changelog.generation if self.snapshots else None
+
+    def list_identifiers(self, metadataprefix, filter_from=None, filter_until=None,
+                         filter_set=None, cursor=0, snapshot=None):
+        return self.changelog.list_identifiers(
+            metadataprefix, filter_from, filter_until, filter_set, cursor, self.limit, snapshot
+        )
+
+def test_ChangeLog_repository(tmp_path):
+    repo = oai_repo.OAIRepository(DataWithChangeLog(str(tmp_path / "changes.log")))
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'from': '2020-08-01' }
+    resp = bytes(repo.process(request))
+    assert b"<identifier>oai:example.edu:213</identifier>" in resp
+    assert b"<identifier>oai:example.edu:212</identifier>" not in resp
+    assert resp.count(b"<header>") == 37
+    assert b"<resumptionToken" not in resp
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'set': 'odd' }
+    rawresp = repo.process(request)
+    assert b'<resumptionToken cursor="0" completeListSize="125">' in bytes(rawresp)
+
+def test_ChangeLog_snapshot(tmp_path):
+    # Tokens are invalidated when data changes
+    data = DataWithChangeLog(str(tmp_path / "changes.log"))
+    repo = oai_repo.OAIRepository(data)
+    rawresp = repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' })
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    data.changelog.append("oai:example.edu:5", datetime.now(timezone.utc))
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'resumptionToken': token }))
+    assert b'code="badResumptionToken"' in resp
+
+    # Tokens pinned to a snapshot continue consistently
+    data = DataWithChangeLog(str(tmp_path / "snapshot.log"), snapshots=True)
+    repo = oai_repo.OAIRepository(data)
+    rawresp = repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' })
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    data.changelog.append("oai:example.edu:5", datetime.now(timezone.utc))
+    data.changelog.append("oai:example.edu:500", datetime.now(timezone.utc))
+    rawresp = repo.process({ 'verb': 'ListIdentifiers', 'resumptionToken': token })
+    resp = bytes(rawresp)
+    assert b'<resumptionToken cursor="100" completeListSize="250">' in resp
+    assert b"<identifier>oai:example.edu:100</identifier>" in resp
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'resumptionToken': token }))
+    assert b"<identifier>oai:example.edu:249</identifier>" in resp
+    assert b"<identifier>oai:example.edu:500</identifier>" not in resp
+
+    # A new harvest sees the changes
+    rawresp = repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' })
+    assert b'completeListSize="251"' in bytes(rawresp)
+
+def test_ChangeLog_torn_write(tmp_path):
+    path = str(tmp_path / "changes.log")
+    log = ChangeLog(path, since=0)
+    log.append("oai:x:1", utc(2020, 1, 2))
+    log.append("oai:x:2", utc(2020, 1, 3))
+    log.close()
+    # A write interrupted part way through a change
+    with open(path, "a", encoding="utf8") as logf:
+        logf.write('[1578009600, "oai:x:3", nu')
+
+    # Replay stops at the last complete change, and appends replace the incomplete one
+    reloaded = ChangeLog(path)
+    assert reloaded.generation == 2
+    reloaded.append("oai:x:4", utc(2020, 1, 4))
+    reloaded.close()
+    assert ChangeLog(path).list_identifiers("oai_dc")[0] == ["oai:x:1", "oai:x:2", "oai:x:4"]
+
+def test_ChangeLog_seek(tmp_path):
+    log = ChangeLog(str(tmp_path / "changes.log"), bucket=86400, since=0)
+    log.extend([
+        (f"oai:x:{day}-{idx}", utc(2020, 1, day, idx), None, ["odd" if idx % 2 else "even"])
+        for day in range(1, 11) for idx in range(10)
+    ])
+    searched = []
+    bucket_matches = log._bucket_matches
+    def counted(bucket, *args):
+        searched.append(bucket)
+        return bucket_matches(bucket, *args)
+    log._bucket_matches = counted
+
+    idents, size, state = log.list_identifiers("oai_dc", limit=10)
+    assert size == 100
+    assert len(searched) == 10
+    # Later pages seek past the buckets before the cursor
+    searched.clear()
+    assert log.list_identifiers("oai_dc", cursor=55, limit=10) == (
+        [f"oai:x:6-{idx}" for idx in range(5, 10)] + [f"oai:x:7-{idx}" for idx in range(5)],
+        100, state
+    )
+    assert len(searched) == 2
+    # Until a change in a bucket requires searching it again
+    log.append("oai:x:2-0", utc(2020, 1, 12))
+    searched.clear()
+    idents, size, _ = log.list_identifiers("oai_dc", cursor=90, limit=10)
+    assert size == 100
+    assert idents[-1] == "oai:x:2-0"
+    assert len(searched) == 3
+    assert log.list_identifiers("oai_dc", filter_set="odd", cursor=45)[0] == \
+        [f"oai:x:10-{idx}" for idx in (1, 3, 5, 7, 9)]
+
+def test_ChangeLog_torn_header(tmp_path):
+    path = str(tmp_path / "changes.log")
+    # Creating the log was interrupted before or part way through its header
+    for header in (b"", b'{"oai_repo_changelog": 1, "sin', b'{"oai_repo_changelog": 1}\n'):
+        with open(path, "wb") as logf:
+            logf.write(header)
+        log = ChangeLog(path, since=utc(2020, 1, 1))
+        assert log.since == int(utc(2020, 1, 1).timestamp())
+        log.append("oai:x:1", utc(2020, 1, 2))
+        log.close()
+        reloaded = ChangeLog(path)
+        assert reloaded.since == log.since
+        assert reloaded.list_identifiers("oai_dc")[0] == ["oai:x:1"]
@@ -0,0 +1,124 @@
+import time
+import pytest
+import oai_repo
+from oai_repo import helpers
+from oai_repo.circuit import CircuitBreaker
+
+def test_CircuitBreaker():
+    breaker = CircuitBreaker(failure_threshold=3, latency_threshold=0.5, reset_timeout=0.05)
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    breaker.record_failure()
+    # Successes clear failures
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+    # Slow calls count as failures
+    breaker.record_success(1.0)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.stats == {"opened": 1, "rejected": 1}
+
+    # After the reset timeout, a single trial call is allowed
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == "closed"
+    assert breaker.stats["opened"] == 2
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+class FakeBackend:
+    """Fake for requests.Session.get, which fails while `down`"""
+    def __init__(self):
+        self.calls = 0
+        self.down = False
+
+    def get(self, url, params, timeout):
+        self.calls += 1
+        if self.down:
+            raise helpers.requests.ConnectionError("Connection refused")
+        return FakeResponse(f'{{"call": {self.calls}}}')
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = FakeBackend()
+    monkeypatch.setattr(helpers.requests.Session, "get", fake.get)
+    yield fake
+    helpers.configure_http()
+
+def test_http_circuit(backend):
+    helpers.configure_http(failure_threshold=2, reset_timeout=60)
+    assert helpers.apicall_getjson("https://solr.example.edu/select") == {"call": 1}
+    backend.down = True
+    for _ in range(2):
+        with pytest.raises(oai_repo.OAIRepoExternalException, match="Call to API failed"):
+            helpers.apicall_getjson("https://solr.example.edu/select")
+    # Circuit is open, so calls fail fast without calling the backend
+    with pytest.raises(oai_repo.OAIRepoExternalException, match="Circuit open"):
+        helpers.apicall_getjson("https://solr.example.edu/select", {"q": "*:*"})
+    assert backend.calls == 3
+    assert helpers.circuit_breaker("https://solr.example.edu/other").state == "open"
+    # Other hosts are unaffected
+    assert helpers.circuit_breaker("https://api.example.edu/").state == "closed"
+
+def test_http_stale(backend):
+    helpers.configure_http(failure_threshold=1, stale_cache=oai_repo.LRUCache(ttl=60))
+    url = "https://solr.example.edu/select"
+    assert helpers.apicall_getjson(url, [("q", "a")]) == {"call": 1}
+    assert helpers.apicall_getjson(url, [("q", "b")]) == {"call": 2}
+    backend.down = True
+    # Stale responses are served on failure, and while the circuit is open
+    assert helpers.apicall_getjson(url, [("q", "a")]) == {"call": 1}
+    assert helpers.circuit_breaker(url).state == "open"
+    assert helpers.apicall_getjson(url, [("q", "b")]) == {"call": 2}
+    assert backend.calls == 3
+    with pytest.raises(oai_repo.OAIRepoExternalException, match="Circuit open"):
+        helpers.apicall_getjson(url, [("q", "c")])
+
+    # Stale responses served are counted in request metrics
+    with oai_repo.RequestContext() as ctx:
+        helpers.apicall_getjson(url, {"q": "a"})
+    assert ctx.metrics["stale_api_responses"] == 1
+
+def test_http_status(backend, monkeypatch):
+    helpers.configure_http(failure_threshold=1)
+    monkeypatch.setattr(
+        helpers.requests.Session, "get", lambda session, url, params, timeout: FakeResponse("", 404)
+    )
+    # Errors for the request do not open the circuit
+    with pytest.raises(oai_repo.OAIRepoExternalException, match="404"):
+        helpers.apicall_getjson("https://api.example.edu/missing")
+    assert helpers.circuit_breaker("https://api.example.edu/").state == "closed"
+    monkeypatch.setattr(
+        helpers.requests.Session, "get", lambda session, url, params, timeout: FakeResponse("", 503)
+    )
+    with pytest.raises(oai_repo.OAIRepoExternalException, match="503"):
+        helpers.apicall_getjson("https://api.example.edu/missing")
+    assert helpers.circuit_breaker("https://api.example.edu/").state == "open"
+
+def test_http_circuit_trial_error(backend, monkeypatch):
+    helpers.configure_http(failure_threshold=1, reset_timeout=0)
+    backend.down = True
+    with pytest.raises(oai_repo.OAIRepoExternalException, match="Call to API failed"):
+        helpers.apicall_getjson("https://solr.example.edu/select")
+    def broken(session, url, params, timeout):
+        raise ValueError("Unexpected")
+    monkeypatch.setattr(helpers.requests.Session, "get", broken)
+    # An error other than a failed call during the trial allows another trial
+    with pytest.raises(ValueError):
+        helpers.apicall_getjson("https://solr.example.edu/select")
+    monkeypatch.setattr(helpers.requests.Session, "get", backend.get)
+    backend.down = False
+    assert helpers.apicall_getjson("https://solr.example.edu/select") == {"call": 2}
+    assert helpers.circuit_breaker("https://solr.example.edu/").state == "closed"
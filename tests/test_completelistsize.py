@@ -0,0 +1,73 @@
+import pytest
+import oai_repo
+from oai_repo.exceptions import OAIRepoInternalException
+from .data_memory import DataInMemory
+
+class DataWithCount(DataInMemory):
+    """A DataInterface counting identifiers separately from listing them"""
+    def __init__(self, estimate=None):
+        super().__init__()
+        self.estimate = estimate
+
+    def list_identifiers(self, metadataprefix, filter_from=None, filter_until=None,
+                         filter_set=None, cursor=0):
+        identifiers, _, state = super().list_identifiers(
+            metadataprefix, filter_from, filter_until, filter_set, cursor
+        )
+        return identifiers, None, state
+
+    def count_identifiers(self, metadataprefix, filter_from=None, filter_until=None,
+                          filter_set=None):
+        self.calls["count_identifiers"] += 1
+        if self.estimate is not None:
+            return oai_repo.ApproximateSize(self.estimate)
+        return len(self.filtered(filter_from, filter_until, filter_set))
+
+def harvest(repo, verb, **args):
+    """Follow a resumptionToken chain, returning all response bytes"""
+    resps = [repo.process({ 'verb': verb, 'metadataPrefix': 'oai_dc', **args })]
+    while token := resps[-1].xpath("//resumptionToken/text()"):
+        resps.append(repo.process({ 'verb': verb, 'resumptionToken': token[0] }))
+    return [bytes(resp) for resp in resps]
+
+def test_count_cached():
+    repo = oai_repo.OAIRepository(DataWithCount())
+    resps = harvest(repo, 'ListIdentifiers')
+    assert len(resps) == 3
+    assert b'<resumptionToken cursor="200" completeListSize="250"/>' in resps[-1]
+    assert repo.data.calls["count_identifiers"] == 1
+    assert repo.counts.stats["hits"] == 2
+
+    # Different parameters are counted separately
+    resps = harvest(repo, 'ListRecords', set='odd')
+    assert b'<resumptionToken cursor="100" completeListSize="125"/>' in resps[-1]
+    assert repo.data.calls["count_identifiers"] == 2
+
+def test_approximate_size():
+    # Estimate is sent, but paging continues while pages are full
+    repo = oai_repo.OAIRepository(DataWithCount(estimate=120))
+    resps = harvest(repo, 'ListIdentifiers')
+    assert len(resps) == 3
+    assert b'cursor="0" completeListSize="120">' in resps[0]
+    assert b'cursor="100" completeListSize="201">' in resps[1]
+    assert b'<resumptionToken cursor="200" completeListSize="250"/>' in resps[2]
+    assert all(b"badResumptionToken" not in resp for resp in resps)
+
+    # Estimate can be omitted
+    repo = oai_repo.OAIRepository(DataWithCount(estimate=5000), approximate_size="omit")
+    resps = harvest(repo, 'ListRecords')
+    assert len(resps) == 3
+    assert b'<resumptionToken cursor="0">' in resps[0]
+    assert b'completeListSize' not in b"".join(resps)
+
+    # A final page may turn out empty
+    data = DataWithCount(estimate=10)
+    data.headers = data.headers[:200]
+    repo = oai_repo.OAIRepository(data)
+    resps = harvest(repo, 'ListIdentifiers')
+    assert len(resps) == 3
+    assert b"<header>" not in resps[2]
+    assert b'<resumptionToken cursor="200" completeListSize="200"/>' in resps[2]
+
+    with pytest.raises(OAIRepoInternalException):
+        oai_repo.OAIRepository(data, approximate_size="guess")
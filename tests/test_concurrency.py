@@ -0,0 +1,75 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import oai_repo
+from oai_repo import helpers
+from .data_memory import DataInMemory
+
+REQUESTS = [
+    { 'verb': 'Identify' },
+    { 'verb': 'ListMetadataFormats' },
+    { 'verb': 'ListSets' },
+    { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:7', 'metadataPrefix': 'oai_dc' },
+    { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:nope', 'metadataPrefix': 'oai_dc' },
+    { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'set': 'odd' },
+    { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc', 'from': '2020-03-01' },
+    { 'verb': 'NotAVerb' },
+]
+
+def without_date(resp: bytes) -> bytes:
+    return re.sub(rb"<responseDate>[^<]*</responseDate>", b"", resp)
+
+def test_process_threads():
+    repo = oai_repo.OAIRepository(DataInMemory())
+    expected = [without_date(bytes(repo.process(req))) for req in REQUESTS]
+
+    def worker(idx):
+        request = REQUESTS[idx % len(REQUESTS)]
+        original = dict(request)
+        with oai_repo.RequestContext() as outer:
+            resp = bytes(repo.process(request))
+            # Contexts are restored after processing
+            assert oai_repo.current_context() is outer
+        # Caller's arguments are not modified
+        assert request == original
+        return idx, without_date(resp)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for idx, resp in pool.map(worker, range(160)):
+            assert resp == expected[idx % len(REQUESTS)]
+    assert oai_repo.current_context() is None
+
+class FakeResponse:
+    status_code = 200
+    def __init__(self, text):
+        self.text = text
+
+class DataWithApiCalls(DataInMemory):
+    """A DataInterface which makes API calls for the record title"""
+    def get_record_metadata(self, identifier, metadataprefix):
+        xdc = super().get_record_metadata(identifier, metadataprefix)
+        xdc[0].text = helpers.apicall_querypath(url="https://api/title", jsonpath="$.title")
+        return xdc
+
+def test_apicall_cache_per_request(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+    def fake_get(session, url, params, timeout):
+        with lock:
+            calls.append(url)
+            return FakeResponse(f'{{"title": "Title {len(calls)}"}}')
+    monkeypatch.setattr(helpers.requests.Session, "get", fake_get)
+
+    repo = oai_repo.OAIRepository(DataWithApiCalls())
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc', 'from': '2020-08-01' }
+    # API results are cached within a request, but not across requests
+    resp = bytes(repo.process(request))
+    assert resp.count(b"<dc:title>Title 1</dc:title>") == 37
+    assert len(calls) == 1
+    resp = bytes(repo.process(request))
+    assert resp.count(b"<dc:title>Title 2</dc:title>") == 37
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        resps = list(pool.map(lambda _: bytes(repo.process(request)), range(32)))
+    assert len(calls) == 34
+    assert all(len(set(re.findall(rb"<dc:title>[^<]*</dc:title>", r))) == 1 for r in resps)
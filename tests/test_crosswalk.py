@@ -0,0 +1,110 @@
+import threading
+import pytest
+from lxml import etree
+import oai_repo
+from .data_memory import DataInMemory
+
+TITLES_XSLT = b"""<?xml version="1.0"?>
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+    xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <xsl:param name="label"/>
+  <xsl:template match="/">
+    <xsl:if test="//dc:title != 'Record 3'">
+      <titles xmlns="http://example.edu/titles/" label="{$label}">
+        <title><xsl:value-of select="//dc:title"/></title>
+      </titles>
+    </xsl:if>
+  </xsl:template>
+</xsl:stylesheet>
+"""
+
+TITLES = oai_repo.DerivedMetadataFormat(
+    "titles",
+    "https://example.edu/titles.xsd",
+    "http://example.edu/titles/",
+    source_prefix="oai_dc",
+    stylesheet=TITLES_XSLT,
+    params={"label": "Derived"}
+)
+
+def titles(resp) -> list[str]:
+    """Return the titles in the response, parsed as cached records are serialized"""
+    return etree.fromstring(bytes(resp)).xpath(
+        "//t:title/text()", namespaces={"t": "http://example.edu/titles/"}
+    )
+
+def test_Crosswalk_formats():
+    repo = oai_repo.OAIRepository(DataInMemory(), crosswalk=oai_repo.Crosswalk([TITLES]))
+    prefixes = [mdf.metadata_prefix for mdf in repo.get_metadata_formats()]
+    assert prefixes == ["oai_dc", "titles"]
+    resp = bytes(repo.process({ 'verb': 'ListMetadataFormats', 'identifier': 'oai:example.edu:1' }))
+    assert b"<metadataPrefix>titles</metadataPrefix>" in resp
+    # Formats without their source format are not available
+    crosswalk = oai_repo.Crosswalk([oai_repo.DerivedMetadataFormat("marc21", source_prefix="mods")])
+    assert crosswalk.extend(repo.data.get_metadata_formats()) == repo.data.get_metadata_formats()
+
+def test_Crosswalk_GetRecord():
+    repo = oai_repo.OAIRepository(DataInMemory(), crosswalk=oai_repo.Crosswalk([TITLES]))
+    resp = repo.process({
+        'verb': 'GetRecord', 'metadataPrefix': 'titles', 'identifier': 'oai:example.edu:1'
+    })
+    assert titles(resp) == ["Record 1"]
+    assert b'label="Derived"' in bytes(resp)
+    assert repo.data.calls["get_record_metadata"] == 1
+
+def test_Crosswalk_ListRecords():
+    data = DataInMemory()
+    crosswalk = oai_repo.Crosswalk([TITLES], cache=oai_repo.LRUCache())
+    repo = oai_repo.OAIRepository(data, crosswalk=crosswalk)
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'titles' }
+    resp = repo.process(request)
+    # Records the stylesheet produces nothing for are left out
+    assert len(titles(resp)) == 99
+    assert "Record 3" not in titles(resp)
+    assert data.calls["get_record_metadata"] == 100
+    assert crosswalk.stats == {"transformed": 100, "cached": 0}
+
+    # Transformed records are cached by identifier and datestamp
+    assert titles(repo.process(request)) == titles(resp)
+    assert data.calls["get_record_metadata"] == 101
+    assert crosswalk.stats == {"transformed": 101, "cached": 99}
+    data.headers[5].datestamp = data.headers[5].datestamp.replace(year=2021)
+    repo.process(request)
+    assert crosswalk.stats["transformed"] == 103
+
+    # Other verbs query the DataInterface with the source format
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'titles' }))
+    assert b"<identifier>oai:example.edu:99</identifier>" in resp
+
+def test_Crosswalk_missing_header():
+    data = DataInMemory()
+    crosswalk = oai_repo.Crosswalk([TITLES], cache=oai_repo.LRUCache())
+    identifiers = ["oai:example.edu:1", "oai:example.edu:missing"]
+    headers = [data.get_record_header(identifiers[0]), None]
+    for cached in (0, 1):
+        results = crosswalk.get_records_metadata(data, identifiers, "titles", headers)
+        assert [titles(result) for result in results] == [["Record 1"], ["Record missing"]]
+        # Records without a header are retrieved, but never cached
+        assert crosswalk.stats == {"transformed": 2 + cached, "cached": cached}
+
+def test_Crosswalk_stylesheet():
+    crosswalk = oai_repo.Crosswalk([TITLES])
+    xslt = crosswalk.stylesheet("titles")
+    assert crosswalk.stylesheet("titles") is xslt
+    # Compiled separately in each thread
+    other = []
+    thread = threading.Thread(target=lambda: other.append(crosswalk.stylesheet("titles")))
+    thread.start()
+    thread.join()
+    assert other[0] is not xslt
+
+    invalid = oai_repo.DerivedMetadataFormat(
+        "invalid", source_prefix="oai_dc", stylesheet=b"<xsl:stylesheet/>"
+    )
+    missing = oai_repo.DerivedMetadataFormat(
+        "missing", source_prefix="oai_dc", stylesheet="/nonexistent/missing.xsl"
+    )
+    crosswalk = oai_repo.Crosswalk([invalid, missing])
+    for prefix in ("invalid", "missing"):
+        with pytest.raises(oai_repo.OAIRepoInternalException):
+            crosswalk.stylesheet(prefix)
@@ -0,0 +1,88 @@
+import time
+import pytest
+import oai_repo
+from oai_repo import helpers
+from .data_memory import DataInMemory
+
+def test_RequestContext_deadline():
+    ctx = oai_repo.RequestContext()
+    assert ctx.remaining() is None
+    ctx.check_deadline()
+
+    ctx = oai_repo.RequestContext(timeout=0.05)
+    assert 0 < ctx.remaining() <= 0.05
+    with ctx:
+        oai_repo.check_deadline()
+        time.sleep(0.06)
+        assert ctx.remaining() < 0
+        with pytest.raises(oai_repo.OAIRepoDeadlineException):
+            oai_repo.check_deadline()
+    # Outside of processing a request, there is no deadline
+    oai_repo.check_deadline()
+
+class DataSlow(DataInMemory):
+    """A DataInterface which is slow to list identifiers"""
+    def list_identifiers(self, *args, **kwargs):
+        time.sleep(0.1)
+        return super().list_identifiers(*args, **kwargs)
+
+def test_OAIRepository_deadline():
+    data = DataSlow()
+    repo = oai_repo.OAIRepository(
+        data, deadline=0.05, verb_deadlines={"ListIdentifiers": 5}, retry_after=120
+    )
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' }
+    with pytest.raises(oai_repo.OAIRepoDeadlineException) as exc:
+        repo.process(request)
+    assert exc.value.retry_after == 120
+    # Abandoned before building the response
+    assert data.calls["get_record_metadata"] == 0
+    # Unavailable is a kind of external failure
+    assert isinstance(exc.value, oai_repo.OAIRepoUnavailableException)
+    assert isinstance(exc.value, oai_repo.OAIRepoExternalException)
+
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' }
+    assert b"<header>" in bytes(repo.process(request))
+    assert b"<repositoryName>" in bytes(repo.process({ 'verb': 'Identify' }))
+
+class FakeResponse:
+    status_code = 200
+    text = '{"ok": true}'
+
+@pytest.fixture
+def timeouts(monkeypatch):
+    timeouts = []
+    def fake_get(session, url, params, timeout):
+        timeouts.append(timeout)
+        if timeout < 0.1:
+            time.sleep(timeout)
+            raise helpers.requests.Timeout("Read timed out")
+        return FakeResponse()
+    monkeypatch.setattr(helpers.requests.Session, "get", fake_get)
+    yield timeouts
+    helpers.configure_http()
+
+def test_http_deadline(timeouts):
+    url = "https://api.example.edu/deadline"
+    assert helpers.apicall_getjson(url) == {"ok": True}
+    with oai_repo.RequestContext(timeout=1):
+        assert helpers.apicall_getjson(url) == {"ok": True}
+    assert timeouts[0] == 10
+    assert timeouts[1] <= 1
+
+    # Timeouts from the deadline do not count as backend failures
+    helpers.configure_http(failure_threshold=1)
+    with oai_repo.RequestContext(timeout=0.05):
+        with pytest.raises(oai_repo.OAIRepoDeadlineException, match="during call"):
+            helpers.apicall_getjson(url)
+        with pytest.raises(oai_repo.OAIRepoDeadlineException, match="before call"):
+            helpers.apicall_getjson(url)
+    assert len(timeouts) == 3
+    assert helpers.circuit_breaker(url).state == "closed"
+
+    # Stale responses are served when out of time
+    helpers.configure_http(stale_cache=oai_repo.LRUCache())
+    assert helpers.apicall_getjson(url) == {"ok": True}
+    with oai_repo.RequestContext(timeout=0):
+        assert helpers.apicall_getjson(url) == {"ok": True}
+    assert len(timeouts) == 4
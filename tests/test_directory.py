@@ -0,0 +1,131 @@
+import os
+import time
+from datetime import datetime, timezone
+from lxml import etree
+import oai_repo
+from oai_repo.directory import DirectoryDataInterface
+from .data_memory import DataInMemory
+
+START = int(datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp())
+DAY = 86400
+
+def write_record(root, stem, idx, setspecs=None):
+    source = DataInMemory(1)
+    xdc = source.get_record_metadata(f"oai:example.edu:{idx}", "oai_dc")
+    path = os.path.join(root, stem + ".xml")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as xmlf:
+        xmlf.write(etree.tostring(xdc, xml_declaration=True, encoding="UTF-8"))
+    os.utime(path, (START + idx * DAY, START + idx * DAY))
+    if setspecs is not None:
+        with open(os.path.join(root, stem + ".sets"), "w", encoding="utf8") as setf:
+            setf.write("\n".join(setspecs) + "\n")
+        os.utime(os.path.join(root, stem + ".sets"), (START, START))
+
+def directory_data(root, **kwargs):
+    return DirectoryDataInterface(
+        root,
+        DataInMemory().get_identify(),
+        DataInMemory().get_metadata_formats(),
+        identifier_prefix="oai:example.edu:",
+        **kwargs
+    )
+
+def test_DirectoryDataInterface(tmp_path):
+    root = str(tmp_path / "records")
+    for idx in range(250):
+        write_record(root, f"{'even' if idx % 2 == 0 else 'odd'}/{idx % 3}/rec{idx}", idx)
+    with open(os.path.join(root, "README.txt"), "w", encoding="utf8") as readme:
+        readme.write("Not a record")
+    data = directory_data(root)
+    repo = oai_repo.OAIRepository(data)
+
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'set': 'odd' }
+    rawresp = repo.process(request)
+    resp = bytes(rawresp)
+    assert b"<identifier>oai:example.edu:odd/1/rec1</identifier>" in resp
+    assert b"<datestamp>2020-01-02</datestamp>" in resp
+    assert b"<setSpec>odd:1</setSpec>" in resp
+    assert b'<resumptionToken cursor="0" completeListSize="125">' in resp
+
+    request = {
+        'verb': 'ListRecords', 'metadataPrefix': 'oai_dc',
+        'set': 'even:0', 'from': '2020-08-01', 'until': '2020-08-31'
+    }
+    resp = bytes(repo.process(request))
+    assert resp.count(b"<record>") == 5
+    assert b"<identifier>oai:example.edu:even/0/rec216</identifier>" in resp
+    assert b"<dc:title>Record 216</dc:title>" in resp
+
+    resp = bytes(repo.process({ 'verb': 'ListSets' }))
+    assert resp.count(b"<set>") == 8
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:odd/1/rec7',
+                'metadataPrefix': 'oai_dc' }
+    assert b"<dc:title>Record 7</dc:title>" in bytes(repo.process(request))
+    request["identifier"] = "oai:example.edu:odd/1/rec8"
+    assert b'code="idDoesNotExist"' in bytes(repo.process(request))
+
+    # Index is persisted, and reloaded without changes
+    assert os.path.exists(os.path.join(root, ".oai_repo_index"))
+    reloaded = directory_data(root)
+    assert not reloaded.refresh()
+    assert reloaded.list_identifiers("oai_dc") == data.list_identifiers("oai_dc")
+    headers, size, state = data.list_headers("oai_dc", filter_set="odd", cursor=100)
+    assert [header.identifier for header in headers] == \
+        data.list_identifiers("oai_dc", filter_set="odd", cursor=100)[0]
+    assert (size, state) == (125, data.state)
+
+    # Refreshed incrementally as files change
+    write_record(root, "odd/1/rec1", 300)
+    os.remove(os.path.join(root, "even/0/rec0.xml"))
+    write_record(root, "new/rec301", 301)
+    assert not reloaded.refresh(force=False)
+    assert reloaded.refresh()
+    idents, size, state = reloaded.list_identifiers("oai_dc", cursor=200)
+    assert size == 250
+    assert idents[-2:] == ["oai:example.edu:odd/1/rec1", "oai:example.edu:new/rec301"]
+    assert state != data.state
+    assert reloaded.get_record_header("oai:example.edu:new/rec301").setspecs == ["new"]
+    # Records removed since being listed, and other unknown identifiers
+    for identifier in ("oai:example.edu:even/0/rec0", "other:rec1"):
+        assert reloaded.get_record_header(identifier) is None
+        assert reloaded.list_set_specs(identifier) == ([], None, None)
+
+def test_DirectoryDataInterface_sidecar(tmp_path):
+    root = str(tmp_path / "records")
+    write_record(root, "rec1", 1, ["maps", "photos:1901"])
+    write_record(root, "rec2", 2, [])
+    write_record(root, "rec3", 3)
+    data = directory_data(root, sets="sidecar")
+    assert data.list_identifiers("oai_dc", filter_set="photos")[0] == ["oai:example.edu:rec1"]
+    assert data.get_record_header("oai:example.edu:rec1").setspecs == ["maps", "photos:1901"]
+    assert data.get_record_header("oai:example.edu:rec3").setspecs == []
+    assert data.list_set_specs()[0] == ["maps", "photos", "photos:1901"]
+
+    # Sidecar changes update the datestamp, and the sets
+    with open(os.path.join(root, "rec2.sets"), "w", encoding="utf8") as setf:
+        setf.write("maps\n")
+    os.utime(os.path.join(root, "rec2.sets"), (START + 9 * DAY, START + 9 * DAY))
+    assert data.refresh()
+    header = data.get_record_header("oai:example.edu:rec2")
+    assert header.setspecs == ["maps"]
+    assert header.datestamp == datetime(2020, 1, 10, tzinfo=timezone.utc)
+
+def test_DirectoryDataInterface_background_refresh(tmp_path):
+    root = str(tmp_path / "records")
+    write_record(root, "rec1", 1)
+    data = directory_data(root, refresh_interval=0)
+    state = data.state
+    write_record(root, "rec2", 2)
+    # The listing is served from the current index, while a refresh starts in the background
+    data._lock.acquire()  # pylint: disable=protected-access
+    try:
+        assert data.list_identifiers("oai_dc")[0] == ["oai:example.edu:rec1"]
+    finally:
+        data._lock.release()  # pylint: disable=protected-access
+    for _ in range(100):
+        if data.state != state:
+            break
+        time.sleep(0.01)
+    assert data.list_identifiers("oai_dc")[0][-1] == "oai:example.edu:rec2"
+    assert data.state != state
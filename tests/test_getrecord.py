@@ -1,4 +1,5 @@
 import pytest
+from lxml import etree
 import oai_repo
 from oai_repo.exceptions import (
     OAIErrorIdDoesNotExist,
@@ -7,6 +8,7 @@ from oai_repo.exceptions import (
     OAIRepoExternalException,
 )
 from .data_sets import DataWithSets
+from .data_memory import DataInMemory
 
 def test_GetRecord():
     repo = oai_repo.OAIRepository(DataWithSets())
@@ -76,3 +78,49 @@ def test_GetRecord():
 
     # Config where API url returns invalid data
     #TODO
+
+class DataWithBundle(DataInMemory):
+    """A DataInterface which returns GetRecord data in a single call"""
+    def get_record_bundle(self, identifier, metadataprefix):
+        self.calls["get_record_bundle"] += 1
+        if identifier not in self.by_identifier:
+            return None
+        return oai_repo.RecordBundle(
+            self.by_identifier[identifier],
+            ["oai_dc"],
+            DataInMemory.get_record_metadata(self, identifier, metadataprefix),
+            [etree.fromstring(b"<bundled/>")]
+        )
+
+def test_GetRecord_bundle():
+    repo = oai_repo.OAIRepository(DataWithBundle())
+    request = {
+        'verb': 'GetRecord',
+        'identifier': 'oai:example.edu:3',
+        'metadataPrefix': 'oai_dc'
+    }
+    resp = bytes(repo.process(request))
+    assert b"<identifier>oai:example.edu:3</identifier>" in resp
+    assert b"<dc:title>Record 3</dc:title>" in resp
+    assert b"<about>\n        <bundled/>" in resp
+    assert repo.data.calls["get_record_bundle"] == 1
+    assert repo.data.calls["is_valid_identifier"] == 0
+    assert repo.data.calls["get_record_header"] == 0
+    assert repo.data.calls["get_record_metadata"] == 1
+
+    request['metadataPrefix'] = 'mods'
+    assert b'code="cannotDisseminateFormat"' in bytes(repo.process(request))
+    request['identifier'] = 'oai:example.edu:nope'
+    assert b'code="idDoesNotExist"' in bytes(repo.process(request))
+
+    # Without a bundle, each part is retrieved separately
+    repo = oai_repo.OAIRepository(DataInMemory())
+    request = {
+        'verb': 'GetRecord',
+        'identifier': 'oai:example.edu:3',
+        'metadataPrefix': 'oai_dc'
+    }
+    resp = bytes(repo.process(request))
+    assert b"<dc:title>Record 3</dc:title>" in resp
+    assert repo.data.calls["is_valid_identifier"] == 1
+    assert repo.data.calls["get_record_header"] == 1
@@ -0,0 +1,117 @@
+import time
+import threading
+import pytest
+import oai_repo
+from oai_repo import helpers
+from oai_repo.hedge import LatencyTracker, HedgeBudget
+
+def test_LatencyTracker():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for latency in range(9):
+        tracker.record(latency / 100)
+    assert tracker.percentile(50) is None
+    for latency in range(9, 150):
+        tracker.record(latency / 100)
+    # Only the most recent latencies are kept
+    assert len(tracker) == 100
+    assert tracker.percentile(0) == 0.5
+    assert tracker.percentile(50) == 0.99
+    assert tracker.percentile(95) == 1.44
+    assert tracker.percentile(100) == 1.49
+
+def test_HedgeBudget():
+    budget = HedgeBudget(ratio=0.25, burst=2)
+    assert not budget.try_hedge()
+    for _ in range(100):
+        budget.record_call()
+    # Tokens saved up are capped by the burst
+    assert budget.try_hedge()
+    assert budget.try_hedge()
+    assert not budget.try_hedge()
+    for _ in range(4):
+        budget.record_call()
+    assert budget.try_hedge()
+    assert budget.stats == {"calls": 104, "hedged": 3, "denied": 2}
+
+class FakeResponse:
+    status_code = 200
+    def __init__(self, text):
+        self.text = text
+
+class FakeReplicas:
+    """Fake for requests.Session.get, with a latency for each host"""
+    def __init__(self):
+        self.latency = {"solr1.example.edu": 0.001, "solr2.example.edu": 0.001}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, params, timeout):
+        host = url.split("/")[2]
+        with self.lock:
+            self.calls.append(host)
+        time.sleep(self.latency[host])
+        return FakeResponse(f'{{"host": "{host}"}}')
+
+@pytest.fixture
+def replicas(monkeypatch):
+    fake = FakeReplicas()
+    monkeypatch.setattr(helpers.requests.Session, "get", fake.get)
+    helpers.configure_http(
+        replicas=[["https://solr1.example.edu/solr", "https://solr2.example.edu/solr"]],
+        hedge_percentile=90,
+        hedge_ratio=0.5,
+    )
+    yield fake
+    helpers.configure_http()
+
+def test_hedged_requests(replicas):
+    url = "https://solr1.example.edu/solr/select"
+    tracker = helpers.latency_tracker(url)
+    for _ in range(30):
+        tracker.record(0.05)
+    for _ in range(4):
+        assert helpers.apicall_getjson(url, {"q": "*:*"}) == {"host": "solr1.example.edu"}
+    assert replicas.calls == ["solr1.example.edu"] * 4
+    assert len(tracker) == 34
+
+    # Slow responses are hedged to the replica, which answers first
+    replicas.latency["solr1.example.edu"] = 0.5
+    with oai_repo.RequestContext() as ctx:
+        resp = helpers.apicall_getjson(url, {"q": "*:*"})
+    assert resp == {"host": "solr2.example.edu"}
+    assert ctx.metrics["hedged_api_calls"] == 1
+    assert replicas.calls[-2:] == ["solr1.example.edu", "solr2.example.edu"]
+
+    # Hedging is capped to a fraction of calls
+    hosts = [helpers.apicall_getjson(url)["host"] for _ in range(4)]
+    assert hosts == ["solr2.example.edu"] * 3 + ["solr1.example.edu"]
+    assert len(replicas.calls) == 4 + 8 + 1
+
+def test_hedged_requests_failure(replicas, monkeypatch):
+    url = "https://solr1.example.edu/solr/select"
+    tracker = helpers.latency_tracker(url)
+    for _ in range(30):
+        tracker.record(0.01)
+    for _ in range(4):
+        helpers.apicall_getjson(url)
+
+    calls = []
+    def failing_get(session, url, params, timeout):
+        calls.append(url)
+        time.sleep(0.05)
+        raise helpers.requests.ConnectionError("Connection refused")
+    monkeypatch.setattr(helpers.requests.Session, "get", failing_get)
+    # Fails once both calls have failed
+    with pytest.raises(oai_repo.OAIRepoExternalException, match="Call to API failed"):
+        helpers.apicall_getjson(url)
+    assert len(calls) == 2
+
+def test_unreplicated(replicas):
+    # URLs not in a replica group are never hedged
+    replicas.latency["api.example.edu"] = 0.001
+    tracker = helpers.latency_tracker("https://api.example.edu/")
+    for _ in range(30):
+        tracker.record(0.01)
+    replicas.latency["api.example.edu"] = 0.1
+    helpers.apicall_getjson("https://api.example.edu/select")
+    assert replicas.calls == ["api.example.edu"]
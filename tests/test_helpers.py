@@ -32,3 +32,34 @@ def test_xpath_find_first():
     # Invalid query
     with pytest.raises(etree.XPathError):
         helpers.xpath_find_first(xmlr, "/root\\key\\/fail()")
+
+def test_datestamp_format():
+    from datetime import datetime, timezone
+    stamp = datetime(2020, 3, 4, 5, 6, 7, tzinfo=timezone.utc)
+    assert helpers.datestamp_short(stamp) == stamp.strftime("%Y-%m-%d")
+    assert helpers.datestamp_long(stamp) == stamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+    for timestamp in (0, stamp.timestamp() + 0.9, -1, 1e10):
+        as_datetime = datetime.fromtimestamp(int(timestamp // 1), timezone.utc)
+        for granularity in ("YYYY-MM-DD", "YYYY-MM-DDThh:mm:ssZ"):
+            assert helpers.timestamp_format(granularity, timestamp) == \
+                helpers.granularity_format(granularity, as_datetime)
+    assert helpers.timestamp_format("YYYY-MM-DDThh:mm:ssZ", -1) == "1969-12-31T23:59:59Z"
+    assert helpers.timestamps_format("YYYY-MM-DD", [0, 86399, 86400, 0]) == \
+        ["1970-01-01", "1970-01-01", "1970-01-02", "1970-01-01"]
+
+def test_parse_datestamp():
+    from datetime import datetime, timezone
+    assert helpers.parse_datestamp("2020-03-04T05:06:07Z") == \
+        datetime(2020, 3, 4, 5, 6, 7, tzinfo=timezone.utc)
+    assert helpers.parse_datestamp(" 2020-03-04 ", "YYYY-MM-DD") == \
+        datetime(2020, 3, 4, tzinfo=timezone.utc)
+    # Unpadded values are still accepted
+    assert helpers.parse_datestamp("2020-3-4") == datetime(2020, 3, 4, tzinfo=timezone.utc)
+    for invalid, granularity in [
+        ("2020-03-04T05:06:07Z", "YYYY-MM-DD"),
+        ("2020-02-30", "YYYY-MM-DD"),
+        ("2020-03-04T25:06:07Z", "YYYY-MM-DDThh:mm:ssZ"),
+        ("2020/03/04", "YYYY-MM-DD"),
+    ]:
+        with pytest.raises(ValueError):
+            helpers.parse_datestamp(invalid, granularity)
@@ -52,3 +52,40 @@ def test_IdentifyResponse():
     with pytest.raises(OAIErrorBadArgument):
         repo.create_request(request)
 
+
+def test_FrozenIdentify(monkeypatch):
+    ident = oai_repo.OAIRepository(DataWithSets()).data.get_identify()
+    ident.description.append(etree.fromstring(b"<mydescription>Hello</mydescription>"))
+    frozen = ident.freeze()
+    assert isinstance(frozen, oai_repo.FrozenIdentify)
+    assert frozen.freeze() is frozen
+    assert frozen == ident.freeze()
+    assert hash(frozen) == hash(ident.freeze())
+    with pytest.raises(AttributeError):
+        frozen.repository_name = "Changed"
+
+    # Validated once for all equal instances
+    validations = []
+    validate = oai_repo.FrozenIdentify.validate
+    monkeypatch.setattr(oai_repo.FrozenIdentify, "validate",
+                        lambda self: validations.append(1) or validate(self))
+    frozen = ident.freeze()
+    assert frozen.errors() == []
+    assert ident.freeze().errors() == []
+    assert len(validations) == 1
+
+    # Descriptions are parsed once, and copied for each use
+    first, second = frozen.description_xml()[-1], frozen.description_xml()[-1]
+    assert first is not second
+    assert first.text == "Hello"
+
+    ident.granularity = "YYYY"
+    assert len(ident.freeze().errors()) == 1
+
+def test_IdentifyResponse_frozen():
+    repo = oai_repo.OAIRepository(DataWithSets())
+    assert isinstance(repo.get_identify(), oai_repo.FrozenIdentify)
+    responses = [bytes(repo.process({ 'verb': 'Identify' })) for _ in range(2)]
+    # The description is included in every response
+    for resp in responses:
+        assert b"<repositoryIdentifier>d.lib.msu.edu</repositoryIdentifier>" in resp
@@ -5,6 +5,7 @@ from oai_repo.exceptions import (
     OAIErrorNoRecordsMatch, OAIErrorNoSetHierarchy, OAIErrorBadArgument
 )
 from .data_sets import DataWithSets
+from .data_memory import DataInMemory
 
 def test_ListIdentifiers():
     repo = oai_repo.OAIRepository(DataWithSets())
@@ -65,3 +66,33 @@ def test_ListIdentifiers():
 
     # Repository not configured for sets support
     #TODO
+
+class DataWithHeaders(DataInMemory):
+    """A DataInterface which lists headers in a single call"""
+    def list_headers(self, metadataprefix, filter_from=None, filter_until=None,
+                     filter_set=None, cursor=0):
+        self.calls["list_headers"] += 1
+        headers = self.filtered(filter_from, filter_until, filter_set)
+        return headers[cursor:cursor + self.limit], len(headers), None
+
+def test_ListIdentifiers_headers():
+    repo = oai_repo.OAIRepository(DataWithHeaders())
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'set': 'even' }
+    rawresp = repo.process(request)
+    resp = bytes(rawresp)
+    assert b"<identifier>oai:example.edu:198</identifier>" in resp
+    assert b"<datestamp>2020-07-17</datestamp>" in resp
+    assert b'<resumptionToken cursor="0" completeListSize="125">' in resp
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'resumptionToken': token }))
+    assert b"<identifier>oai:example.edu:248</identifier>" in resp
+    assert repo.data.calls["list_headers"] == 2
+    assert repo.data.calls["list_identifiers"] == 0
+    assert repo.data.calls["get_record_header"] == 0
+
+    # Without list_headers, identifiers and headers are retrieved separately
+    repo = oai_repo.OAIRepository(DataInMemory())
+    resp = bytes(repo.process(request))
+    assert b"<datestamp>2020-07-17</datestamp>" in resp
+    assert repo.data.calls["list_identifiers"] == 1
+    assert repo.data.calls["get_record_header"] == 100
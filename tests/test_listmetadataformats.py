@@ -31,3 +31,27 @@ def test_ListMetadataFormats():
     assert b"<request identifier=\"oai:d.lib.msu.edu:etd_1000\">https://d.lib.msu.edu/oai</request>" in bytes(resp)
     assert b"<metadataPrefix>mods</metadataPrefix>" in bytes(resp)
     assert b"<metadataPrefix>oai_dc</metadataPrefix>" in bytes(resp)
+
+def test_FrozenMetadataFormat():
+    mdf = oai_repo.MetadataFormat(
+        "oai_dc",
+        "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+        "http://www.openarchives.org/OAI/2.0/oai_dc/"
+    )
+    frozen = mdf.freeze()
+    assert frozen == oai_repo.FrozenMetadataFormat(*mdf.__dict__.values())
+    assert len({frozen, mdf.freeze()}) == 1
+    assert frozen.errors() == []
+    # Errors are copied, so the memoized result can't be changed
+    frozen.errors().append("changed")
+    assert frozen.errors() == []
+    assert oai_repo.MetadataFormat("oai dc", mdf.schema, "nope").freeze().errors() == [
+        "metadata_prefix contains invalid character(s); allowed chars: A-Za-z0-9-_.!~*'()",
+        "metadata_namespace must be a valid URL",
+    ]
+
+def test_ListMetadataFormats_frozen():
+    repo = oai_repo.OAIRepository(DataWithSets())
+    assert all(
+        isinstance(mdf, oai_repo.FrozenMetadataFormat) for mdf in repo.get_metadata_formats()
+    )
@@ -5,6 +5,7 @@ from oai_repo.exceptions import (
     OAIErrorNoRecordsMatch, OAIErrorNoSetHierarchy
 )
 from .data_sets import DataWithSets
+from .data_memory import DataInMemory
 
 def test_ListRecords():
     repo = oai_repo.OAIRepository(DataWithSets())
@@ -29,3 +30,42 @@ def test_ListRecords():
     rawresp = repo.create_response(req)
     resp = bytes(rawresp)
     assert b'<resumptionToken cursor="100" completeListSize="' in resp
+
+class DataWithRecords(DataInMemory):
+    """A DataInterface which lists full records in a single call"""
+    def list_records(self, metadataprefix, filter_from=None, filter_until=None,
+                     filter_set=None, cursor=0):
+        self.calls["list_records"] += 1
+        headers = self.filtered(filter_from, filter_until, filter_set)
+        bundles = [
+            oai_repo.RecordBundle(
+                header,
+                metadata=DataInMemory.get_record_metadata(self, header.identifier, metadataprefix)
+            )
+            for header in headers[cursor:cursor + self.limit]
+        ]
+        return bundles, len(headers), None
+
+def test_ListRecords_records():
+    repo = oai_repo.OAIRepository(DataWithRecords())
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc', 'set': 'odd' }
+    rawresp = repo.process(request)
+    resp = bytes(rawresp)
+    assert b"<identifier>oai:example.edu:199</identifier>" in resp
+    assert b"<dc:title>Record 199</dc:title>" in resp
+    assert b'<resumptionToken cursor="0" completeListSize="125">' in resp
+    assert rawresp.context.metrics["data_path"] == "list_records"
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    resp = bytes(repo.process({ 'verb': 'ListRecords', 'resumptionToken': token }))
+    assert b"<dc:title>Record 249</dc:title>" in resp
+    assert repo.data.calls["list_records"] == 2
+    assert repo.data.calls["list_identifiers"] == 0
+    assert repo.data.calls["get_record_header"] == 0
+
+    # Without list_records, each part is retrieved separately
+    repo = oai_repo.OAIRepository(DataInMemory())
+    rawresp = repo.process(request)
+    assert b"<dc:title>Record 199</dc:title>" in bytes(rawresp)
+    assert rawresp.context.metrics["data_path"] == "list_identifiers"
+    assert repo.data.calls["list_identifiers"] == 1
+    assert repo.data.calls["get_record_header"] == 100
@@ -0,0 +1,116 @@
+import time
+from lxml import etree
+import oai_repo
+from .data_memory import DataInMemory
+
+def wait_for_prefetch(prefetcher, timeout=5):
+    """Wait until no prefetches are pending"""
+    end = time.monotonic() + timeout
+    while prefetcher._pending and time.monotonic() < end:
+        time.sleep(0.01)
+
+def test_Prefetcher():
+    prefetcher = oai_repo.Prefetcher(workers=1)
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher)
+
+    # First page schedules the second
+    rawresp = repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    assert prefetcher.stats["scheduled"] == 1
+    wait_for_prefetch(prefetcher)
+    calls = repo.data.calls["list_identifiers"]
+
+    # Second page is served from the prefetch cache, and schedules the third
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    rawresp = repo.process({ 'verb': 'ListRecords', 'resumptionToken': token })
+    assert b'<resumptionToken cursor="100" completeListSize="250">' in bytes(rawresp)
+    assert b"<identifier>oai:example.edu:100</identifier>" in bytes(rawresp)
+    assert f'resumptionToken="{token}"'.encode() in bytes(rawresp)
+    assert prefetcher.stats["hits"] == 1
+    assert prefetcher.stats["scheduled"] == 2
+    wait_for_prefetch(prefetcher)
+
+    # Requesting the same token again misses; entries are served once
+    rawresp = repo.process({ 'verb': 'ListRecords', 'resumptionToken': token })
+    assert prefetcher.stats["misses"] == 1
+    assert prefetcher.hit_rate == 0.5
+    assert repo.data.calls["list_identifiers"] == calls + 2
+    prefetcher.close()
+
+    # ListIdentifiers is not prefetched by default
+    prefetcher = oai_repo.Prefetcher()
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher)
+    repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' })
+    assert prefetcher.stats["scheduled"] == 0
+
+def test_Prefetcher_limits():
+    # Pages larger than max_bytes are not kept
+    prefetcher = oai_repo.Prefetcher(max_bytes=1024)
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher)
+    rawresp = repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    wait_for_prefetch(prefetcher)
+    assert prefetcher.stats["evicted"] == 1
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    assert prefetcher.get("ListRecords", token) is None
+
+    # Expired pages are not served
+    prefetcher = oai_repo.Prefetcher(ttl=0)
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher)
+    rawresp = repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    wait_for_prefetch(prefetcher)
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    time.sleep(0.01)
+    assert prefetcher.get("ListRecords", token) is None
+    assert prefetcher.stats["expired"] == 1
+
+    # Prefetches beyond max_pending are skipped
+    prefetcher = oai_repo.Prefetcher(max_pending=0)
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher)
+    repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    assert prefetcher.stats["skipped"] == 1
+
+class DataRecorded(DataInMemory):
+    """A DataInterface recording the time remaining to the deadline of each listing,
+    and returning metadata as serialized bytes"""
+    def __init__(self):
+        super().__init__()
+        self.remaining = []
+
+    def list_identifiers(self, *args, **kwargs):
+        self.remaining.append(oai_repo.current_context().remaining())
+        return super().list_identifiers(*args, **kwargs)
+
+    def get_record_metadata(self, identifier, metadataprefix):
+        return etree.tostring(super().get_record_metadata(identifier, metadataprefix))
+
+def test_Prefetcher_render():
+    # Pages are rendered with the deadline of the verb, and sized as serialized
+    prefetcher = oai_repo.Prefetcher()
+    data = DataRecorded()
+    repo = oai_repo.OAIRepository(data, prefetcher=prefetcher, verb_deadlines={"ListRecords": 30})
+    rawresp = repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    wait_for_prefetch(prefetcher)
+    assert len(data.remaining) == 2
+    assert 0 < data.remaining[1] <= 30
+    size = prefetcher._cache_bytes
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    rawresp = repo.process({ 'verb': 'ListRecords', 'resumptionToken': token })
+    assert prefetcher.stats["hits"] == 1
+    assert size == len(bytes(rawresp))
+    assert size > 2 * len(etree.tostring(rawresp.root()))
+    prefetcher.close()
+
+def test_Prefetcher_admission():
+    # Not prefetched while admission control has no free slots
+    prefetcher = oai_repo.Prefetcher()
+    admission = oai_repo.AdmissionController(max_active=1)
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher, admission=admission)
+    repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    assert prefetcher.stats["scheduled"] == 0
+    assert prefetcher.stats["skipped"] == 1
+
+    admission = oai_repo.AdmissionController(max_active=2)
+    repo = oai_repo.OAIRepository(DataInMemory(), prefetcher=prefetcher, admission=admission)
+    repo.process({ 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' })
+    assert prefetcher.stats["scheduled"] == 1
+    wait_for_prefetch(prefetcher)
+    prefetcher.close()
@@ -0,0 +1,95 @@
+import re
+from datetime import datetime, timezone
+import pytest
+import oai_repo
+from .data_memory import DataInMemory
+
+def test_RecordHeader_slots():
+    header = oai_repo.RecordHeader("oai:example.edu:1", datetime(2020, 1, 1), ["all"])
+    assert not hasattr(header, "__dict__")
+    with pytest.raises(AttributeError):
+        header.other = "value"
+    assert header == oai_repo.RecordHeader("oai:example.edu:1", datetime(2020, 1, 1), ["all"])
+
+def test_RecordHeaderBatch():
+    batch = oai_repo.RecordHeaderBatch()
+    batch.append("oai:example.edu:1", datetime(2020, 1, 1, tzinfo=timezone.utc), ["all", "odd"])
+    batch.append("oai:example.edu:2", "2020-01-02T00:00:00Z", ["all", "even"], "deleted")
+    batch.append("oai:example.edu:3", datetime(2020, 1, 3), ["all", "odd"])
+    assert len(batch) == 3
+    # Equal setSpecs share a tuple
+    assert batch.setspecs[0] is batch.setspecs[2]
+    assert [batch.is_deleted(idx) for idx in range(3)] == [False, True, False]
+
+    header = batch[1]
+    assert isinstance(header, oai_repo.RecordHeader)
+    assert header == oai_repo.RecordHeader(
+        "oai:example.edu:2", datetime(2020, 1, 2, tzinfo=timezone.utc), ["all", "even"], "deleted"
+    )
+    assert batch[-1].datestamp == datetime(2020, 1, 3, tzinfo=timezone.utc)
+    with pytest.raises(IndexError):
+        batch[3]
+
+    page = batch[1:]
+    assert isinstance(page, oai_repo.RecordHeaderBatch)
+    assert page.identifiers == ["oai:example.edu:2", "oai:example.edu:3"]
+    assert [page.is_deleted(idx) for idx in range(2)] == [True, False]
+    assert [header.identifier for header in batch[::2]] == ["oai:example.edu:1", "oai:example.edu:3"]
+    assert list(oai_repo.RecordHeaderBatch.from_headers(batch)) == list(batch)
+
+class DataBatched(DataInMemory):
+    """A DataInterface returning headers as a RecordHeaderBatch"""
+    def __init__(self):
+        super().__init__()
+        self.batch = oai_repo.RecordHeaderBatch.from_headers(self.headers)
+        self.index = {identifier: idx for idx, identifier in enumerate(self.batch.identifiers)}
+
+    def get_records_header(self, identifiers):
+        self.calls["get_records_header"] += 1
+        batch = oai_repo.RecordHeaderBatch()
+        for identifier in identifiers:
+            idx = self.index[identifier]
+            batch.append(identifier, self.batch.timestamps[idx], self.batch.setspecs[idx])
+        return batch
+
+    def list_headers(self, metadataprefix, filter_from=None, filter_until=None,
+                     filter_set=None, cursor=0):
+        self.calls["list_headers"] += 1
+        return self.batch[cursor:cursor + self.limit], len(self.batch), None
+
+def without_date(response) -> bytes:
+    return re.sub(rb"<responseDate>[^<]*</responseDate>", b"", bytes(response))
+
+@pytest.mark.parametrize("request_args", [
+    { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' },
+    { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' },
+])
+def test_batched_responses(request_args):
+    data = DataBatched()
+    expected = without_date(oai_repo.OAIRepository(DataInMemory()).process(request_args))
+    resp = oai_repo.OAIRepository(data).process(request_args)
+    assert without_date(resp) == expected
+    assert b"<setSpec>even</setSpec>" in expected
+    assert data.calls["list_headers"] + data.calls["get_records_header"] == 1
+
+def test_RecordHeaderBatch_datestamps():
+    batch = oai_repo.RecordHeaderBatch()
+    batch.append("oai:example.edu:1", "2020-01-02")
+    batch.append("oai:example.edu:2", "2020-01-02T12:00:00.500Z")
+    batch.append("oai:example.edu:3", "2020-01-02T14:00:00+02:00")
+    assert [header.datestamp for header in batch] == [
+        datetime(2020, 1, 2, tzinfo=timezone.utc),
+        datetime(2020, 1, 2, 12, 0, 0, 500000, tzinfo=timezone.utc),
+        datetime(2020, 1, 2, 12, tzinfo=timezone.utc),
+    ]
+
+@pytest.mark.parametrize("data_class", [DataInMemory, DataBatched])
+def test_deleted_headers(data_class):
+    data = data_class()
+    data.headers[1].status = "deleted"
+    if isinstance(data, DataBatched):
+        data.batch = oai_repo.RecordHeaderBatch.from_headers(data.headers)
+    repo = oai_repo.OAIRepository(data)
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' }))
+    assert resp.count(b'<header status="deleted">') == 1
+    assert b'<header status="deleted"><identifier>oai:example.edu:1</identifier>' in resp
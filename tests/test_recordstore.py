@@ -0,0 +1,90 @@
+import os
+import mmap
+import pytest
+from lxml import etree
+import oai_repo
+from oai_repo.recordstore import MmapRecordStore
+from .data_memory import DataInMemory
+
+def records(count, title="Record"):
+    source = DataInMemory(count)
+    for header in source.headers:
+        xdc = source.get_record_metadata(header.identifier, "oai_dc")
+        xdc[0].text = f"{title} {header.identifier.rsplit(':', 1)[-1]}"
+        yield header.identifier, "oai_dc", xdc
+        yield header.identifier, "raw", b'<?xml version="1.0"?>\n<raw>' + \
+            header.identifier.encode() + b"</raw>"
+
+def test_MmapRecordStore(tmp_path):
+    path = str(tmp_path / "store")
+    store = MmapRecordStore.build(path, records(250))
+    assert len(store) == 500
+
+    # Lookups are slices of the mapped pack file
+    metadata = store.get("oai:example.edu:7", "oai_dc")
+    assert isinstance(metadata, memoryview)
+    assert isinstance(metadata.obj, mmap.mmap)
+    assert b"<dc:title>Record 7</dc:title>" in bytes(metadata)
+    assert bytes(store.get("oai:example.edu:7", "raw")) == b"<raw>oai:example.edu:7</raw>"
+    assert store.get("oai:example.edu:7", "mods") is None
+    assert store.get("oai:example.edu:999", "oai_dc") is None
+    found, missing = store.get_many(["oai:example.edu:1", "nope"], "raw")
+    assert bytes(found) == b"<raw>oai:example.edu:1</raw>"
+    assert missing is None
+
+    # Rebuilds swap in atomically; open stores see it once refreshed
+    reader = MmapRecordStore(path)
+    MmapRecordStore.build(path, records(10, "Updated"))
+    assert b"<dc:title>Record 7</dc:title>" in bytes(reader.get("oai:example.edu:7", "oai_dc"))
+    assert b"<dc:title>Record 7</dc:title>" in bytes(metadata)
+    assert reader.refresh()
+    assert not reader.refresh()
+    assert len(reader) == 20
+    assert b"<dc:title>Updated 7</dc:title>" in bytes(reader.get("oai:example.edu:7", "oai_dc"))
+    assert reader.get("oai:example.edu:200", "oai_dc") is None
+    assert sorted(os.listdir(path)) == ["current", "gen-2"]
+
+    # Duplicate records are refused, leaving the current generation in place
+    duplicated = list(records(2)) + [("oai:example.edu:1", "raw", b"<raw>again</raw>")]
+    with pytest.raises(oai_repo.OAIRepoInternalException, match="Duplicate"):
+        MmapRecordStore.build(path, duplicated)
+    assert sorted(os.listdir(path)) == ["current", "gen-2"]
+    assert not reader.refresh()
+
+    # An empty store
+    empty = MmapRecordStore.build(str(tmp_path / "empty"), [])
+    assert len(empty) == 0
+    assert empty.get("oai:example.edu:7", "oai_dc") is None
+
+class DataWithStore(DataInMemory):
+    """A DataInterface serving metadata from a MmapRecordStore"""
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def get_record_metadata(self, identifier, metadataprefix):
+        return self.store.get(identifier, metadataprefix)
+
+def test_MmapRecordStore_repository(tmp_path):
+    store = MmapRecordStore.build(str(tmp_path / "store"), records(250))
+    repo = oai_repo.OAIRepository(DataWithStore(store))
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc', 'set': 'odd' }
+    rawresp = repo.process(request)
+    resp = bytes(rawresp)
+    assert b"<dc:title>Record 199</dc:title>" in resp
+    assert b"<?oai-raw" not in resp
+    assert b'<resumptionToken cursor="0" completeListSize="125">' in resp
+    # Response is well-formed, with metadata in place
+    xmlr = etree.fromstring(resp)
+    titles = xmlr.xpath("//dc:title/text()", namespaces={"dc": "http://purl.org/dc/elements/1.1/"})
+    assert len(titles) == 100
+    assert titles[0] == "Record 1"
+
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:7', 'metadataPrefix': 'oai_dc' }
+    resp = bytes(repo.process(request))
+    assert b"<dc:title>Record 7</dc:title>" in resp
+
+    # Outside of processing a request, serialized metadata is parsed
+    req = repo.create_request(request)
+    rawresp = repo.create_response(req)
+    assert rawresp.xpath("//*[local-name()='title']/text()") == ["Record 7"]
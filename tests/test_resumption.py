@@ -53,3 +53,10 @@ def test_ResumptionToken():
         b'22T02:02:02Z">bWV0YWRhdGFQcmVmaXg9b2FpX2RjJmM9MCZzPTk5OSZlPTc5NTY4NjA1MjImaD'
         b'1lZjhiYmZkNDFkNGNjNTk5</resumptionToken>'
     )
+
+    # Snapshot is carried in place of state
+    r1.snapshot = "1700000000"
+    r2 = ResumptionToken()
+    r2.parse(r1.create())
+    assert r2.snapshot == "1700000000"
+    assert r2.args == r1.args
@@ -0,0 +1,94 @@
+import pytest
+from lxml import etree
+import oai_repo
+from .data_memory import DataInMemory
+
+LIST_RECORDS = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' }
+
+class DataRaw(DataInMemory):
+    """A DataInterface returning metadata as serialized bytes, with non-ASCII text"""
+    def get_record_metadata(self, identifier: str, metadataprefix: str):
+        xdc = super().get_record_metadata(identifier, metadataprefix)
+        xdc[0].text += " é"
+        return etree.tostring(xdc, encoding="utf-8")
+
+def canonical(resp: bytes) -> bytes:
+    """
+    Return the response without whitespace or the responseDate, in exclusive canonical
+    form, which declares namespaces where they are used
+    """
+    xml = etree.fromstring(resp, etree.XMLParser(remove_blank_text=True))
+    xml.remove(xml.find("{*}responseDate"))
+    return etree.tostring(xml, method="c14n", exclusive=True)
+
+def test_default_serialization():
+    repo = oai_repo.OAIRepository(DataInMemory())
+    # List verbs are compact, others indented
+    resp = bytes(repo.process(LIST_RECORDS))
+    assert resp.startswith(b'<?xml version="1.0" encoding="UTF-8" ?>\n<OAI-PMH')
+    assert b"\n" not in resp.split(b"\n", 1)[1]
+    assert b"\n  <Identify>" in bytes(repo.process({ 'verb': 'Identify' }))
+    assert b"\n" not in bytes(repo.process({ 'verb': 'ListSets' })).split(b"\n", 1)[1]
+
+def test_serialization_options():
+    pretty = oai_repo.OAIRepository(
+        DataInMemory(), serialization=oai_repo.SerializationOptions(pretty_print=True)
+    )
+    compact = oai_repo.OAIRepository(
+        DataInMemory(),
+        serialization=oai_repo.SerializationOptions(pretty_print=False, xml_declaration=False)
+    )
+    pretty_resp = bytes(pretty.process(LIST_RECORDS))
+    compact_resp = bytes(compact.process(LIST_RECORDS))
+    assert b"\n    <record>" in pretty_resp
+    assert compact_resp.startswith(b"<OAI-PMH")
+    assert len(compact_resp) < len(pretty_resp)
+    assert b"\n" not in bytes(compact.process({ 'verb': 'Identify' }))
+    # Both are the same XML
+    assert canonical(pretty_resp) == canonical(compact_resp)
+
+@pytest.mark.parametrize("encoding", ["UTF-8", "ISO-8859-1", "ascii"])
+def test_serialization_encoding(encoding):
+    repo = oai_repo.OAIRepository(
+        DataRaw(), serialization=oai_repo.SerializationOptions(encoding=encoding)
+    )
+    resp = bytes(repo.process(LIST_RECORDS))
+    if encoding != "UTF-8":
+        assert resp.startswith(f'<?xml version="1.0" encoding="{encoding}" ?>'.encode())
+    xml = etree.fromstring(resp)
+    titles = xml.xpath("//dc:title/text()", namespaces={"dc": "http://purl.org/dc/elements/1.1/"})
+    assert titles[0] == "Record 0 é"
+
+def test_hoisted_namespaces():
+    options = oai_repo.SerializationOptions(namespaces={"oai_dc": oai_repo.NSMAP_OAIDC})
+    hoisted = oai_repo.OAIRepository(DataInMemory(), serialization=options)
+    plain = oai_repo.OAIRepository(DataInMemory())
+    for request in (LIST_RECORDS, { 'verb': 'GetRecord', 'metadataPrefix': 'oai_dc',
+                                    'identifier': 'oai:example.edu:1' }):
+        hoisted_resp = bytes(hoisted.process(request))
+        plain_resp = bytes(plain.process(request))
+        assert hoisted_resp.count(b"xmlns:dc=") == 1
+        assert plain_resp.count(b"xmlns:dc=") == plain_resp.count(b"<record>")
+        assert len(hoisted_resp) <= len(plain_resp)
+        # Parsed with namespaces, the responses are the same
+        assert canonical(hoisted_resp) == canonical(plain_resp)
+        xml = etree.fromstring(hoisted_resp)
+        assert xml.nsmap[None] == "http://www.openarchives.org/OAI/2.0/"
+        records = xml.findall(".//{http://www.openarchives.org/OAI/2.0/}metadata/"
+                              "{http://www.openarchives.org/OAI/2.0/oai_dc/}dc")
+        assert records
+        assert all(rec.get("{http://www.w3.org/2001/XMLSchema-instance}schemaLocation")
+                   for rec in records)
+    # Other verbs and formats are unchanged
+    assert b"xmlns:dc=" not in bytes(hoisted.process({ 'verb': 'Identify' }))
+
+def test_hoisted_namespaces_conflict():
+    # Metadata using a prefix for another namespace keeps its own declaration
+    options = oai_repo.SerializationOptions(
+        namespaces={"oai_dc": {None: "http://example.edu/", "dc": "http://example.edu/dc/"}}
+    )
+    repo = oai_repo.OAIRepository(DataInMemory(), serialization=options)
+    xml = etree.fromstring(bytes(repo.process(LIST_RECORDS)))
+    assert xml.nsmap[None] == "http://www.openarchives.org/OAI/2.0/"
+    titles = xml.findall(".//{http://purl.org/dc/elements/1.1/}title")
+    assert len(titles) == 100
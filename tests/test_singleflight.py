@@ -0,0 +1,185 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import oai_repo
+from oai_repo.singleflight import SingleFlight
+from .data_memory import DataInMemory
+
+def wait_in_flight(flights, count=1):
+    while len(flights) < count:
+        time.sleep(0.001)
+
+def test_SingleFlight():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    def slow(value):
+        calls.append(value)
+        release.wait()
+        return value
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flights.call, "a", lambda: slow(1))
+        wait_in_flight(flights)
+        followers = [pool.submit(flights.call, "a", lambda: slow(2)) for _ in range(2)]
+        other = pool.submit(flights.call, "b", lambda: slow(3))
+        wait_in_flight(flights, 2)
+        release.set()
+        assert leader.result() == (1, False)
+        assert [follower.result() for follower in followers] == [(1, True), (1, True)]
+        assert other.result() == (3, False)
+    assert sorted(calls) == [1, 3]
+    assert flights.stats == {"leaders": 2, "followers": 2}
+    # Results are not kept after the call
+    assert len(flights) == 0
+    assert flights.call("a", lambda: 4) == (4, False)
+
+def test_SingleFlight_exception():
+    flights = SingleFlight()
+    release = threading.Event()
+    def failing():
+        release.wait()
+        raise ValueError("Failed")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.call, "a", failing)
+        wait_in_flight(flights)
+        follower = pool.submit(flights.call, "a", failing)
+        # Waiting for the call in flight may time out
+        with pytest.raises(TimeoutError):
+            flights.call("a", failing, timeout=0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+class DataBlocking(DataInMemory):
+    """A DataInterface which lists identifiers once released"""
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def list_identifiers(self, *args, **kwargs):
+        self.release.wait()
+        return super().list_identifiers(*args, **kwargs)
+
+REQUEST = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc', 'set': 'odd' }
+
+def test_OAIRepository_single_flight():
+    data = DataBlocking()
+    flights = SingleFlight()
+    repo = oai_repo.OAIRepository(data, single_flight=flights)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(repo.process, dict(REQUEST))
+        wait_in_flight(flights)
+        # Argument order does not matter
+        followers = [pool.submit(repo.process, dict(reversed(REQUEST.items()))) for _ in range(3)]
+        while flights.stats["followers"] < 3:
+            time.sleep(0.001)
+        data.release.set()
+        responses = [leader.result()] + [follower.result() for follower in followers]
+    assert data.calls["get_record_metadata"] == 100
+    # All share the serialized response, each with its own context
+    assert len({bytes(resp) for resp in responses}) == 1
+    assert b"<dc:title>Record 1</dc:title>" in bytes(responses[0])
+    assert len({id(resp.context) for resp in responses}) == 4
+    assert "coalesced" not in responses[0].context.metrics
+    assert all(resp.context.metrics["coalesced"] for resp in responses[1:])
+
+    # Requests which are not concurrent are not shared
+    repo.process(REQUEST)
+    assert data.calls["get_record_metadata"] == 200
+
+def test_OAIRepository_single_flight_deadline():
+    data = DataBlocking()
+    flights = SingleFlight()
+    repo = oai_repo.OAIRepository(data, single_flight=flights, deadline=0.05, retry_after=9)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(repo.process, REQUEST)
+        wait_in_flight(flights)
+        with pytest.raises(oai_repo.OAIRepoDeadlineException, match="identical") as exc:
+            repo.process(REQUEST)
+        assert exc.value.retry_after == 9
+        data.release.set()
+        with pytest.raises(oai_repo.OAIRepoDeadlineException):
+            leader.result()
+
+def test_OAIRepository_process_async():
+    data = DataBlocking()
+    flights = SingleFlight()
+    repo = oai_repo.OAIRepository(data, single_flight=flights)
+
+    async def harvest():
+        leader = asyncio.create_task(repo.process_async(REQUEST))
+        while not len(flights):
+            await asyncio.sleep(0.001)
+        followers = [asyncio.create_task(repo.process_async(REQUEST)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        data.release.set()
+        return await asyncio.gather(leader, *followers)
+
+    responses = asyncio.run(harvest())
+    assert data.calls["get_record_metadata"] == 100
+    assert len({bytes(resp) for resp in responses}) == 1
+    assert flights.stats == {"leaders": 1, "followers": 3}
+    assert all(resp.context.metrics["coalesced"] for resp in responses[1:])
+
+def test_OAIRepository_process_async_timeout():
+    data = DataBlocking()
+    flights = SingleFlight()
+    repo = oai_repo.OAIRepository(data, single_flight=flights)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(repo.process, REQUEST)
+        wait_in_flight(flights)
+        follower = pool.submit(repo.process, REQUEST)
+        while flights.stats["followers"] < 1:
+            time.sleep(0.001)
+        # An async follower timing out leaves the call in flight for the others
+        repo.deadline = 0.01
+        with pytest.raises(oai_repo.OAIRepoDeadlineException, match="identical"):
+            asyncio.run(repo.process_async(REQUEST))
+        data.release.set()
+        responses = [leader.result(), follower.result()]
+    assert len({bytes(resp) for resp in responses}) == 1
+    assert b"<dc:title>Record 1</dc:title>" in bytes(responses[0])
+
+def test_OAIRepository_single_flight_leader_fails():
+    data = DataBlocking()
+    flights = SingleFlight()
+    repo = oai_repo.OAIRepository(data, single_flight=flights, deadline=0.05)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(repo.process, REQUEST)
+        wait_in_flight(flights)
+        repo.deadline = None
+        follower = pool.submit(repo.process, REQUEST)
+        while flights.stats["followers"] < 1:
+            time.sleep(0.001)
+        time.sleep(0.06)
+        data.release.set()
+        # The leader's deadline is its own; the follower processes the request itself
+        with pytest.raises(oai_repo.OAIRepoDeadlineException):
+            leader.result()
+        resp = follower.result()
+    assert b"<dc:title>Record 1</dc:title>" in bytes(resp)
+    assert "coalesced" not in resp.context.metrics
+
+def test_OAIRepository_single_flight_admission():
+    data = DataBlocking()
+    flights = SingleFlight()
+    admission = oai_repo.AdmissionController(max_active_per_client=1, wait_timeout=0.01)
+    repo = oai_repo.OAIRepository(data, single_flight=flights, admission=admission)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(repo.process, REQUEST, "a")
+        wait_in_flight(flights)
+        follower = pool.submit(repo.process, REQUEST, "b")
+        while flights.stats["followers"] < 1:
+            time.sleep(0.001)
+        # Each request is admitted for its own client
+        with pytest.raises(oai_repo.OAIRepoOverloadedException):
+            repo.process(REQUEST, "a")
+        assert admission.active == 2
+        data.release.set()
+        assert bytes(leader.result()) == bytes(follower.result())
+    assert follower.result().context.metrics["coalesced"]
+    assert admission.active == 0
@@ -0,0 +1,183 @@
+import re
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+import pytest
+from lxml import etree
+import oai_repo
+from oai_repo import helpers
+from oai_repo.solr import SolrDataInterface
+from .data_memory import DataInMemory
+
+class FakeSolr:
+    """Answers the subset of Solr select queries used by SolrDataInterface"""
+    def __init__(self, count=250):
+        source = DataInMemory(count)
+        self.docs = [
+            {
+                "id": header.identifier,
+                "modified_dt": helpers.datestamp_long(header.datestamp),
+                "sets_ss": header.setspecs,
+                "deleted_b": idx == 3,
+                "dc_xml": "" if idx == 3 else etree.tostring(
+                    source.get_record_metadata(header.identifier, "oai_dc")
+                ).decode(),
+            }
+            for idx, header in enumerate(source.headers)
+        ]
+        self.requests = []
+
+    def matches(self, doc, fq):
+        if fq.startswith("{!terms"):
+            terms = fq.split("}", 1)[1].split("\u001f")
+            return doc["id"] in terms
+        return any(self.match_clause(doc, clause) for clause in fq.split(" OR "))
+
+    def match_clause(self, doc, clause):
+        field, value = clause.split(":", 1)
+        if found := re.match(r"\[(\S+) TO (\S+)\]", value):
+            if not doc.get(field):
+                return False
+            low, high = found.groups()
+            return (low == "*" or doc[field] >= low) and (high == "*" or doc[field] <= high)
+        value = json.loads(value) if value.startswith('"') else json.loads(value.lower())
+        return value in doc[field] if isinstance(doc[field], list) else doc[field] == value
+
+    def select(self, params):
+        self.requests.append(params)
+        docs = [
+            doc for doc in self.docs
+            if all(self.matches(doc, value) for key, value in params if key == "fq")
+        ]
+        args = dict(params)
+        if "facet.field" in args:
+            counts = {}
+            for doc in docs:
+                for value in doc[args["facet.field"]]:
+                    counts[value] = counts.get(value, 0) + 1
+            flat = [item for key in sorted(counts) for item in (key, counts[key])]
+            return {
+                "response": {"numFound": len(docs), "docs": []},
+                "facet_counts": {"facet_fields": {args["facet.field"]: flat}}
+            }
+        docs.sort(key=lambda doc: (doc["modified_dt"], doc["id"]))
+        rows = int(args.get("rows", 10))
+        result = {"response": {"numFound": len(docs)}}
+        if "cursorMark" in args:
+            start = 0 if args["cursorMark"] == "*" else int(args["cursorMark"][4:])
+            result["nextCursorMark"] = f"mark{start + rows}"
+        else:
+            start = int(args.get("start", 0))
+        fields = args.get("fl", "").split(",")
+        result["response"]["docs"] = [
+            {key: value for key, value in doc.items() if key in fields}
+            for doc in docs[start:start + rows]
+        ]
+        return result
+
+class SolrHandler(BaseHTTPRequestHandler):
+    """Serves the select handler of the FakeSolr of the server"""
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/solr/oai/select":
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.solr.select(parse_qsl(url.query))).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def solr():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SolrHandler)
+    server.solr = FakeSolr()
+    server.solr.url = f"http://127.0.0.1:{server.server_port}/solr/oai/"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.solr
+    server.shutdown()
+    server.server_close()
+    helpers.configure_http()
+
+def solr_data(url):
+    identify = DataInMemory().get_identify()
+    identify.deleted_record = "persistent"
+    return SolrDataInterface(
+        url,
+        identify,
+        DataInMemory().get_metadata_formats(),
+        {"oai_dc": "dc_xml"},
+        fields={
+            "datestamp": "modified_dt", "setspecs": "sets_ss", "deleted": "deleted_b"
+        },
+        set_names={"odd": "Odd records"},
+    )
+
+def test_SolrDataInterface(solr):
+    repo = oai_repo.OAIRepository(solr_data(solr.url))
+
+    # Each page is a single Solr request, continuing from the cursorMark
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' }
+    rawresp = repo.process(request)
+    resp = bytes(rawresp)
+    assert b"<dc:title>Record 99</dc:title>" in resp
+    assert b"<identifier>oai:example.edu:3</identifier>" not in resp
+    assert b'<resumptionToken cursor="0" completeListSize="250">' in resp
+    assert len(solr.requests) == 1
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    resp = bytes(repo.process({ 'verb': 'ListRecords', 'resumptionToken': token }))
+    assert b"<dc:title>Record 100</dc:title>" in resp
+    assert b"<dc:title>Record 199</dc:title>" in resp
+    assert ("cursorMark", "mark100") in solr.requests[-1]
+
+    # Without a cached cursorMark, fall back to an offset
+    repo.data.cursor_cache.clear()
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'resumptionToken': token }))
+    assert b"<identifier>oai:example.edu:100</identifier>" in resp
+    assert ("start", "100") in solr.requests[-1]
+
+    # Deleted records are listed, though they have no metadata
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' }
+    assert b"<identifier>oai:example.edu:3</identifier>" in bytes(repo.process(request))
+
+    # Filters
+    request = {
+        'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc',
+        'set': 'odd', 'from': '2020-08-01', 'until': '2020-08-10'
+    }
+    resp = bytes(repo.process(request))
+    assert resp.count(b"<header>") == 5
+    assert b"<identifier>oai:example.edu:213</identifier>" in resp
+
+    # GetRecord and ListSets
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:7', 'metadataPrefix': 'oai_dc' }
+    calls = len(solr.requests)
+    resp = bytes(repo.process(request))
+    assert b"<dc:title>Record 7</dc:title>" in resp
+    assert b"<setSpec>odd</setSpec>" in resp
+    assert len(solr.requests) == calls + 1
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:999', 'metadataPrefix': 'oai_dc' }
+    assert b'code="idDoesNotExist"' in bytes(repo.process(request))
+    resp = bytes(repo.process({ 'verb': 'ListSets' }))
+    assert b"<setName>Odd records</setName>" in resp
+    assert b"<setSpec>even</setSpec>" in resp
+
+def test_SolrDataInterface_missing(solr):
+    data = solr_data(solr.url)
+    # Identifiers not in the index, such as records removed since being listed
+    headers = data.get_records_header(["oai:example.edu:7", "oai:example.edu:999"])
+    assert headers[0].identifier == "oai:example.edu:7"
+    assert headers[1] is None
+    assert data.get_record_header("oai:example.edu:999") is None
+    assert data.list_set_specs("oai:example.edu:999") == ([], None, None)
+    # Terms with separators and quotes survive encoding of the query
+    assert data.get_records_metadata(['oai:example.edu:"7"&q=*:*'], "oai_dc") == [None]
+    assert solr.requests[-1][0] == ("q", "*:*")
+    assert ("fq", "{!terms f=id separator='\u001f'}" + 'oai:example.edu:"7"&q=*:*') \
+        in solr.requests[-1]
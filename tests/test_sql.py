@@ -0,0 +1,168 @@
+import sqlite3
+import threading
+import pytest
+from lxml import etree
+import oai_repo
+from oai_repo import helpers
+from oai_repo.exceptions import OAIRepoExternalException
+from oai_repo.sql import ConnectionPool, SQLDataInterface
+from .data_memory import DataInMemory
+
+def create_db(path):
+    source = DataInMemory()
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE records (identifier TEXT PRIMARY KEY, datestamp TEXT, "
+        "deleted INTEGER, dc_xml TEXT)"
+    )
+    conn.execute("CREATE TABLE record_sets (identifier TEXT, setspec TEXT)")
+    for idx, header in enumerate(source.headers):
+        metadata = source.get_record_metadata(header.identifier, "oai_dc")
+        conn.execute("INSERT INTO records VALUES (?, ?, ?, ?)", (
+            header.identifier, helpers.datestamp_long(header.datestamp), idx == 3,
+            None if idx == 3 else etree.tostring(metadata).decode()
+        ))
+        setspecs = header.setspecs + (["odd:tens"] if idx % 10 == 1 else [])
+        conn.executemany(
+            "INSERT INTO record_sets VALUES (?, ?)",
+            [(header.identifier, setspec) for setspec in setspecs]
+        )
+    conn.commit()
+    conn.close()
+
+def sql_data(path, queries, **kwargs):
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.set_trace_callback(queries.append)
+        return conn
+    return SQLDataInterface(
+        connect,
+        DataInMemory().get_identify(),
+        DataInMemory().get_metadata_formats(),
+        {"oai_dc": "dc_xml"},
+        columns={"deleted": "deleted"},
+        set_table="record_sets",
+        set_names={"odd": "Odd records"},
+        date_format="%Y-%m-%dT%H:%M:%SZ",
+        **kwargs
+    )
+
+@pytest.mark.parametrize("paramstyle", ["qmark", "named", "numeric"])
+def test_SQLDataInterface(tmp_path, paramstyle):
+    path = str(tmp_path / "oai.db")
+    create_db(path)
+    queries = []
+    repo = oai_repo.OAIRepository(sql_data(path, queries, paramstyle=paramstyle))
+
+    # A page of records is a page query, a count, and a bulk setSpec query
+    request = { 'verb': 'ListRecords', 'metadataPrefix': 'oai_dc' }
+    rawresp = repo.process(request)
+    resp = bytes(rawresp)
+    assert b"<dc:title>Record 99</dc:title>" in resp
+    assert b"<identifier>oai:example.edu:3</identifier>" not in resp
+    assert b'<resumptionToken cursor="0" completeListSize="250">' in resp
+    assert len(queries) == 3
+
+    # Following pages continue from the last row of the previous page
+    token = rawresp.xpath("//resumptionToken/text()")[0]
+    queries.clear()
+    resp = bytes(repo.process({ 'verb': 'ListRecords', 'resumptionToken': token }))
+    assert b"<dc:title>Record 100</dc:title>" in resp
+    assert b"<dc:title>Record 199</dc:title>" in resp
+    assert "OFFSET" not in queries[0] and "datestamp > " in queries[0]
+    assert len(queries) == 2
+
+    # Without a known position, fall back to an offset
+    repo.data.keyset_cache.clear()
+    resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'resumptionToken': token }))
+    assert b"<identifier>oai:example.edu:100</identifier>" in resp
+    assert "OFFSET 100" in queries[-2]
+
+    # Deleted records are listed, though they have no metadata
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' }
+    assert b"<identifier>oai:example.edu:3</identifier>" in bytes(repo.process(request))
+
+    # Filters, including subsets
+    request = {
+        'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc',
+        'set': 'odd', 'from': '2020-08-01', 'until': '2020-08-10'
+    }
+    resp = bytes(repo.process(request))
+    assert resp.count(b"<header>") == 5
+    assert b"<identifier>oai:example.edu:213</identifier>" in resp
+    assert b"<setSpec>odd:tens</setSpec>" in resp
+    request = { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'set': 'odd' }
+    assert b'completeListSize="125"' in bytes(repo.process(request))
+
+    # GetRecord and ListSets
+    queries.clear()
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:7', 'metadataPrefix': 'oai_dc' }
+    resp = bytes(repo.process(request))
+    assert b"<dc:title>Record 7</dc:title>" in resp
+    assert b"<setSpec>odd</setSpec>" in resp
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:999', 'metadataPrefix': 'oai_dc' }
+    assert b'code="idDoesNotExist"' in bytes(repo.process(request))
+    resp = bytes(repo.process({ 'verb': 'ListSets' }))
+    assert b"<setName>Odd records</setName>" in resp
+    assert b"<setSpec>odd:tens</setSpec>" in resp
+
+def test_SQLDataInterface_chunks(tmp_path):
+    path = str(tmp_path / "oai.db")
+    create_db(path)
+    queries = []
+    data = sql_data(path, queries, chunk_size=40)
+    identifiers = [f"oai:example.edu:{idx}" for idx in range(100)]
+    headers = data.get_records_header(identifiers)
+    assert [header.identifier for header in headers] == identifiers
+    assert headers[3].status == "deleted"
+    assert headers[5].setspecs == ["all", "odd"]
+    metadata = data.get_records_metadata(identifiers, "oai_dc")
+    assert metadata[3] is None
+    assert metadata[99][0].text == "Record 99"
+    # 3 chunks each for headers, header setSpecs, and metadata
+    assert len(queries) == 9
+
+    # Records removed since being listed have no header
+    headers = data.get_records_header(["oai:example.edu:7", "oai:example.edu:999"])
+    assert headers[0].identifier == "oai:example.edu:7"
+    assert headers[1] is None
+    assert data.get_record_header("oai:example.edu:999") is None
+
+def test_ConnectionPool():
+    opened = []
+    def connect():
+        opened.append(sqlite3.connect(":memory:", check_same_thread=False))
+        return opened[-1]
+    pool = ConnectionPool(connect, size=2, timeout=0.1)
+    with pool.connection() as first:
+        with pool.connection() as second:
+            assert first is not second
+            with pytest.raises(OAIRepoExternalException):
+                with pool.connection():
+                    pass
+    # Connections are reused
+    with pool.connection() as conn:
+        assert conn in opened
+    assert len(opened) == 2
+
+    # Connections are shared between threads
+    def worker():
+        for _ in range(20):
+            with pool.connection() as conn:
+                conn.execute("SELECT 1").fetchall()
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 2
+
+    # A connection which failed is not reused
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as failed:
+            failed.execute("SELECT nope")
+    with pool.connection() as first:
+        with pool.connection() as second:
+            assert failed not in (first, second)
+    assert len(opened) == 3
+    pool.close()
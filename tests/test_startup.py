@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+import oai_repo
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+def imported_after(code):
+    """Return the modules imported by running the code in a fresh interpreter"""
+    script = f"import sys, json\nbefore = set(sys.modules)\n{code}\n" \
+             "print(json.dumps(sorted(set(sys.modules) - before)))"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env=dict(os.environ, PYTHONPATH=SRC), capture_output=True, check=True, text=True
+    )
+    return set(json.loads(result.stdout))
+
+def test_lazy_imports():
+    heavy = {"requests", "jsonpath_ng", "validators", "oai_repo.getrecord"}
+    assert not heavy & imported_after("import oai_repo")
+    assert not heavy & imported_after("import oai_repo; oai_repo.Transform; oai_repo.RecordHeader")
+    modules = imported_after("import oai_repo; oai_repo.OAIRepository")
+    assert not heavy & modules
+    modules = imported_after("from oai_repo import helpers; helpers.requests")
+    assert "requests" in modules
+    modules = imported_after(
+        "import oai_repo; ident = oai_repo.Identify(); ident.base_url = 'https://x'; ident.errors()"
+    )
+    assert "validators" in modules
+
+def test_lazy_attributes():
+    assert "OAIRepository" in dir(oai_repo)
+    assert oai_repo.helpers.datestamp_short
+    assert set(oai_repo.__all__) <= set(dir(oai_repo))
+    with pytest.raises(AttributeError):
+        oai_repo.NotAThing
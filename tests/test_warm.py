@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import pytest
+import oai_repo
+from oai_repo import helpers
+from oai_repo.sql import ConnectionPool
+from .data_memory import DataInMemory
+
+class DataWarmed(DataInMemory):
+    """A DataInterface recording calls to warm()"""
+    def __init__(self):
+        super().__init__()
+        self.warmed = []
+
+    def warm(self, connections=False):
+        self.warmed.append(connections)
+
+def test_OAIRepository_warm():
+    data = DataWarmed()
+    repo = oai_repo.OAIRepository(data, static=oai_repo.LRUCache(maxsize=16, ttl=300))
+    repo.warm()
+    assert data.warmed == [False]
+    assert data.calls["get_identify"] == 1
+    assert data.calls["get_metadata_formats"] == 1
+    assert data.calls["get_set"] == 3
+
+    # Requests use the data loaded while warming
+    for request in [
+        { 'verb': 'Identify' },
+        { 'verb': 'ListMetadataFormats' },
+        { 'verb': 'ListSets' },
+        { 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc', 'from': '2020-03-01' },
+    ]:
+        assert b"<error" not in bytes(repo.process(request))
+    assert data.calls["get_identify"] == 1
+    assert data.calls["get_metadata_formats"] == 1
+    assert data.calls["get_set"] == 3
+    # Formats of a single record are not cached
+    request = { 'verb': 'GetRecord', 'identifier': 'oai:example.edu:7', 'metadataPrefix': 'oai_dc' }
+    assert b"<error" not in bytes(repo.process(request))
+    assert data.calls["get_metadata_formats"] == 2
+    assert data.calls["get_identify"] == 1
+
+    repo.warm(connections=True)
+    assert data.warmed == [False, True]
+
+class DataPagedSets(DataInMemory):
+    """A DataInterface listing setSpecs two at a time"""
+    def list_set_specs(self, identifier=None, cursor=0):
+        if identifier:
+            return super().list_set_specs(identifier, cursor)
+        self.calls["list_set_specs"] += 1
+        return ["all", "even", "odd"][cursor:cursor + 2], 3, None
+
+def test_OAIRepository_static_default():
+    data = DataPagedSets()
+    repo = oai_repo.OAIRepository(data)
+    # Without a static cache, loaded once for each request
+    for _ in range(2):
+        resp = bytes(repo.process({ 'verb': 'ListIdentifiers', 'metadataPrefix': 'oai_dc' }))
+        assert b"<error" not in resp
+    assert data.calls["get_identify"] == 2
+    # All pages of sets are listed
+    resp = bytes(repo.process({ 'verb': 'ListSets' }))
+    assert resp.count(b"<set>") == 3
+    assert data.calls["list_set_specs"] == 2
+    assert [setobj.spec for setobj in repo.list_sets()] == ["all", "even", "odd"]
+
+class DataInvalid(DataInMemory):
+    """A DataInterface with an invalid Identify"""
+    def get_identify(self):
+        ident = super().get_identify()
+        ident.granularity = "YYYY"
+        return ident
+
+def test_OAIRepository_warm_invalid():
+    repo = oai_repo.OAIRepository(DataInvalid())
+    with pytest.raises(oai_repo.OAIRepoInternalException):
+        repo.warm()
+
+def test_compiled_paths():
+    assert helpers.compile_xpath("/a/b") is helpers.compile_xpath("/a/b")
+    assert helpers.compile_xpath("/x:a", {"x": "urn:x"}) is \
+        helpers.compile_xpath("/x:a", {"x": "urn:x"})
+    assert helpers.compile_xpath("/x:a", {"x": "urn:x"}) is not \
+        helpers.compile_xpath("/x:a", {"x": "urn:y"})
+    assert helpers.compile_jsonpath("$.a") is helpers.compile_jsonpath("$.a")
+    assert helpers.jsonpath_find({"a": [{"b": 1}, {"b": 2}]}, "$.a[*].b") == [1, 2]
+
+def test_http_session():
+    assert helpers.http_session() is helpers.http_session()
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_ConnectionPool_fork(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), size=1)
+    with pool.connection() as conn:
+        parent = id(conn)
+    pid = os.fork()
+    if pid == 0:
+        # Forked process does not use the inherited connection, and opens its own
+        try:
+            inherited = pool._idle.qsize()
+            with pool.connection() as conn:
+                conn.execute("SELECT 1")
+            os._exit(0 if inherited == 0 and pool._opened == 1 else 1)
+        finally:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    with pool.connection() as conn:
+        assert id(conn) == parent